@@ -0,0 +1,80 @@
+"""
+Benchmark FeatureIndex against a linear scan of the features table.
+
+Usage: python -m benchmarks.bench_feature_index [--queries N] [--copies N]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+
+from cdm_utils.feature_and_protein_table import GFFParser
+from cdm_utils.feature_index import FeatureIndex
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'data')
+
+
+def load_features(copies):
+    """Parse the bundled genome and replicate its features onto copies of each contig."""
+    prefix = os.path.join(DATA_DIR, 'GCF_003633725.1_ASM363372v1_')
+    with redirect_stdout(io.StringIO()):
+        parser = GFFParser(prefix + 'genomic.fna.gz', prefix + 'genomic.gff.gz', prefix + 'protein.faa.gz')
+        parser.calculate_md5_checksums()
+        parser.prepare_gff3_data()
+    features = []
+    for copy in range(copies):
+        for feature in parser.features.iter_dicts():
+            feature = dict(feature, seq_id=f"{feature['seq_id']}_{copy}", contig_md5=None,
+                           feature_uid=f"{feature['feature_uid']}_{copy}")
+            features.append(feature)
+    return features
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--queries', type=int, default=2000, help='Number of random overlap queries')
+    parser.add_argument('--copies', type=int, default=10, help='Number of copies of the bundled genome')
+    args = parser.parse_args()
+
+    features = load_features(args.copies)
+    rng = random.Random(0)
+    regions = []
+    for _ in range(args.queries):
+        feature = rng.choice(features)
+        start = max(1, feature['start'] - rng.randint(0, 20000))
+        regions.append((feature['seq_id'], start, start + rng.randint(100, 20000)))
+
+    started = time.perf_counter()
+    index = FeatureIndex(features)
+    build_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    indexed_hits = sum(len(index.overlapping(*region)) for region in regions)
+    index_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    scanned_hits = sum(1 for seq_id, start, end in regions for feature in features
+                       if feature['seq_id'] == seq_id and feature['start'] <= end and feature['end'] >= start)
+    scan_time = time.perf_counter() - started
+
+    if indexed_hits != scanned_hits:
+        sys.exit(f"Mismatch: index found {indexed_hits} features, scan found {scanned_hits}")
+
+    uids = [feature['feature_uid'] for feature in rng.sample(features, min(len(features), args.queries))]
+    started = time.perf_counter()
+    for uid in uids:
+        index.get(uid)
+    lookup_time = time.perf_counter() - started
+
+    print(f"features: {len(features)}  queries: {args.queries}  hits: {indexed_hits}")
+    print(f"build:          {build_time:.3f} s")
+    print(f"overlap index:  {index_time:.3f} s ({args.queries / index_time:,.0f} queries/s)")
+    print(f"overlap scan:   {scan_time:.3f} s ({args.queries / scan_time:,.0f} queries/s)")
+    print(f"uid lookup:     {lookup_time:.4f} s ({len(uids) / lookup_time:,.0f} lookups/s)")
+
+
+if __name__ == "__main__":
+    main()
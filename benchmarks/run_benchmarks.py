@@ -0,0 +1,303 @@
+"""
+Time every CDM table builder on the bundled genome and on scaled copies of it.
+
+Each stage runs in a fresh worker process so that its peak RSS is measured on its own.
+Stages whose dependencies (pandas, Biopython) are not installed are reported as skipped.
+A record is a contig, feature, protein or row depending on the stage, and a byte of
+compressed input for assembly_table.compute_md5. Results are written as JSON, and --compare
+prints the change in records/sec against an earlier results file, for example one produced
+on another commit.
+
+Usage: python -m benchmarks.run_benchmarks [--scales 1,10,100,1000] [--output results.json]
+                                           [--compare baseline.json] [--work_dir DIR]
+"""
+import argparse
+import csv
+import gzip
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT_DIR, 'tests', 'data')
+PREFIX = os.path.join(DATA_DIR, 'GCF_003633725.1_ASM363372v1_')
+JSONL_FILE = os.path.join(DATA_DIR, 'GCF_003633725.1_assembly_data_report.jsonl')
+
+# Columns of the sample details input read by SampleTable and observation_and_assembly
+SAMPLE_TABLE_COLUMNS = [
+    'id', 'source_project_source', 'source_project_accession', 'source_project_title', 'source_submitter',
+    'biosample_accession', 'biosample_collection_date', 'biosample_host', 'geolocation_geo_loc_name',
+    'geolocation_latitude', 'geolocation_longitude', 'geolocation_elevation', 'geolocation_depth',
+    'biosample_environment_package', 'biosample_models', 'biosample_parent_accession',
+    'biosample_isolate_strain', 'assembly_accession', 'assembly_name', 'assembly_level',
+]
+
+GFF_ID_ATTRIBUTES = re.compile(r'((?:^|;)(?:ID|Parent|protein_id)=)([^;]+)')
+
+
+def scaled_inputs(scale, work_dir):
+    """
+    Write (or reuse) the inputs for one scale: the bundled genome with its contigs, features
+    and proteins copied scale times under new names, and scale copies of the JSONL record.
+    """
+    directory = os.path.join(work_dir, f'x{scale}')
+    inputs = {
+        'assembly': os.path.join(directory, 'genomic.fna.gz'),
+        'gff': os.path.join(directory, 'genomic.gff.gz'),
+        'faa': os.path.join(directory, 'protein.faa.gz'),
+        'jsonl': os.path.join(directory, 'assembly_data_report.jsonl'),
+        'sample_details': os.path.join(directory, 'sample_details.tsv'),
+        'output_dir': directory,
+    }
+    done_marker = os.path.join(directory, '.complete')
+    if os.path.exists(done_marker):
+        return inputs
+    os.makedirs(directory, exist_ok=True)
+
+    with gzip.open(PREFIX + 'genomic.fna.gz', 'rt') as f:
+        assembly_lines = f.readlines()
+    with gzip.open(PREFIX + 'genomic.gff.gz', 'rt') as f:
+        gff_lines = [line for line in f if not line.startswith('#')]
+    with gzip.open(PREFIX + 'protein.faa.gz', 'rt') as f:
+        faa_lines = f.readlines()
+    with open(JSONL_FILE, 'r') as f:
+        record = json.loads(f.readline())
+
+    with gzip.open(inputs['assembly'], 'wt', compresslevel=1) as out:
+        for copy in range(scale):
+            for line in assembly_lines:
+                out.write(f">{line[1:].split()[0]}_c{copy}\n" if line.startswith('>') else line)
+    with gzip.open(inputs['gff'], 'wt', compresslevel=1) as out:
+        out.write('##gff-version 3\n')
+        for copy in range(scale):
+            for line in gff_lines:
+                row = line.rstrip('\n').split('\t')
+                if len(row) < 9:
+                    continue
+                row[0] = f"{row[0]}_c{copy}"
+                row[8] = GFF_ID_ATTRIBUTES.sub(
+                    lambda m: m.group(1) + ','.join(f"{value}_c{copy}" for value in m.group(2).split(',')), row[8])
+                out.write('\t'.join(row) + '\n')
+    with gzip.open(inputs['faa'], 'wt', compresslevel=1) as out:
+        for copy in range(scale):
+            for line in faa_lines:
+                if line.startswith('>'):
+                    protein_id, _, description = line[1:].partition(' ')
+                    line = f">{protein_id.strip()}_c{copy} {description}"
+                out.write(line)
+
+    with open(inputs['jsonl'], 'w') as jsonl_out, open(inputs['sample_details'], 'w', newline='') as tsv_out:
+        writer = csv.writer(tsv_out, delimiter='\t')
+        writer.writerow(SAMPLE_TABLE_COLUMNS)
+        for copy in range(scale):
+            copy_record = json.loads(json.dumps(record))
+            copy_record['accession'] = f"{record['accession']}_c{copy}"
+            biosample = copy_record['assemblyInfo']['biosample']
+            biosample['accession'] = f"{biosample['accession']}_c{copy}"
+            jsonl_out.write(json.dumps(copy_record) + '\n')
+            info = copy_record['assemblyInfo']
+            writer.writerow([
+                f'sample_{copy}', 'NCBI', info.get('bioprojectAccession', ''), '', info.get('submitter', ''),
+                biosample['accession'], '', '', '', '', '', '', '', biosample.get('package', ''), '', '',
+                '', copy_record['accession'], info.get('assemblyName', ''), info.get('assemblyLevel', ''),
+            ])
+
+    open(done_marker, 'w').close()
+    return inputs
+
+
+def timed(results, stage, func, records=None):
+    """Run func, and append (stage, records, seconds) to results. records may be a callable."""
+    started = time.perf_counter()
+    value = func()
+    seconds = time.perf_counter() - started
+    count = records(value) if callable(records) else records
+    results.append((stage, count, seconds))
+    return value
+
+
+def bench_gff_parser(inputs):
+    from cdm_utils.feature_and_protein_table import GFFParser
+    results = []
+    parser = GFFParser(inputs['assembly'], inputs['gff'], inputs['faa'])
+    timed(results, 'gff.calculate_md5_checksums', parser.calculate_md5_checksums, lambda _: len(parser.contig_md5s))
+    timed(results, 'gff.prepare_gff3_data', parser.prepare_gff3_data, lambda _: len(parser.features))
+    timed(results, 'gff.prepare_protein_associations', parser.prepare_protein_associations,
+          lambda _: len(parser.feature_protein_associations))
+    timed(results, 'gff.match_proteins_to_features', parser.match_proteins_to_features,
+          lambda _: len(parser.feature_protein_associations))
+    out = inputs['output_dir']
+    timed(results, 'gff.save_as_tsv',
+          lambda: parser.save_as_tsv(os.path.join(out, 'features.tsv'), os.path.join(out, 'feature_associations.tsv'),
+                                     os.path.join(out, 'feature_protein_associations.tsv')),
+          lambda _: len(parser.features))
+    return results
+
+
+def bench_contig_table(inputs):
+    from cdm_utils.contig_table import ContigTable
+    results = []
+    table = ContigTable(None)
+    timed(results, 'contig_table.calculate_contig_stats',
+          lambda: table.calculate_contig_stats(inputs['assembly'], 'benchmark'), lambda _: len(table.contig_stats))
+    return results
+
+
+def bench_assembly_md5(inputs):
+    from cdm_utils.assembly_table import AssemblyTable
+    results = []
+    table = AssemblyTable(None)
+    size = os.path.getsize(inputs['assembly'])
+    timed(results, 'assembly_table.compute_md5', lambda: table.compute_md5(inputs['assembly']), size)
+    return results
+
+
+def bench_ncbi_jsonl(inputs):
+    from cdm_utils.ncbi_jsonl_parser import NCBIJSONLParser
+    results = []
+    out = inputs['output_dir']
+    parser = NCBIJSONLParser(inputs['jsonl'], os.path.join(out, 'ncbi_sample_details.tsv'),
+                             os.path.join(out, 'ncbi_sample_attributes.tsv'), os.path.join(out, 'ncbi_source_details.tsv'),
+                             os.path.join(out, 'ncbi_observation_details.tsv'))
+    timed(results, 'ncbi_jsonl.parse', parser.parse, lambda _: len(parser.sample_details_data))
+    timed(results, 'ncbi_jsonl.save_to_tsv', parser.save_to_tsv, lambda _: len(parser.sample_details_data))
+    return results
+
+
+def bench_observation_and_assembly(inputs):
+    from cdm_utils import observation_and_assembly
+    results = []
+    out = inputs['output_dir']
+    with open(inputs['sample_details'], 'r') as f:
+        rows = sum(1 for _ in f) - 1
+    timed(results, 'observation_and_assembly.main',
+          lambda: observation_and_assembly.main(inputs['sample_details'], os.path.join(out, 'assembly.tsv'),
+                                                os.path.join(out, 'observation.tsv'), os.path.join(out, 'protocol.tsv')),
+          rows)
+    return results
+
+
+def bench_sample_table(inputs):
+    from cdm_utils.create_sample_tables_from_details import SampleTable
+    results = []
+    out = inputs['output_dir']
+    table = timed(results, 'sample_table.read', lambda: SampleTable(inputs['sample_details']), lambda t: len(t.df))
+
+    def build():
+        table.create_project_table()
+        table.create_sample_table()
+        table.create_isolate_table()
+        table.create_cultivation_table()
+        table.save_tables(os.path.join(out, 'sample.tsv'), os.path.join(out, 'project.tsv'),
+                          os.path.join(out, 'isolate.tsv'), os.path.join(out, 'cultivation.tsv'))
+    timed(results, 'sample_table.build_and_save', build, len(table.df))
+    return results
+
+
+# (name, function, modules it needs)
+BENCHMARKS = [
+    ('gff_parser', bench_gff_parser, ()),
+    ('contig_table', bench_contig_table, ('Bio',)),
+    ('assembly_md5', bench_assembly_md5, ()),
+    ('ncbi_jsonl', bench_ncbi_jsonl, ('pandas',)),
+    ('observation_and_assembly', bench_observation_and_assembly, ('pandas',)),
+    ('sample_table', bench_sample_table, ('pandas',)),
+]
+
+
+def run_in_worker(func, inputs):
+    """Worker side: run one benchmark with its output silenced and return its timings and peak RSS."""
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        results = func(inputs)
+    return results, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_benchmark(func, inputs):
+    """Run one benchmark in a fresh process so its peak RSS is not shared with other stages."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('fork')) as pool:
+        return pool.submit(run_in_worker, func, inputs).result()
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_file, threshold):
+    """Print records/sec against a baseline results file. Returns the number of regressions beyond threshold."""
+    with open(baseline_file, 'r') as f:
+        baseline = json.load(f)
+    previous = {(r['stage'], r['scale']): r for r in baseline['results'] if r.get('records_per_sec')}
+    print(f"\nComparison with {baseline_file} (commit {baseline.get('commit')})")
+    regressions = 0
+    for result in results['results']:
+        before = previous.get((result['stage'], result['scale']))
+        if not before or not result.get('records_per_sec'):
+            continue
+        change = result['records_per_sec'] / before['records_per_sec'] - 1
+        flag = ''
+        if change < -threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{result['stage']:<40} x{result['scale']:<6} {before['records_per_sec']:>14,.0f} -> "
+              f"{result['records_per_sec']:>14,.0f} records/s ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', type=str, default='1,10', help='Comma-separated copies of the bundled genome, e.g. 1,10,100,1000')
+    parser.add_argument('--stages', type=str, default=None, help='Comma-separated benchmark names to run (default: all)')
+    parser.add_argument('--work_dir', type=str, default=None, help='Directory for the scaled inputs and outputs, reused between runs')
+    parser.add_argument('--output', type=str, default='benchmark_results.json', help='JSON file to write the results to')
+    parser.add_argument('--compare', type=str, default=None, help='Earlier results JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Slowdown in records/sec reported as a regression')
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='cdm_benchmarks_')
+    selected = set(args.stages.split(',')) if args.stages else None
+    results = {'commit': git_commit(), 'python': platform.python_version(), 'machine': platform.machine(),
+               'results': [], 'skipped': []}
+
+    for scale in (int(value) for value in args.scales.split(',')):
+        inputs = scaled_inputs(scale, work_dir)
+        for name, func, modules in BENCHMARKS:
+            if selected and name not in selected:
+                continue
+            missing = [module for module in modules if importlib.util.find_spec(module) is None]
+            if missing:
+                results['skipped'].append({'benchmark': name, 'scale': scale, 'missing': missing})
+                print(f"{name:<40} x{scale:<6} skipped, {', '.join(missing)} not installed")
+                continue
+            stage_results, peak_rss_kb = run_benchmark(func, inputs)
+            for stage, records, seconds in stage_results:
+                records_per_sec = records / seconds if seconds > 0 else None
+                results['results'].append({'stage': stage, 'scale': scale, 'records': records, 'seconds': seconds,
+                                           'records_per_sec': records_per_sec, 'peak_rss_kb': peak_rss_kb})
+                rate = f"{records_per_sec:,.0f}" if records_per_sec else '-'
+                print(f"{stage:<40} x{scale:<6} {records:>12,} records {seconds:>9.3f} s {rate:>14} records/s "
+                      f"{peak_rss_kb / 1024:>8.1f} MB peak")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import csv
+import sys
+from .feature_and_protein_table import GFFParser
+from .prodigal_annotation import ProdigalAnnotation
+from .prokka_annotation import ProkkaAnnotation
+from .sql_loader import SQLiteLoader
+from .protein_store import ProteinStore
+from .contig_store import ContigStore
+from .profiling import add_profiling_arguments, start_profiling, finish_profiling
+
+ANNOTATORS = {
+    'prodigal': ProdigalAnnotation,
+    'prokka': ProkkaAnnotation,
+}
+
+class AnnotationPipeline:
+    """Annotate an assembly and build the feature tables from the annotation in the same process."""
+
+    def __init__(self, assembly_file, prefix, output_dir, annotator='prodigal', protein_store=None,
+                 contig_store=None):
+        if annotator not in ANNOTATORS:
+            raise ValueError(f"Unknown annotator {annotator}, expected one of {', '.join(ANNOTATORS)}")
+        self.assembly_file = assembly_file
+        self.prefix = prefix
+        self.output_dir = output_dir
+        self.annotator = annotator
+        self.protein_store = protein_store
+        self.contig_store = contig_store
+        self.annotation = None
+        self.parser = None
+
+    def annotate(self):
+        """Run the annotation tool and return the paths of the GFF and FAA files it produced."""
+        # The contigs are stored while the annotator hashes the assembly, its only pass over it
+        self.annotation = ANNOTATORS[self.annotator](self.assembly_file, self.prefix, self.output_dir,
+                                                     contig_store=self.contig_store)
+        self.annotation.run()
+        return self.annotation.output_files()
+
+    def build_tables(self, gff_file, protein_file):
+        """Parse the annotation with GFFParser, reusing the checksums computed by the annotation tool."""
+        self.parser = GFFParser(self.assembly_file, gff_file, protein_file,
+                                assembly_md5=self.annotation.assembly_md5,
+                                contig_md5s=self.annotation.contig_md5s,
+                                gff_md5=self.annotation.gff_md5,
+                                protein_store=self.protein_store)
+        self.parser.calculate_md5_checksums()
+        self.parser.prepare_gff3_data()
+        self.parser.prepare_protein_associations()
+        self.parser.match_proteins_to_features()
+        return self.parser
+
+    def run(self, features_tsv, associations_tsv, protein_associations_tsv, append=False):
+        """Annotate the assembly and write the three feature tables."""
+        gff_file, protein_file = self.annotate()
+        parser = self.build_tables(gff_file, protein_file)
+        parser.save_as_tsv(features_tsv, associations_tsv, protein_associations_tsv, append=append)
+        return parser
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Annotate assemblies with Prodigal or Prokka and generate feature TSV outputs.")
+    parser.add_argument('assembly_file', nargs='?', help='Path to the assembly FASTA file (single run)')
+    parser.add_argument('prefix', nargs='?', help='Prefix for the annotation outputs (single run)')
+    parser.add_argument('output_dir', nargs='?', help='Output directory for the annotation files (single run)')
+    parser.add_argument('--batch', type=str, help='Tab-delimited file with assembly_file, prefix and output_dir per line')
+    parser.add_argument('--annotator', type=str, choices=sorted(ANNOTATORS), default='prodigal', help='Annotation tool to run')
+    parser.add_argument('--features_output', type=str, default='features.tsv', help='Output TSV file for features')
+    parser.add_argument('--associations_output', type=str, default='feature_associations.tsv', help='Output TSV file for feature associations')
+    parser.add_argument('--protein_associations_output', type=str, default='feature_protein_associations.tsv', help='Output TSV file for feature-protein associations')
+    parser.add_argument('--sqlite', type=str, default=None, help='Load the tables into this SQLite database instead of writing TSV files')
+    parser.add_argument('--binary_ids', action='store_true', help='With --sqlite, store MD5 ID columns as 16-byte BLOBs instead of hex text')
+    parser.add_argument('--protein_store', type=str, default=None, help='Directory of a deduplicated protein sequence store to add the proteins to')
+    parser.add_argument('--contig_store', type=str, default=None, help='Directory of a contig sequence store to add the contigs to')
+    add_profiling_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args)
+
+    if args.batch:
+        with open(args.batch, 'r') as f:
+            jobs = [row[:3] for row in csv.reader(f, delimiter='\t') if len(row) >= 3]
+    elif args.assembly_file and args.prefix and args.output_dir:
+        jobs = [(args.assembly_file, args.prefix, args.output_dir)]
+    else:
+        print("Usage: python -m cdm_utils.annotation_pipeline <assembly_file> <prefix> <output_dir> [--annotator prodigal|prokka]")
+        print("   or: python -m cdm_utils.annotation_pipeline --batch <jobs.tsv> [--annotator prodigal|prokka]")
+        sys.exit(1)
+
+    loader = SQLiteLoader(args.sqlite, binary_ids=args.binary_ids) if args.sqlite else None
+    protein_store = ProteinStore(args.protein_store) if args.protein_store else None
+    contig_store = ContigStore(args.contig_store) if args.contig_store else None
+    for index, (assembly_file, prefix, output_dir) in enumerate(jobs):
+        print(f"Annotating {assembly_file} with {args.annotator}")
+        pipeline = AnnotationPipeline(assembly_file, prefix, output_dir, annotator=args.annotator,
+                                      protein_store=protein_store, contig_store=contig_store)
+        if loader:
+            gff_file, protein_file = pipeline.annotate()
+            loader.load_gff_parser(pipeline.build_tables(gff_file, protein_file))
+        else:
+            pipeline.run(args.features_output, args.associations_output, args.protein_associations_output,
+                         append=index > 0)
+    if loader:
+        loader.close()
+    if protein_store:
+        protein_store.close()
+    if contig_store:
+        contig_store.close()
+    finish_profiling()
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,26 @@
 import hashlib
 import sys
 import gzip
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from .bbmap_assembly_stats import BBMapAssemblyStats
+from .profiling import profiled, add_profiling_arguments, start_profiling, finish_profiling
+
+# Columns of the assembly table with their SQL types, in output order
+ASSEMBLY_COLUMNS = [
+    ('id', 'TEXT'), ('assembly_file', 'TEXT'),
+    ('A_content', 'REAL'), ('C_content', 'REAL'), ('G_content', 'REAL'), ('T_content', 'REAL'), ('N_content', 'REAL'),
+    ('IUPAC_content', 'REAL'), ('Other_content', 'REAL'), ('GC_content', 'REAL'), ('GC_stdev', 'REAL'),
+    ('scaffold_total', 'INTEGER'), ('contig_total', 'INTEGER'),
+    ('scaffold_sequence_total', 'INTEGER'), ('contig_sequence_total', 'INTEGER'), ('contig_gap_percentage', 'REAL'),
+    ('scaffold_N50', 'INTEGER'), ('scaffold_L50', 'INTEGER'), ('contig_N50', 'INTEGER'), ('contig_L50', 'INTEGER'),
+    ('scaffold_N90', 'INTEGER'), ('scaffold_L90', 'INTEGER'), ('contig_N90', 'INTEGER'), ('contig_L90', 'INTEGER'),
+    ('max_scaffold_length', 'INTEGER'), ('max_contig_length', 'INTEGER'),
+    ('large_scaffold_count_gt_50kb', 'INTEGER'), ('percent_genome_in_large_scaffolds_gt_50kb', 'REAL'),
+]
+
+# IUPAC ambiguity codes other than N, counted as IUPAC_content like stats.sh does
+IUPAC_CODES = 'RYSWKMBDHV'
 
 class AssemblyTable:
     def __init__(self, assembly_paths_file):
@@ -9,6 +28,7 @@ class AssemblyTable:
         self.assemblies = []  # Store assembly statistics here
         self.bbmap_parser = BBMapAssemblyStats()
 
+    @profiled('assembly_table.compute_md5', input_file=lambda self, assembly_file: assembly_file)
     def compute_md5(self, assembly_file):
         """
         Compute the MD5 checksum of the assembly file content,
@@ -25,20 +45,66 @@ class AssemblyTable:
 
         return md5_hash.hexdigest()
 
+    @profiled('assembly_table.compute_md5_and_composition', input_file=lambda self, assembly_file: assembly_file)
+    def compute_md5_and_composition(self, assembly_file):
+        """
+        Compute the MD5 checksum like compute_md5 and, in the same pass over the file, the base
+        composition columns that statswrapper.sh format=3 does not report. As in stats.sh, A, C,
+        G and T are fractions of the ACGT bases and N, IUPAC and Other fractions of all bases.
+        """
+        md5_hash = hashlib.md5()
+        counts = dict.fromkeys('ACGTN', 0)
+        iupac = total = 0
+
+        open_func = gzip.open if assembly_file.endswith('.gz') else open
+
+        with open_func(assembly_file, 'rt') as f:
+            for line in f:
+                md5_hash.update(line.encode('utf-8'))
+                if line.startswith('>'):
+                    continue
+                sequence = line.rstrip('\r\n').upper()
+                total += len(sequence)
+                for base in counts:
+                    counts[base] += sequence.count(base)
+                for code in IUPAC_CODES:
+                    iupac += sequence.count(code)
+
+        acgt = counts['A'] + counts['C'] + counts['G'] + counts['T']
+        composition = {f'{base}_content': round(counts[base] / acgt, 4) if acgt else 0.0 for base in 'ACGT'}
+        composition['N_content'] = round(counts['N'] / total, 4) if total else 0.0
+        composition['IUPAC_content'] = round(iupac / total, 4) if total else 0.0
+        composition['Other_content'] = round((total - acgt - counts['N'] - iupac) / total, 4) if total else 0.0
+        return md5_hash.hexdigest(), composition
+
     def run_bbmap_and_parse(self, assembly_file):
         """
         Run BBMap assembly stats and parse the output.
         """
         bbmap_output = self.bbmap_parser.run_bbmap_stats(assembly_file)
         if bbmap_output:
-            # Parse the BBMap stats.sh output
-            self.bbmap_parser.parse_bbmap_output(bbmap_output)
-            # Get and return the parsed stats
-            return self.bbmap_parser.get_stats()
+            # Parse the BBMap stats.sh output into a new stats dictionary for this assembly
+            return self.bbmap_parser.parse_bbmap_output(bbmap_output)
         else:
             print(f"BBMap stats.sh output is empty or invalid for {assembly_file}.")
             return None
 
+    def run_bbmap_batch_and_parse(self, assembly_files):
+        """
+        Run BBMap statswrapper.sh on a group of assemblies in one JVM and parse the output.
+        Returns the parsed stats in the order of assembly_files, or None when BBMap did not
+        report exactly one row per assembly.
+        """
+        bbmap_output = self.bbmap_parser.run_bbmap_stats_batch(assembly_files)
+        if not bbmap_output:
+            print(f"BBMap statswrapper.sh output is empty or invalid for {len(assembly_files)} assemblies.")
+            return None
+        parsed = self.bbmap_parser.parse_statswrapper_output(bbmap_output)
+        if len(parsed) != len(assembly_files):
+            print(f"BBMap statswrapper.sh reported {len(parsed)} rows for {len(assembly_files)} assemblies.")
+            return None
+        return parsed
+
     def add_assembly(self, md5sum, assembly_file, parsed_data):
         """
         Add an assembly record with stats to the assemblies list.
@@ -48,85 +114,136 @@ class AssemblyTable:
             return
 
         # Extract relevant fields for the assembly table
-        assembly_record = {
-            'id': md5sum,
-            'assembly_file': assembly_file,
-            'A_content': parsed_data.get('A_content', None),
-            'C_content': parsed_data.get('C_content', None),
-            'G_content': parsed_data.get('G_content', None),
-            'T_content': parsed_data.get('T_content', None),
-            'N_content': parsed_data.get('N_content', None),
-            'IUPAC_content': parsed_data.get('IUPAC_content', None),
-            'Other_content': parsed_data.get('Other_content', None),
-            'GC_content': parsed_data.get('GC_content', None),
-            'GC_stdev': parsed_data.get('GC_stdev', None),
-            'scaffold_total': parsed_data.get('scaffold_total', None),
-            'contig_total': parsed_data.get('contig_total', None),
-            'scaffold_sequence_total': parsed_data.get('scaffold_sequence_total', None),
-            'contig_sequence_total': parsed_data.get('contig_sequence_total', None),
-            'contig_gap_percentage': parsed_data.get('contig_gap_percentage', None),
-            'scaffold_N50': parsed_data.get('scaffold_N50', None),
-            'scaffold_L50': parsed_data.get('scaffold_L50', None),
-            'contig_N50': parsed_data.get('contig_N50', None),
-            'contig_L50': parsed_data.get('contig_L50', None),
-            'scaffold_N90': parsed_data.get('scaffold_N90', None),
-            'scaffold_L90': parsed_data.get('scaffold_L90', None),
-            'max_scaffold_length': parsed_data.get('max_scaffold_length', None),
-            'max_contig_length': parsed_data.get('max_contig_length', None),
-            'large_scaffold_count_gt_50kb': parsed_data.get('large_scaffold_count_gt_50kb', None),
-            'percent_genome_in_large_scaffolds_gt_50kb': parsed_data.get('percent_genome_in_large_scaffolds_gt_50kb', None)
-        }
+        assembly_record = {'id': md5sum, 'assembly_file': assembly_file}
+        for column, _ in ASSEMBLY_COLUMNS[2:]:
+            assembly_record[column] = parsed_data.get(column, None)
 
         self.assemblies.append(assembly_record)
 
-    def write_to_tsv(self, output_file):
+    def write_to_tsv(self, output_file, append=False):
         """
         Write the assembly statistics to a TSV file for database loading.
+        With append, rows are added to an existing file and the header is only written to a new or empty one.
         """
-        with open(output_file, 'w') as tsvfile:
+        with open(output_file, 'a' if append else 'w') as tsvfile:
             # Write the header row
-            header = [
-                "id", "assembly_file", "A_content", "C_content", "G_content", "T_content", "N_content",
-                "IUPAC_content", "Other_content", "GC_content", "GC_stdev",
-                "scaffold_total", "contig_total", "scaffold_sequence_total",
-                "contig_sequence_total", "contig_gap_percentage", "scaffold_N50",
-                "scaffold_L50", "contig_N50", "contig_L50", "scaffold_N90",
-                "scaffold_L90", "max_scaffold_length", "max_contig_length",
-                "large_scaffold_count_gt_50kb", "percent_genome_in_large_scaffolds_gt_50kb"
-            ]
-            tsvfile.write('\t'.join(header) + '\n')
+            header = [column for column, _ in ASSEMBLY_COLUMNS]
+            if not append or tsvfile.tell() == 0:
+                tsvfile.write('\t'.join(header) + '\n')
 
             # Write the assembly data
             for assembly in self.assemblies:
                 row = [str(assembly[col] if assembly[col] is not None else '') for col in header]
                 tsvfile.write('\t'.join(row) + '\n')
 
-    def process_assemblies(self, output_file):
+    def process_assembly(self, assembly_file):
+        """
+        Compute the MD5 checksum of one assembly, run BBMap stats.sh on it and add it to the table.
+        """
+        try:
+            # Compute MD5 checksum
+            md5sum = self.compute_md5(assembly_file)
+
+            # Run BBMap and parse output
+            parsed_data = self.run_bbmap_and_parse(assembly_file)
+
+            if parsed_data:
+                # Add assembly data to the table
+                self.add_assembly(md5sum, assembly_file, parsed_data)
+                print(f"Processed and added data for assembly file {assembly_file}.")
+            else:
+                print(f"Failed to process data for assembly file {assembly_file}.")
+        except Exception as e:
+            print(f"Error processing assembly file {assembly_file}: {e}")
+
+    def process_assembly_batches(self, assembly_paths, batch_size):
+        """
+        Process the assemblies in groups of batch_size, running BBMap once per group.
+        The base composition columns are counted while hashing each assembly.
+        statswrapper.sh splits its input list on commas, so paths containing a comma, and all
+        assemblies of a group that statswrapper.sh fails on, are run through stats.sh one by one.
+        """
+        for i in range(0, len(assembly_paths), batch_size):
+            batch = assembly_paths[i:i + batch_size]
+            batched = [assembly_file for assembly_file in batch if ',' not in assembly_file]
+            parsed_list = None
+            if batched:
+                try:
+                    parsed_list = self.run_bbmap_batch_and_parse(batched)
+                except Exception as e:
+                    print(f"Error running BBMap on batch starting with {batched[0]}: {e}")
+                if parsed_list is None:
+                    print(f"Falling back to stats.sh for each assembly of the batch starting with {batched[0]}.")
+
+            parsed_iter = iter(parsed_list or [])
+            for assembly_file in batch:
+                if parsed_list is None or ',' in assembly_file:
+                    self.process_assembly(assembly_file)
+                    continue
+                parsed_data = next(parsed_iter)
+                try:
+                    md5sum, composition = self.compute_md5_and_composition(assembly_file)
+                    if parsed_data:
+                        self.add_assembly(md5sum, assembly_file, dict(parsed_data, **composition))
+                        print(f"Processed and added data for assembly file {assembly_file}.")
+                    else:
+                        print(f"Failed to process data for assembly file {assembly_file}.")
+                except Exception as e:
+                    print(f"Error processing assembly file {assembly_file}: {e}")
+
+    def process_assemblies_concurrently(self, assembly_paths, hash_workers=4, max_stats_processes=2):
+        """
+        Process the assemblies with MD5 hashing overlapped with BBMap stats.sh runs.
+        Hashing runs on hash_workers threads and at most max_stats_processes stats.sh
+        subprocesses are in flight; results are added in the order of assembly_paths.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, hash_workers)) as hash_pool, \
+                ThreadPoolExecutor(max_workers=max(1, max_stats_processes)) as stats_pool:
+            pending = [(assembly_file,
+                        hash_pool.submit(self.compute_md5, assembly_file),
+                        stats_pool.submit(self.run_bbmap_and_parse, assembly_file))
+                       for assembly_file in assembly_paths]
+
+            for assembly_file, md5_future, stats_future in pending:
+                try:
+                    md5sum = md5_future.result()
+                    parsed_data = stats_future.result()
+                    if parsed_data:
+                        self.add_assembly(md5sum, assembly_file, parsed_data)
+                        print(f"Processed and added data for assembly file {assembly_file}.")
+                    else:
+                        print(f"Failed to process data for assembly file {assembly_file}.")
+                except Exception as e:
+                    print(f"Error processing assembly file {assembly_file}: {e}")
+
+    def process_assemblies(self, output_file, batch_size=None, hash_workers=None, max_stats_processes=None):
         """
         Process each assembly file path from the assembly_paths_file, run BBMap stats, and save the results to a TSV file.
 
         Parameters:
         - output_file: Path to the output TSV file.
+        - batch_size: If set, run BBMap statswrapper.sh on groups of this many assemblies instead of stats.sh per assembly.
+        - hash_workers: If set, compute MD5 checksums on this many threads concurrently with stats.sh.
+        - max_stats_processes: If set, the maximum number of stats.sh subprocesses running at once.
         """
         with open(self.assembly_paths_file, 'r') as f:
-            assembly_paths = f.read().splitlines()
+            assembly_paths = [path for path in f.read().splitlines() if path]
+
+        if batch_size:
+            self.process_assembly_batches(assembly_paths, batch_size)
+            self.write_to_tsv(output_file)
+            print(f"TSV data successfully saved to {output_file}")
+            return
+
+        if hash_workers or max_stats_processes:
+            self.process_assemblies_concurrently(assembly_paths, hash_workers=hash_workers or 4,
+                                                 max_stats_processes=max_stats_processes or 2)
+            self.write_to_tsv(output_file)
+            print(f"TSV data successfully saved to {output_file}")
+            return
 
         for assembly_file in assembly_paths:
-            try:
-                # Compute MD5 checksum
-                md5sum = self.compute_md5(assembly_file)
-
-                # Run BBMap and parse output
-                parsed_data = self.run_bbmap_and_parse(assembly_file)
-
-                if parsed_data:
-                    # Add assembly data to the table
-                    self.add_assembly(md5sum, assembly_file, parsed_data)
-                    print(f"Processed and added data for assembly file {assembly_file}.")
-                else:
-                    print(f"Failed to process data for assembly file {assembly_file}.")
-            except Exception as e:
-                print(f"Error processing assembly file {assembly_file}: {e}")
+            self.process_assembly(assembly_file)
 
         # Write results to TSV file
         self.write_to_tsv(output_file)
@@ -135,13 +252,25 @@ class AssemblyTable:
 
 # Example usage with sys.argv[1] for input file
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python assembly_table.py <assembly_paths_file>")
-        sys.exit(1)
-
-    assembly_paths_file = sys.argv[1]  # Read the input file path from command line argument
-    output_tsv_path = "assembly_output.tsv"  # Define the output file path
+    parser = argparse.ArgumentParser(description="Compute assembly statistics with BBMap and save them to a TSV file.")
+    parser.add_argument('assembly_paths_file', type=str, help='File with one assembly path per line')
+    parser.add_argument('--output', type=str, default='assembly_output.tsv', help='Output TSV file')
+    parser.add_argument('--batch_size', type=int, default=None, help='Run BBMap statswrapper.sh on groups of this many assemblies')
+    parser.add_argument('--hash_workers', type=int, default=None, help='Number of threads computing MD5 checksums concurrently with stats.sh')
+    parser.add_argument('--max_stats_processes', type=int, default=None, help='Maximum number of stats.sh subprocesses running at once')
+    parser.add_argument('--sqlite', type=str, default=None, help='Also load the assembly table into this SQLite database')
+    parser.add_argument('--binary_ids', action='store_true', help='With --sqlite, store MD5 ID columns as 16-byte BLOBs instead of hex text')
+    add_profiling_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args)
 
-    assembly_table = AssemblyTable(assembly_paths_file)
-    assembly_table.process_assemblies(output_tsv_path)
+    assembly_table = AssemblyTable(args.assembly_paths_file)
+    assembly_table.process_assemblies(args.output, batch_size=args.batch_size, hash_workers=args.hash_workers,
+                                      max_stats_processes=args.max_stats_processes)
+    if args.sqlite:
+        from .sql_loader import SQLiteLoader
+        loader = SQLiteLoader(args.sqlite, binary_ids=args.binary_ids)
+        loader.load_assembly_table(assembly_table)
+        loader.close()
+    finish_profiling()
 
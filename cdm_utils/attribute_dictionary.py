@@ -0,0 +1,182 @@
+import os
+import csv
+import argparse
+
+# Normalized attribute tables and their columns, in output order
+ATTRIBUTE_KEY_FIELDS = ['key_id', 'key']
+ATTRIBUTE_VALUE_FIELDS = ['value_id', 'key_id', 'value']
+FEATURE_KEY_FIELDS = ['feature_key', 'feature_id']
+ATTRIBUTE_REF_FIELDS = ['feature_key', 'value_id']
+ATTRIBUTE_INLINE_FIELDS = ['feature_key', 'key_id', 'value']
+
+NORMALIZED_TABLES = {
+    'attribute_keys': ATTRIBUTE_KEY_FIELDS,
+    'attribute_values': ATTRIBUTE_VALUE_FIELDS,
+    'feature_keys': FEATURE_KEY_FIELDS,
+    'feature_attribute_refs': ATTRIBUTE_REF_FIELDS,
+    'feature_attribute_values': ATTRIBUTE_INLINE_FIELDS,
+}
+
+# Keys whose values are (nearly) unique per feature, so interning them would only cost memory
+INLINE_KEYS = ('ID', 'Name', 'Parent', 'Dbxref', 'locus_tag', 'old_locus_tag', 'protein_id')
+
+class NormalizedAttributeWriter:
+    """
+    Write feature attributes as a key dictionary, a table of interned values, a table of feature
+    keys and two compact association tables instead of one (feature_id, key, value) row per attribute.
+
+    - attribute_keys: one row per distinct key.
+    - attribute_values: one row per interned value, with the key it belongs to.
+    - feature_keys: (feature_key, feature_id), giving the 32-character feature_id an integer key.
+      A key is given to each run of consecutive rows of one feature, which is every feature of a
+      parser's output, so only the current feature has to be remembered.
+    - feature_attribute_refs: (feature_key, value_id) for attributes with an interned value.
+    - feature_attribute_values: (feature_key, key_id, value) for attributes whose key is not interned.
+
+    Values of a key are interned until the first sample_size occurrences show more than
+    max_distinct_ratio distinct values; after that new values of the key are written inline,
+    while values already interned keep their IDs. Keys in inline_keys are never interned, and
+    no more than max_values values are interned in total. Dictionary rows are written as soon
+    as they are created, and an existing directory is extended with the IDs continuing.
+    """
+
+    def __init__(self, directory, sample_size=10000, max_distinct_ratio=0.5, max_values=5000000, inline_keys=INLINE_KEYS):
+        self.directory = directory
+        self.sample_size = sample_size
+        self.max_distinct_ratio = max_distinct_ratio
+        self.max_values = max_values
+        self.inline_keys = set(inline_keys)
+        self.key_ids = {}
+        self.value_ids = {}  # (key_id, value) to value_id
+        self.key_counts = {}  # key_id to [occurrences, distinct values interned]
+        self.inlined = set()  # Keys no longer interned
+        self.feature_count = 0
+        self.feature_id = None  # The feature of the previous row and its key
+        self.feature_key = None
+        self.rows = 0
+        os.makedirs(directory, exist_ok=True)
+        self.load_dictionary()
+        self.inlined.update(key_id for key, key_id in self.key_ids.items() if key in self.inline_keys)
+
+        self.files = {}
+        self.writers = {}
+        for table, fields in NORMALIZED_TABLES.items():
+            path = os.path.join(directory, f"{table}.tsv")
+            write_header = not (os.path.exists(path) and os.path.getsize(path) > 0)
+            self.files[table] = open(path, 'a', newline='')
+            self.writers[table] = csv.writer(self.files[table], delimiter='\t')
+            if write_header:
+                self.writers[table].writerow(fields)
+
+    def load_dictionary(self):
+        """Read the keys and interned values already written to the directory."""
+        path = os.path.join(self.directory, 'feature_keys.tsv')
+        if os.path.exists(path):
+            with open(path, 'r', newline='') as f:
+                self.feature_count = max(sum(1 for _ in f) - 1, 0)
+        for table, target in (('attribute_keys', self.key_ids), ('attribute_values', self.value_ids)):
+            path = os.path.join(self.directory, f"{table}.tsv")
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', newline='') as f:
+                reader = csv.reader(f, delimiter='\t')
+                next(reader, None)
+                for row in reader:
+                    if table == 'attribute_keys':
+                        target[row[1]] = int(row[0])
+                    else:
+                        target[(int(row[1]), row[2])] = int(row[0])
+
+    def key_id(self, key):
+        key_id = self.key_ids.get(key)
+        if key_id is None:
+            key_id = self.key_ids[key] = len(self.key_ids) + 1
+            self.writers['attribute_keys'].writerow((key_id, key))
+            if key in self.inline_keys:
+                self.inlined.add(key_id)
+        return key_id
+
+    def value_id(self, key_id, value):
+        """Return the ID of an interned value, interning it if the key still qualifies, or None."""
+        value_id = self.value_ids.get((key_id, value))
+        if key_id in self.inlined:
+            return value_id
+        counts = self.key_counts.setdefault(key_id, [0, 0])
+        counts[0] += 1
+        if value_id is not None:
+            return value_id
+
+        if counts[0] >= self.sample_size and counts[1] > counts[0] * self.max_distinct_ratio:
+            self.inlined.add(key_id)
+            return None
+        if len(self.value_ids) >= self.max_values:
+            return None
+
+        counts[1] += 1
+        value_id = self.value_ids[(key_id, value)] = len(self.value_ids) + 1
+        self.writers['attribute_values'].writerow((value_id, key_id, value))
+        return value_id
+
+    def writerows(self, associations):
+        """Write (feature_id, key, value) rows. Returns the number of rows written."""
+        refs = self.writers['feature_attribute_refs']
+        inline = self.writers['feature_attribute_values']
+        features = self.writers['feature_keys']
+        count = 0
+        for feature_id, key, value in associations:
+            if feature_id != self.feature_id:
+                self.feature_count += 1
+                self.feature_id, self.feature_key = feature_id, self.feature_count
+                features.writerow((self.feature_key, feature_id))
+            key_id = self.key_id(key)
+            value_id = self.value_id(key_id, value)
+            if value_id is None:
+                inline.writerow((self.feature_key, key_id, value))
+            else:
+                refs.writerow((self.feature_key, value_id))
+            count += 1
+        self.rows += count
+        return count
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        print(f"Wrote {self.rows} attributes of {self.feature_count} features to {self.directory} "
+              f"with {len(self.key_ids)} keys and {len(self.value_ids)} interned values")
+
+def read_normalized_attributes(directory):
+    """Yield (feature_id, key, value) rows back from a normalized attribute directory."""
+    def rows(table):
+        with open(os.path.join(directory, f"{table}.tsv"), 'r', newline='') as f:
+            reader = csv.reader(f, delimiter='\t')
+            next(reader, None)
+            yield from reader
+
+    keys = {key_id: key for key_id, key in rows('attribute_keys')}
+    values = {value_id: (keys[key_id], value) for value_id, key_id, value in rows('attribute_values')}
+    features = {feature_key: feature_id for feature_key, feature_id in rows('feature_keys')}
+    for feature_key, value_id in rows('feature_attribute_refs'):
+        key, value = values[value_id]
+        yield features[feature_key], key, value
+    for feature_key, key_id, value in rows('feature_attribute_values'):
+        yield features[feature_key], keys[key_id], value
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a feature_associations TSV file to normalized attribute tables, or back.")
+    parser.add_argument('associations_tsv', type=str, help='feature_associations TSV file (read, or written with --expand)')
+    parser.add_argument('directory', type=str, help='Directory of the normalized attribute tables')
+    parser.add_argument('--expand', action='store_true', help='Write the normalized tables back out as a feature_associations TSV file')
+    args = parser.parse_args()
+
+    if args.expand:
+        with open(args.associations_tsv, 'w', newline='') as f:
+            writer = csv.writer(f, delimiter='\t')
+            writer.writerow(['feature_id', 'key', 'value'])
+            writer.writerows(read_normalized_attributes(args.directory))
+    else:
+        attribute_writer = NormalizedAttributeWriter(args.directory)
+        with open(args.associations_tsv, 'r', newline='') as f:
+            reader = csv.reader(f, delimiter='\t')
+            next(reader, None)
+            attribute_writer.writerows(reader)
+        attribute_writer.close()
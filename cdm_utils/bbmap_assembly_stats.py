@@ -5,6 +5,11 @@ import sys
 import os
 import tempfile
 import shutil
+from .profiling import profiled
+
+# Multipliers for the length units used by stats.sh in its default (format=1) report
+LENGTH_UNITS = {'BP': 1, 'KB': 1000, 'MB': 1000000, 'GB': 1000000000}
+
 class BBMapAssemblyStats:
     def __init__(self, config_file='config.ini'):
         # Initialize an empty dictionary to store the parsed data
@@ -18,13 +23,20 @@ class BBMapAssemblyStats:
             print("stats.sh not found in PATH")
            # Get the path to the stats.sh binary
 
+        # statswrapper.sh runs stats.sh on many files in a single JVM
+        self.statswrapper_path = shutil.which('statswrapper.sh')
+        if not self.statswrapper_path and stats_path:
+            self.statswrapper_path = os.path.join(os.path.dirname(stats_path), 'statswrapper.sh')
+
+    @profiled('bbmap.stats', input_file=lambda self, assembly_file: assembly_file)
     def run_bbmap_stats(self, assembly_file):
         """
         Run BBMap's stats.sh on the provided assembly file and return the output.
+        format=2 keeps the text report layout but prints lengths as whole numbers of bases.
         """
         try:
             # Create a temporary file to store the output
-            args = [self.stats_path, f'in={assembly_file}']
+            args = [self.stats_path, f'in={assembly_file}', 'format=2']
             # Run the stats.sh command and redirect output to the temp file
             result = subprocess.run(args,
                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
@@ -42,71 +54,169 @@ class BBMapAssemblyStats:
 
 
 
-    def parse_bbmap_output(self, output):
-        lines = output.splitlines()
-
-        # Remove empty lines and trim each line
-        lines = [line.strip() for line in lines if line.strip()]
-
-        for i, line in enumerate(lines):
-            if line.startswith("A\tC\tG\tT\tN\tIUPAC\tOther\tGC\tGC_stdev"):
-                # The next line contains the values
-                values = lines[i + 1].split("\t")
-                self.stats['A_content'] = float(values[0])
-                self.stats['C_content'] = float(values[1])
-                self.stats['G_content'] = float(values[2])
-                self.stats['T_content'] = float(values[3])
-                self.stats['N_content'] = float(values[4])
-                self.stats['IUPAC_content'] = float(values[5])
-                self.stats['Other_content'] = float(values[6])
-                self.stats['GC_content'] = float(values[7])
-                self.stats['GC_stdev'] = float(values[8])
-
-            elif line.startswith("Main genome scaffold total:"):
-                self.stats['scaffold_total'] = int(line.split("\t")[1])
-            elif line.startswith("Main genome contig total:"):
-                self.stats['contig_total'] = int(line.split("\t")[1])
-            elif line.startswith("Main genome scaffold sequence total:"):
-                self.stats['scaffold_sequence_total'] = line.split("\t")[1]
-            elif line.startswith("Main genome contig sequence total:"):
-                parts = line.split("\t")
-                self.stats['contig_sequence_total'] = parts[1]
-                self.stats['contig_gap_percentage'] = parts[2].strip()
-            elif line.startswith("Main genome scaffold N/L50:"):
-                nl50 = line.split("\t")[1].split("/")
-                self.stats['scaffold_N50'] = f"{nl50[0]} {nl50[1].split()[1]}"
-                self.stats['scaffold_L50'] = nl50[1]
-            elif line.startswith("Main genome contig N/L50:"):
-                nl50 = line.split("\t")[1].split("/")
-                self.stats['contig_N50'] = f"{nl50[0]} {nl50[1].split()[1]}"
-                self.stats['contig_L50'] = nl50[1]
-            elif line.startswith("Main genome scaffold N/L90:"):
-                nl90 = line.split("\t")[1].split("/")
-                self.stats['scaffold_N90'] = f"{nl90[0]} {nl90[1].split()[1]}"
-                self.stats['scaffold_L90'] = nl90[1]
-            elif line.startswith("Main genome contig N/L90:"):
-                nl90 = line.split("\t")[1].split("/")
-                self.stats['contig_N90'] = f"{nl90[0]} {nl90[1].split()[1]}"
-                self.stats['contig_L90'] = nl90[1]
-            elif line.startswith("Max scaffold length:"):
-                self.stats['max_scaffold_length'] = line.split("\t")[1]
-            elif line.startswith("Max contig length:"):
-                self.stats['max_contig_length'] = line.split("\t")[1]
-            elif line.startswith("Number of scaffolds > 50 KB:"):
-                self.stats['large_scaffold_count_gt_50kb'] = int(line.split("\t")[1])
-            elif line.startswith("% main genome in scaffolds > 50 KB:"):
-                self.stats['percent_genome_in_large_scaffolds_gt_50kb'] = float(line.split("\t")[1].strip('%'))
-
-
-
+    @profiled('bbmap.statswrapper', item=lambda self, assembly_files: assembly_files[0] if assembly_files else None)
+    def run_bbmap_stats_batch(self, assembly_files):
+        """
+        Run BBMap's statswrapper.sh on a group of assembly files in one JVM and return the
+        tabular output (format=3, one header line and one line per file).
+        Raises ValueError for paths containing a comma, which statswrapper.sh would split.
+        """
+        comma_paths = [assembly_file for assembly_file in assembly_files if ',' in assembly_file]
+        if comma_paths:
+            raise ValueError(f"statswrapper.sh cannot read paths containing a comma: {comma_paths}")
+        try:
+            args = [self.statswrapper_path, 'in=' + ','.join(assembly_files), 'format=3']
+            result = subprocess.run(args,
+                  stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+            )
+            return result.stdout.decode('utf-8') if result.stdout else None
 
+        except subprocess.CalledProcessError as e:
+            print(f"An error occurred while running BBMap statswrapper.sh: {e}")
+            return None
 
+    @staticmethod
+    def parse_length(value):
+        """
+        Convert a stats.sh length such as '1879126', '1,879,126', '247.538 KB' or '1.879 MB' to base pairs.
+        Values reported in KB are exact; values in MB or GB are only as exact as their three decimals.
+        """
+        parts = value.replace(',', '').split()
+        number = float(parts[0])
+        unit = parts[1].upper() if len(parts) > 1 else 'BP'
+        return int(round(number * LENGTH_UNITS.get(unit, 1)))
+
+    @classmethod
+    def parse_count_and_length(cls, value):
+        """Split a stats.sh N/L value such as '2/247.538 KB' into a count and a length in base pairs."""
+        count, length = value.split('/')
+        return int(count), cls.parse_length(length)
+
+    def parse_statswrapper_output(self, output):
+        """
+        Parse the tabular output of statswrapper.sh format=3 into one stats dictionary per file,
+        using the same keys as parse_bbmap_output. Returns a list in the order of the input files,
+        since the filename column is whatever path BBMap echoes back.
+        The per-base composition fields (A_content etc.) are not part of format=3 and are omitted.
+        """
+        lines = [line.rstrip('\n') for line in output.splitlines() if line.strip()]
+        stats_list = []
+        header = None
+
+        for line in lines:
+            values = line.split('\t')
+            if values[0] == 'n_scaffolds':
+                header = values
+                continue
+            if header is None or len(values) != len(header):
+                continue
+
+            row = dict(zip(header, values))
+            stats_list.append({
+                'GC_content': float(row['gc_avg']),
+                'GC_stdev': float(row['gc_std']),
+                'scaffold_total': int(row['n_scaffolds']),
+                'contig_total': int(row['n_contigs']),
+                'scaffold_sequence_total': int(row['scaf_bp']),
+                'contig_sequence_total': int(row['contig_bp']),
+                'contig_gap_percentage': float(row['gap_pct']),
+                'scaffold_N50': int(row['scaf_N50']),
+                'scaffold_L50': int(row['scaf_L50']),
+                'contig_N50': int(row['ctg_N50']),
+                'contig_L50': int(row['ctg_L50']),
+                'scaffold_N90': int(row['scaf_N90']),
+                'scaffold_L90': int(row['scaf_L90']),
+                'contig_N90': int(row['ctg_N90']),
+                'contig_L90': int(row['ctg_L90']),
+                'max_scaffold_length': int(row['scaf_max']),
+                'max_contig_length': int(row['ctg_max']),
+                'large_scaffold_count_gt_50kb': int(row['scaf_n_gt50K']),
+                'percent_genome_in_large_scaffolds_gt_50kb': float(row['scaf_pct_gt50K'])
+            })
+
+        return stats_list
 
+    def parse_bbmap_output(self, output):
+        """
+        Parse the text output of stats.sh into a new stats dictionary, which is both stored
+        on this object and returned, so values from a previous assembly never carry over.
+        Counts are integers, lengths are integers in base pairs and percentages are floats;
+        following BBMap, N50/N90 are scaffold or contig counts and L50/L90 are lengths.
+        """
+        parser = StatsReportParser()
+        for line in output.splitlines():
+            parser.feed(line)
+        self.stats = parser.stats
+        return parser.stats
 
     def get_stats(self):
         # Return the parsed genome stats as a dictionary
         return self.stats
 
+class StatsReportParser:
+    """
+    Incremental parser for the text report of stats.sh. Lines are fed one at a time as they
+    are read from the process, so the report never has to be held in memory as a whole.
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self.composition_header = False  # The line after the composition header holds its values
+
+    def feed(self, line):
+        """Parse one line of the report into self.stats."""
+        line = line.strip()
+        if not line:
+            return
+        stats = self.stats
+
+        if self.composition_header:
+            self.composition_header = False
+            values = line.split("\t")
+            stats['A_content'] = float(values[0])
+            stats['C_content'] = float(values[1])
+            stats['G_content'] = float(values[2])
+            stats['T_content'] = float(values[3])
+            stats['N_content'] = float(values[4])
+            stats['IUPAC_content'] = float(values[5])
+            stats['Other_content'] = float(values[6])
+            stats['GC_content'] = float(values[7])
+            stats['GC_stdev'] = float(values[8])
+
+        if line.startswith("A\tC\tG\tT\tN\tIUPAC\tOther\tGC\tGC_stdev"):
+            self.composition_header = True
+        elif line.startswith("Main genome scaffold total:"):
+            stats['scaffold_total'] = int(line.split("\t")[1])
+        elif line.startswith("Main genome contig total:"):
+            stats['contig_total'] = int(line.split("\t")[1])
+        elif line.startswith("Main genome scaffold sequence total:"):
+            stats['scaffold_sequence_total'] = BBMapAssemblyStats.parse_length(line.split("\t")[1])
+        elif line.startswith("Main genome contig sequence total:"):
+            parts = line.split("\t")
+            stats['contig_sequence_total'] = BBMapAssemblyStats.parse_length(parts[1])
+            stats['contig_gap_percentage'] = float(parts[2].split('%')[0])
+        elif line.startswith("Main genome scaffold N/L50:"):
+            stats['scaffold_N50'], stats['scaffold_L50'] = BBMapAssemblyStats.parse_count_and_length(line.split("\t")[1])
+        elif line.startswith("Main genome contig N/L50:"):
+            stats['contig_N50'], stats['contig_L50'] = BBMapAssemblyStats.parse_count_and_length(line.split("\t")[1])
+        elif line.startswith("Main genome scaffold N/L90:"):
+            stats['scaffold_N90'], stats['scaffold_L90'] = BBMapAssemblyStats.parse_count_and_length(line.split("\t")[1])
+        elif line.startswith("Main genome contig N/L90:"):
+            stats['contig_N90'], stats['contig_L90'] = BBMapAssemblyStats.parse_count_and_length(line.split("\t")[1])
+        elif line.startswith("Max scaffold length:"):
+            stats['max_scaffold_length'] = BBMapAssemblyStats.parse_length(line.split("\t")[1])
+        elif line.startswith("Max contig length:"):
+            stats['max_contig_length'] = BBMapAssemblyStats.parse_length(line.split("\t")[1])
+        elif line.startswith("All") and len(line.split("\t")) >= 5:
+            # The 'All' row of the length table has the exact scaffold and contig totals
+            values = line.split("\t")
+            stats['scaffold_sequence_total'] = BBMapAssemblyStats.parse_length(values[3])
+            stats['contig_sequence_total'] = BBMapAssemblyStats.parse_length(values[4])
+        elif line.startswith("Number of scaffolds > 50 KB:"):
+            stats['large_scaffold_count_gt_50kb'] = int(line.split("\t")[1])
+        elif line.startswith("% main genome in scaffolds > 50 KB:"):
+            stats['percent_genome_in_large_scaffolds_gt_50kb'] = float(line.split("\t")[1].strip('%'))
+
 if __name__ == "__main__":
     # Example usage: running BBMap stats and parsing the output
     assembly_file = sys.argv[1]  
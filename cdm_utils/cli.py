@@ -0,0 +1,59 @@
+import sys
+import runpy
+
+# Subcommand name, module run for it, and a one-line description
+COMMANDS = [
+    ('features', 'cdm_utils.feature_and_protein_table', 'Build the feature tables from assembly, GFF and FAA files'),
+    ('annotate', 'cdm_utils.annotation_pipeline', 'Annotate assemblies with Prodigal or Prokka and build the feature tables'),
+    ('prokka', 'cdm_utils.prokka_annotation', 'Run Prokka on one assembly or a batch'),
+    ('prodigal', 'cdm_utils.prodigal_annotation', 'Run Prodigal on one assembly'),
+    ('contigs', 'cdm_utils.contig_table', 'Build the contig table'),
+    ('assemblies', 'cdm_utils.assembly_table', 'Build the assembly table with BBMap statistics'),
+    ('run-tools', 'cdm_utils.tool_runner', 'Run prodigal, prokka and stats.sh on many assemblies concurrently'),
+    ('bbmap-stats', 'cdm_utils.bbmap_assembly_stats', 'Print BBMap statistics for one assembly'),
+    ('ncbi', 'cdm_utils.ncbi_jsonl_parser', 'Parse an NCBI assembly_data_report.jsonl file'),
+    ('observations', 'cdm_utils.observation_and_assembly', 'Build the assembly, observation and protocol tables'),
+    ('sample-tables', 'cdm_utils.create_sample_tables_from_details', 'Build the sample, project, isolate and cultivation tables'),
+    ('sample-info', 'cdm_utils.sample_information_parser', 'Parse sample information JSON'),
+    ('normalize-attributes', 'cdm_utils.attribute_dictionary', 'Convert feature associations to normalized attribute tables, or back'),
+    ('check-references', 'cdm_utils.referential_check', 'Check the MD5 foreign keys between table files'),
+    ('verify-shards', 'cdm_utils.sharded_writer', 'Verify the row counts and checksums of a sharded output directory'),
+    ('sql-load', 'cdm_utils.sql_loader', 'Load TSV tables into a SQLite database'),
+    ('feature-index', 'cdm_utils.feature_index', 'Build and query a feature index'),
+    ('feature-sequences', 'cdm_utils.feature_sequences', 'Extract feature sequences and translations'),
+    ('protein-store', 'cdm_utils.protein_store', 'Look up sequences in a protein store'),
+    ('contig-store', 'cdm_utils.contig_store', 'Fetch sequences from a contig store'),
+    ('synthetic', 'cdm_utils.synthetic_inputs', 'Generate synthetic inputs for scale testing'),
+    ('worker', 'cdm_utils.worker', 'Run a resident worker on a spool directory, or submit jobs to it'),
+]
+
+def usage():
+    lines = ["Usage: cdm-utils <command> [options]", "", "Commands:"]
+    lines.extend(f"  {name:<18} {description}" for name, _, description in COMMANDS)
+    lines.append("")
+    lines.append("Run 'cdm-utils <command> --help' for the options of a command.")
+    return '\n'.join(lines)
+
+def main(argv=None):
+    """
+    Run a subcommand. Only the module of the chosen command is imported, and the modules
+    themselves import pandas and Biopython only where they use them, so short per-genome
+    jobs do not pay for dependencies they never touch.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return 0
+    modules = {name: module for name, module, _ in COMMANDS}
+    module = modules.get(argv[0])
+    if module is None:
+        print(f"Unknown command: {argv[0]}\n\n{usage()}", file=sys.stderr)
+        return 2
+
+    # Each module parses its own options from sys.argv when run as __main__
+    sys.argv = [f"cdm-utils {argv[0]}"] + argv[1:]
+    runpy.run_module(module, run_name='__main__')
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
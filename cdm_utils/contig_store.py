@@ -0,0 +1,122 @@
+import os
+import mmap
+import argparse
+from .profiling import REPORT
+
+class ContigStore:
+    """
+    Packed contig sequence store keyed by contig_md5.
+
+    Each unique contig is appended to contigs.seq as plain bytes, one byte per base with no line
+    breaks, and contigs.idx records its offset and length (like a samtools faidx index, keyed by
+    MD5). A subsequence is therefore a slice of a memory map at a computed offset, with no
+    decompression or scanning. One byte per base is used instead of 2-bit packing so N and
+    IUPAC codes and soft-masking survive unchanged.
+    Only one process should write to a store at a time.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.sequence_path = os.path.join(directory, 'contigs.seq')
+        self.index_path = os.path.join(directory, 'contigs.idx')
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as index_file:
+                for line in index_file:
+                    contig_md5, offset, length = line.rstrip('\n').split('\t')
+                    self.index[contig_md5] = (int(offset), int(length))
+        self.sequence_file = None
+        self.index_file = None
+        self.map = None
+        self.mapped_size = 0
+        self.added = 0
+
+    def __contains__(self, contig_md5):
+        return contig_md5 in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def add(self, contig_md5, sequence):
+        """Append a contig sequence unless its MD5 is already stored. Returns True if it was added."""
+        if contig_md5 in self.index:
+            return False
+        if self.sequence_file is None:
+            self.sequence_file = open(self.sequence_path, 'ab')
+            self.index_file = open(self.index_path, 'a')
+        data = sequence.encode('ascii')
+        offset = self.sequence_file.seek(0, os.SEEK_END)
+        self.sequence_file.write(data)
+        self.index_file.write(f"{contig_md5}\t{offset}\t{len(data)}\n")
+        self.index[contig_md5] = (offset, len(data))
+        self.added += 1
+        return True
+
+    def length(self, contig_md5):
+        """Return the length of a stored contig, or None."""
+        location = self.index.get(contig_md5)
+        return location[1] if location else None
+
+    def fetch(self, contig_md5, start=1, end=None):
+        """
+        Return the subsequence start..end of a stored contig, using 1-based inclusive GFF
+        coordinates (the whole contig by default), or None if the contig is not stored.
+        """
+        location = self.index.get(contig_md5)
+        if location is None:
+            return None
+        offset, length = location
+        end = length if end is None else min(end, length)
+        start = max(start, 1)
+        if end < start:
+            return ''
+        self.ensure_mapped(offset + length)
+        return self.map[offset + start - 1:offset + end].decode('ascii')
+
+    def ensure_mapped(self, size):
+        """Map contigs.seq into memory, remapping when contigs were appended after the last mapping."""
+        if self.map is not None and self.mapped_size >= size:
+            return
+        if self.sequence_file is not None:
+            self.sequence_file.flush()
+        if self.map is not None:
+            self.map.close()
+        with open(self.sequence_path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.mapped_size = len(self.map)
+
+    def flush(self):
+        """Write the buffered sequences and index lines to disk."""
+        if self.sequence_file is not None:
+            self.sequence_file.flush()
+            self.index_file.flush()
+
+    def close(self):
+        """Close the store files and the memory map."""
+        if self.sequence_file is not None:
+            self.sequence_file.close()
+            self.index_file.close()
+            self.sequence_file = None
+            self.index_file = None
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        REPORT.count('contig_store.added', self.added)
+        print(f"Contig store {self.directory}: {self.added} new contigs, {len(self.index)} in total")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print a contig or subsequence from a contig store.")
+    parser.add_argument('store_dir', type=str, help='Contig store directory')
+    parser.add_argument('contig_md5', type=str, help='MD5 of the contig')
+    parser.add_argument('--start', type=int, default=1, help='1-based start coordinate')
+    parser.add_argument('--end', type=int, default=None, help='1-based inclusive end coordinate')
+    args = parser.parse_args()
+
+    store = ContigStore(args.store_dir)
+    sequence = store.fetch(args.contig_md5, args.start, args.end)
+    if sequence is None:
+        print(f"Contig {args.contig_md5} not found in {args.store_dir}")
+    else:
+        print(f">{args.contig_md5}:{args.start}-{args.end or store.length(args.contig_md5)}\n{sequence}")
@@ -1,11 +1,12 @@
 import hashlib
 import gzip
-from Bio import SeqIO
+from .profiling import profiled
 
 class ContigTable:
-    def __init__(self, assembly_paths_file):
+    def __init__(self, assembly_paths_file, contig_store=None):
         self.assembly_paths_file = assembly_paths_file
         self.contig_stats = []
+        self.contig_store = contig_store  # Optional ContigStore that receives every contig sequence
 
     def compute_md5(self, sequence):
         """
@@ -15,11 +16,14 @@ class ContigTable:
         md5_hash.update(sequence.encode('utf-8'))
         return md5_hash.hexdigest()
 
+    @profiled('contig_table.calculate_contig_stats', input_file=lambda self, fasta_file, assembly_id: fasta_file)
     def calculate_contig_stats(self, fasta_file, assembly_id):
         """
         Calculate statistics for each contig in the assembly file.
         Handles both compressed (.gz) and uncompressed files.
         """
+        from Bio import SeqIO  # Imported here so the module loads quickly without Biopython
+
         # Use gzip.open if the file is compressed, otherwise use open
         open_func = gzip.open if fasta_file.endswith('.gz') else open
 
@@ -31,6 +35,8 @@ class ContigTable:
                 length = len(sequence)
                 gc_content = (sequence.count('G') + sequence.count('C')) / length if length > 0 else 0
                 contig_id = self.compute_md5(sequence)  # Compute MD5 based on the sequence content
+                if self.contig_store is not None:
+                    self.contig_store.add(contig_id, sequence)
 
                 self.contig_stats.append({
                     'id': contig_id,
@@ -74,14 +80,16 @@ class ContigTable:
 
         return md5_hash.hexdigest()
 
-    def write_to_tsv(self, output_file):
+    def write_to_tsv(self, output_file, append=False):
         """
         Write the contig statistics to a TSV file for database loading.
+        With append, rows are added to an existing file and the header is only written to a new or empty one.
         """
-        with open(output_file, 'w') as tsvfile:
+        with open(output_file, 'a' if append else 'w') as tsvfile:
             # Write the header row
             header = ['id', 'contig_name', 'length', 'gc_content', 'assembly_id', 'fasta_file']
-            tsvfile.write('\t'.join(header) + '\n')
+            if not append or tsvfile.tell() == 0:
+                tsvfile.write('\t'.join(header) + '\n')
 
             # Write the contig data
             for stat in self.contig_stats:
@@ -101,20 +109,27 @@ if __name__ == "__main__":
     import sys
 
     if len(sys.argv) < 2:
-        print("Usage: python contig_table.py <assembly_paths_file>")
+        print("Usage: python -m cdm_utils.contig_table <assembly_paths_file> [contig_store_dir]")
         sys.exit(1)
 
     assembly_paths_file = sys.argv[1]  # Read the input file path from command line argument
     contigs_output_tsv_path = "contigs_output.tsv"  # Define the output file path
 
+    contig_store = None
+    if len(sys.argv) > 2:
+        from cdm_utils.contig_store import ContigStore
+        contig_store = ContigStore(sys.argv[2])
+
     # Create an instance of ContigTable
-    contig_table = ContigTable(assembly_paths_file)
+    contig_table = ContigTable(assembly_paths_file, contig_store=contig_store)
 
     # Process the assemblies and calculate the contig statistics
     contig_table.process_assemblies()
 
     # Write results to TSV file
     contig_table.write_to_tsv(contigs_output_tsv_path)
+    if contig_store:
+        contig_store.close()
 
     print(f"Contig statistics have been written to {contigs_output_tsv_path}.")
 
@@ -1,7 +1,6 @@
-import pandas as pd
-
 class SampleTable:
     def __init__(self, input_file='sample_details.tsv'):
+        import pandas as pd  # Imported here so the module loads quickly without pandas
         self.input_file = input_file
         self.df = pd.read_csv(self.input_file, sep='\t')
         self.project_df = None
@@ -68,6 +67,7 @@ class SampleTable:
                 'biosample_cultivation': 'cultivation_details'
             })
         else:
+            import pandas as pd
             self.cultivation_df = pd.DataFrame()  # Create an empty DataFrame if no cultivation data
 
     def save_tables(self, sample_output='sample.tsv', project_output='project.tsv',
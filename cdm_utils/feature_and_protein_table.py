@@ -1,8 +1,13 @@
 import csv
+import json
 import hashlib
 import argparse
 import os
 import gzip
+from array import array
+from urllib.parse import unquote
+from .id_codec import encode_id
+from .profiling import REPORT, profiled, add_profiling_arguments, start_profiling, finish_profiling
 
 # Define SO terms mapping
 so_terms = {
@@ -28,17 +33,183 @@ so_terms = {
     "sequence_feature": "SO:0000110"
 }
 
+FEATURE_FIELDS = ['feature_uid', 'seq_id', 'feature_type', 'feature_ontology', 'start', 'end', 'strand', 'score', 'phase', 'original_id', 'parent', 'assembly_md5', 'contig_md5', 'protein_id']
+ASSOCIATION_FIELDS = ['feature_id', 'key', 'value']
+PROTEIN_ASSOCIATION_FIELDS = ['feature_id', 'protein_id', 'protein_md5']
+
+STRAND_CODES = {None: 0, '+': 1, '-': 2}
+STRANDS = [None, '+', '-']
+PHASE_CODES = {None: 0, '0': 1, '1': 2, '2': 3}
+PHASES = [None, '0', '1', '2']
+
+# GFF3 attributes that can hold several comma-separated values
+MULTI_VALUE_KEYS = frozenset(['Parent', 'Alias', 'Note', 'Dbxref', 'Ontology_term'])
+
+def decode_attribute(value):
+    """Undo the GFF3 percent-encoding of an attribute value (%3B for ';', %2C for ',' ...)."""
+    return unquote(value) if '%' in value else value
+
+class StringTable:
+    """Map repeated strings (contig names, feature types, MD5s) to small integer codes."""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+class FeatureStore:
+    """
+    Columnar storage for GFF features. Coordinates, strand and phase live in typed arrays,
+    feature UIDs as 16-byte binary digests, and repeated strings (seq_id, feature_type,
+    assembly_md5, contig_md5) as codes into string tables. Iterating yields one tuple per
+    feature, ordered like FEATURE_FIELDS, so writers never build per-feature dictionaries.
+    """
+
+    def __init__(self):
+        self.uids = bytearray()
+        self.starts = array('q')
+        self.ends = array('q')
+        self.strands = bytearray()
+        self.phases = bytearray()
+        self.scores = []
+        self.original_ids = []
+        self.parents = []
+        self.protein_ids = []
+        self.seq_ids = array('i')
+        self.feature_types = array('i')
+        self.assembly_md5s = array('i')
+        self.contig_md5s = array('i')
+        self.strings = StringTable()
+
+    def append(self, feature_uid, seq_id, feature_type, start, end, strand, score, phase,
+               original_id, parent, assembly_md5, contig_md5, protein_id):
+        """Add a feature and return its row number."""
+        self.uids += bytes.fromhex(feature_uid)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.strands.append(STRAND_CODES[strand])
+        self.phases.append(PHASE_CODES[phase])
+        self.scores.append(score)
+        self.original_ids.append(original_id)
+        self.parents.append(parent)
+        self.protein_ids.append(protein_id)
+        self.seq_ids.append(self.strings.code(seq_id))
+        self.feature_types.append(self.strings.code(feature_type))
+        self.assembly_md5s.append(self.strings.code(assembly_md5))
+        self.contig_md5s.append(self.strings.code(contig_md5))
+        return len(self.starts) - 1
+
+    def uid(self, row):
+        """Return the feature_uid of a row as a hex string."""
+        return self.uids[row * 16:(row + 1) * 16].hex()
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        values = self.strings.values
+        feature_type = values[self.feature_types[row]]
+        return (self.uid(row), values[self.seq_ids[row]], feature_type, so_terms.get(feature_type, ""),
+                self.starts[row], self.ends[row], STRANDS[self.strands[row]], self.scores[row],
+                PHASES[self.phases[row]], self.original_ids[row], self.parents[row],
+                values[self.assembly_md5s[row]], values[self.contig_md5s[row]], self.protein_ids[row])
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def iter_dicts(self):
+        """Yield each feature as a dictionary keyed by FEATURE_FIELDS (for convenience, not for bulk output)."""
+        for row in self:
+            yield dict(zip(FEATURE_FIELDS, row))
+
+    def iter_binary(self):
+        """
+        Yield each feature like __iter__, but with feature_uid, assembly_md5 and contig_md5 as
+        16-byte binary IDs. The UIDs are sliced from storage without a round trip through hex.
+        """
+        values = self.strings.values
+        binary = [encode_id(value) for value in values]
+        uids = bytes(self.uids)
+        for row in range(len(self)):
+            feature_type = values[self.feature_types[row]]
+            yield (uids[row * 16:(row + 1) * 16], values[self.seq_ids[row]], feature_type, so_terms.get(feature_type, ""),
+                   self.starts[row], self.ends[row], STRANDS[self.strands[row]], self.scores[row],
+                   PHASES[self.phases[row]], self.original_ids[row], self.parents[row],
+                   binary[self.assembly_md5s[row]], binary[self.contig_md5s[row]], self.protein_ids[row])
+
+class AssociationStore:
+    """
+    Columnar storage for feature attribute associations. Each row refers to its feature by
+    row number in a FeatureStore, keys are stored as codes and repeated values share one string.
+    Iterating yields (feature_id, key, value) tuples.
+    """
+
+    def __init__(self, features):
+        self.features = features
+        self.feature_rows = array('q')
+        self.key_codes = array('i')
+        self.values = []
+        self.keys = StringTable()
+        self.value_cache = {}
+
+    def append(self, feature_row, key, value):
+        self.feature_rows.append(feature_row)
+        self.key_codes.append(self.keys.code(key))
+        self.values.append(self.value_cache.setdefault(value, value))
+
+    def __len__(self):
+        return len(self.feature_rows)
+
+    def __iter__(self):
+        keys = self.keys.values
+        current_row = None
+        feature_id = None
+        for feature_row, key_code, value in zip(self.feature_rows, self.key_codes, self.values):
+            if feature_row != current_row:
+                current_row = feature_row
+                feature_id = self.features.uid(feature_row)
+            yield (feature_id, keys[key_code], value)
+
+    def iter_binary(self):
+        """Yield (feature_id, key, value) tuples with the feature_id as a 16-byte binary ID."""
+        keys = self.keys.values
+        uids = bytes(self.features.uids)
+        for feature_row, key_code, value in zip(self.feature_rows, self.key_codes, self.values):
+            yield (uids[feature_row * 16:(feature_row + 1) * 16], keys[key_code], value)
+
 class GFFParser:
-    def __init__(self, assembly_file, gff_file, protein_file):
+    def __init__(self, assembly_file, gff_file, protein_file, assembly_md5=None, contig_md5s=None, gff_md5=None,
+                 protein_store=None, contig_store=None, cross_check=None):
+        """
+        MD5 checksums that were already computed upstream (for example while an annotation tool
+        decompressed the assembly or wrote the GFF file) can be passed in to avoid re-reading the files.
+        If a ProteinStore is given, every protein sequence not yet in the store is written to it.
+        If a ContigStore is given, every contig sequence not yet in the store is written to it.
+        If a ProteinCrossCheck is given, protein IDs from the GFF and FAA files are collected for
+        validation_report() instead of raising on the first FAA ID missing from the GFF.
+        """
         self.assembly_file = assembly_file
         self.gff_file = gff_file
         self.protein_file = protein_file
-        self.features = []
-        self.feature_associations = []
-        self.feature_protein_associations = []
-        self.assembly_md5 = None
-        self.contig_md5s = {}
+        self.features = FeatureStore()
+        self.feature_associations = AssociationStore(self.features)
+        self.feature_protein_associations = []  # (feature_id, protein_id, protein_md5) rows; feature_id is None until matched
+        self.assembly_md5 = assembly_md5
+        self.contig_md5s = dict(contig_md5s) if contig_md5s else {}
+        self.gff_md5 = gff_md5
         self.protein_ids = set()
+        self.protein_store = protein_store
+        self.contig_store = contig_store
+        self.cross_check = cross_check
 
     @staticmethod
     def generate_file_md5(filepath, blocksize=65536):
@@ -64,53 +235,113 @@ class GFFParser:
 
     @staticmethod
     def parse_attributes(attributes_str):
-        """Parse the GFF3 attributes field into a dictionary."""
+        """
+        Parse the GFF3 attributes field into a dictionary of percent-decoded values. The values
+        of the keys in MULTI_VALUE_KEYS are lists, split on commas before decoding so that an
+        encoded comma (%2C) stays inside its value. A repeated key keeps its last value.
+        """
         attributes = {}
         for attribute in attributes_str.split(';'):
             if '=' in attribute:
                 key, value = attribute.split('=', 1)
                 attributes[key] = value
+        for key in MULTI_VALUE_KEYS.intersection(attributes):
+            attributes[key] = attributes[key].split(',')
+        if '%' in attributes_str:
+            for key, value in attributes.items():
+                if key in MULTI_VALUE_KEYS:
+                    attributes[key] = [decode_attribute(item) for item in value]
+                else:
+                    attributes[key] = decode_attribute(value)
         return attributes
 
-    def calculate_md5_checksums(self):
-        """Calculate MD5 checksums for the assembly and its contigs."""
-        print(f"Calculating MD5 for assembly: {self.assembly_file}")
-        self.assembly_md5 = self.generate_file_md5(self.assembly_file)
-        if not self.assembly_md5:
-            print(f"Error calculating MD5 for assembly file {self.assembly_file}")
-            return
-
-        open_func = gzip.open if self.assembly_file.endswith('.gz') else open
+    @staticmethod
+    def raw_attribute(attributes_str, key):
+        """Return the last value of key in the attributes field as written in the file, without decoding, or None."""
+        value = None
+        for attribute in attributes_str.split(';'):
+            if attribute.startswith(key + '='):
+                value = attribute[len(key) + 1:]
+        return value
 
-        try:
-            with open_func(self.assembly_file, 'rt', encoding='utf-8', errors='ignore') as file:
+    @staticmethod
+    def hash_assembly(assembly_file, copy_to=None, contig_store=None):
+        """
+        Compute the MD5 of the assembly's decompressed content and of each contig in a single pass.
+        If copy_to is given, the decompressed content is written there at the same time.
+        If contig_store is given, each contig sequence is added to it under its MD5.
+        Returns the assembly MD5 and a dictionary of contig name to contig MD5.
+        """
+        assembly_md5 = hashlib.md5()
+        contig_md5s = {}
+        open_func = gzip.open if assembly_file.endswith('.gz') else open
+
+        with open_func(assembly_file, 'rt', encoding='utf-8', errors='ignore') as file:
+            copy_file = open(copy_to, 'w', encoding='utf-8') if copy_to else None
+            try:
                 current_contig = None
-                contig_data = []
+                contig_md5 = None
+                has_data = False
+                parts = []
 
                 for line in file:
+                    assembly_md5.update(line.encode('utf-8'))
+                    if copy_file:
+                        copy_file.write(line)
                     if line.startswith('>'):
-                        if current_contig and contig_data:
-                            # Calculate MD5 for the previous contig
-                            contig_md5 = hashlib.md5(''.join(contig_data).encode()).hexdigest()
-                            self.contig_md5s[current_contig] = contig_md5
-                            print(f"Calculated MD5 for contig {current_contig}: {contig_md5}")
+                        if current_contig and has_data:
+                            contig_md5s[current_contig] = contig_md5.hexdigest()
+                            if contig_store is not None:
+                                contig_store.add(contig_md5s[current_contig], ''.join(parts))
                         current_contig = line[1:].strip().split()[0]  # Get the contig name without '>'
-                        contig_data = []  # Reset contig data
-                    else:
-                        contig_data.append(line.strip())
+                        contig_md5 = hashlib.md5()
+                        has_data = False
+                        parts = []
+                    elif contig_md5 is not None:
+                        sequence = line.strip()
+                        contig_md5.update(sequence.encode('utf-8'))
+                        if contig_store is not None:
+                            parts.append(sequence)
+                        has_data = True
+
+                # Record the MD5 for the last contig
+                if current_contig and has_data:
+                    contig_md5s[current_contig] = contig_md5.hexdigest()
+                    if contig_store is not None:
+                        contig_store.add(contig_md5s[current_contig], ''.join(parts))
+            finally:
+                if copy_file:
+                    copy_file.close()
+
+        return assembly_md5.hexdigest(), contig_md5s
+
+    @profiled('gff.calculate_md5_checksums', input_file=lambda self: self.assembly_file,
+              records=lambda self, result: len(self.contig_md5s))
+    def calculate_md5_checksums(self):
+        """
+        Calculate MD5 checksums for the assembly and its contigs, unless they were provided.
+        Whoever provides them fills the contig store in the same pass (see hash_assembly),
+        so the assembly is not read again for it.
+        """
+        if self.assembly_md5 and self.contig_md5s:
+            print(f"Reusing precomputed MD5s for assembly: {self.assembly_file}")
+            return
 
-                # Calculate MD5 for the last contig
-                if current_contig and contig_data:
-                    contig_md5 = hashlib.md5(''.join(contig_data).encode()).hexdigest()
-                    self.contig_md5s[current_contig] = contig_md5
-                    print(f"Calculated MD5 for contig {current_contig}: {contig_md5}")
+        print(f"Calculating MD5 for assembly: {self.assembly_file}")
+        try:
+            self.assembly_md5, self.contig_md5s = self.hash_assembly(self.assembly_file,
+                                                                     contig_store=self.contig_store)
+            for contig, contig_md5 in self.contig_md5s.items():
+                print(f"Calculated MD5 for contig {contig}: {contig_md5}")
         except Exception as e:
             print(f"Error reading assembly file {self.assembly_file}: {e}")
 
+    @profiled('gff.prepare_gff3_data', input_file=lambda self: self.gff_file,
+              records=lambda self, result: len(self.features))
     def prepare_gff3_data(self):
         """Prepare data for insertion into the database."""
         print(f"Preparing GFF3 data from: {self.gff_file}")
-        file_md5 = self.generate_file_md5(self.gff_file)
+        file_md5 = self.gff_md5 or self.generate_file_md5(self.gff_file)
         if not file_md5:
             print(f"Error calculating MD5 for GFF file {self.gff_file}")
             return
@@ -138,46 +369,54 @@ class GFFParser:
                     # Parse attributes
                     attributes = self.parse_attributes(attributes_str)
                     feature_id_value = attributes.get('ID', None)
-                    parent_value = attributes.get('Parent', None)
+                    parents = attributes.get('Parent')
+                    parent_value = parents[0] if parents else None  # The others are in the associations
                     protein_id = attributes.get('protein_id', None)
 
                     if feature_type == "CDS" and protein_id:
-                        self.protein_ids.add(protein_id)
-
-                    # Generate a unique hash ID for each feature
-                    feature_id = self.generate_hash_id(seq_id, start, end, feature_type, file_md5, feature_id_value)
-
-                    # Prepare feature data including MD5 of the assembly and contig
-                    feature_data = {
-                        'feature_uid': feature_id,
-                        'seq_id': seq_id,
-                        'feature_type': feature_type,
-                        'feature_ontology': so_terms.get(feature_type, ""),
-                        'start': start,
-                        'end': end,
-                        'strand': strand,
-                        'score': score,
-                        'phase': phase,
-                        'original_id': feature_id_value,
-                        'parent': parent_value,
-                        'assembly_md5': self.assembly_md5,
-                        'contig_md5': self.contig_md5s.get(seq_id, ""),  # Use the contig MD5 if available
-                        'protein_id': protein_id  # Add protein_id to feature data
-                    }
-                    self.features.append(feature_data)
-
-                    # Add all other attributes to the associations
+                        if self.cross_check is not None:
+                            self.cross_check.add_gff(protein_id)
+                        else:
+                            self.protein_ids.add(protein_id)
+
+                    # Generate a unique hash ID for each feature, from the ID as written so that UIDs do not depend on decoding
+                    hash_value = self.raw_attribute(attributes_str, 'ID') if '%' in attributes_str else feature_id_value
+                    feature_id = self.generate_hash_id(seq_id, start, end, feature_type, file_md5, hash_value)
+
+                    # Store the feature including MD5 of the assembly and contig
+                    feature_row = self.features.append(
+                        feature_id, seq_id, feature_type, start, end, strand, score, phase,
+                        feature_id_value, parent_value, self.assembly_md5,
+                        self.contig_md5s.get(seq_id, ""),  # Use the contig MD5 if available
+                        protein_id  # Add protein_id to feature data
+                    )
+
+                    # Add all other attributes to the associations, one row per value
                     for key, value in attributes.items():
-                        self.feature_associations.append({
-                            'feature_id': feature_id,
-                            'key': key,
-                            'value': value
-                        })
+                        if key in MULTI_VALUE_KEYS:
+                            for item in value:
+                                self.feature_associations.append(feature_row, key, item)
+                        else:
+                            self.feature_associations.append(feature_row, key, value)
 
             print(f"Finished preparing GFF3 data. Total features: {len(self.features)}")
         except Exception as e:
             print(f"Error reading GFF file {self.gff_file}: {e}")
 
+    def add_protein(self, protein_id, sequence):
+        """Record the MD5 of a protein sequence from the FAA file, and store the sequence if a protein store is set."""
+        protein_md5 = hashlib.md5(sequence.encode()).hexdigest()
+        if self.cross_check is not None:
+            self.cross_check.add_faa(protein_id)
+        elif protein_id not in self.protein_ids:
+            raise ValueError(f"Protein ID {protein_id} in FAA file does not match any protein_id in GFF file.")
+        self.feature_protein_associations.append((None, protein_id, protein_md5))
+        if self.protein_store is not None:
+            self.protein_store.add(protein_md5, sequence)
+        print(f"Protein ID {protein_id} with MD5 {protein_md5}")
+
+    @profiled('gff.prepare_protein_associations', input_file=lambda self: self.protein_file,
+              records=lambda self, result: len(self.feature_protein_associations))
     def prepare_protein_associations(self):
         """Prepare protein associations data from the protein file."""
         print(f"Preparing protein associations from: {self.protein_file}")
@@ -191,14 +430,7 @@ class GFFParser:
                 for line in file:
                     if line.startswith('>'):
                         if current_protein_id and protein_sequence:
-                            protein_md5 = hashlib.md5(''.join(protein_sequence).encode()).hexdigest()
-                            if current_protein_id not in self.protein_ids:
-                                raise ValueError(f"Protein ID {current_protein_id} in FAA file does not match any protein_id in GFF file.")
-                            self.feature_protein_associations.append({
-                                'protein_id': current_protein_id,
-                                'protein_md5': protein_md5
-                            })
-                            print(f"Protein ID {current_protein_id} with MD5 {protein_md5}")
+                            self.add_protein(current_protein_id, ''.join(protein_sequence))
                         current_protein_id = line[1:].strip().split()[0]
                         protein_sequence = []
                     else:
@@ -206,67 +438,103 @@ class GFFParser:
 
                 # Capture the last protein sequence
                 if current_protein_id and protein_sequence:
-                    protein_md5 = hashlib.md5(''.join(protein_sequence).encode()).hexdigest()
-                    if current_protein_id not in self.protein_ids:
-                        raise ValueError(f"Protein ID {current_protein_id} in FAA file does not match any protein_id in GFF file.")
-                    self.feature_protein_associations.append({
-                        'protein_id': current_protein_id,
-                        'protein_md5': protein_md5
-                    })
-                    print(f"Protein ID {current_protein_id} with MD5 {protein_md5}")
+                    self.add_protein(current_protein_id, ''.join(protein_sequence))
 
             print(f"Finished preparing protein associations. Total proteins: {len(self.feature_protein_associations)}")
         except Exception as e:
             print(f"Error reading protein file {self.protein_file}: {e}")
 
+    def validation_report(self):
+        """Return the protein ID cross-check report, or None if no cross-check was requested."""
+        if self.cross_check is None:
+            return None
+        report = self.cross_check.report()
+        report.update({'assembly_file': self.assembly_file, 'gff_file': self.gff_file, 'protein_file': self.protein_file})
+        status = "passed" if report['valid'] else "FAILED"
+        print(f"Protein cross-check {status} for {self.gff_file}: {report['matched']} matched, "
+              f"{report['missing_in_faa']} missing in FAA, {report['missing_in_gff']} missing in GFF, "
+              f"{report['duplicate_faa_ids']} duplicate FAA IDs")
+        return report
+
+    @profiled('gff.match_proteins_to_features', item=lambda self: self.gff_file,
+              records=lambda self, result: len(self.feature_protein_associations))
     def match_proteins_to_features(self):
         """Match proteins to features based on the protein ID in the GFF attributes."""
         matched_proteins = []
         print("Matching proteins to features...")
-        for feature in self.features:
-            protein_id = feature['protein_id']
-            matching_proteins = [assoc for assoc in self.feature_protein_associations if assoc['protein_id'] == protein_id]
-            if matching_proteins:
-                for match in matching_proteins:
-                    matched_proteins.append({
-                        'feature_id': feature['feature_uid'],
-                        'protein_id': match['protein_id'],
-                        'protein_md5': match['protein_md5']
-                    })
-                print(f"Feature ID {feature['feature_uid']} matched with protein ID {protein_id}")
+        protein_md5s = {}
+        for _, protein_id, protein_md5 in self.feature_protein_associations:
+            protein_md5s.setdefault(protein_id, []).append(protein_md5)
+
+        for row, protein_id in enumerate(self.features.protein_ids):
+            feature_uid = self.features.uid(row)
+            matching_md5s = protein_md5s.get(protein_id)
+            if matching_md5s:
+                for protein_md5 in matching_md5s:
+                    matched_proteins.append((feature_uid, protein_id, protein_md5))
+                print(f"Feature ID {feature_uid} matched with protein ID {protein_id}")
             else:
-                print(f"No matching protein for feature ID {feature['feature_uid']}")
+                print(f"No matching protein for feature ID {feature_uid}")
 
-        self.feature_protein_associations = matched_proteins  # Update the list with matched data
+        self.feature_protein_associations = matched_proteins  # Only the rows matched to a feature remain
         print(f"Finished matching proteins to features. Total matches: {len(self.feature_protein_associations)}")
 
-    def save_as_tsv(self, features_tsv, associations_tsv, protein_associations_tsv):
-        """Save data as TSV files."""
+    @staticmethod
+    def open_tsv_writer(path, fieldnames, append):
+        """Open a TSV file for writing, or for appending with a header only when the file is new or empty."""
+        write_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        f_out = open(path, 'a' if append else 'w', newline='')
+        writer = csv.writer(f_out, delimiter='\t')
+        if write_header:
+            writer.writerow(fieldnames)
+        return f_out, writer
+
+    @profiled('gff.save_as_tsv', item=lambda self, *args, **kwargs: self.gff_file,
+              records=lambda self, result: len(self.features),
+              outputs=lambda self, features_tsv, associations_tsv, protein_associations_tsv, append=False, attribute_writer=None:
+                  (features_tsv, protein_associations_tsv) if attribute_writer else
+                  (features_tsv, associations_tsv, protein_associations_tsv))
+    def save_as_tsv(self, features_tsv, associations_tsv, protein_associations_tsv, append=False, attribute_writer=None):
+        """
+        Save data as TSV files, optionally appending to existing tables. With attribute_writer
+        (a NormalizedAttributeWriter), the feature associations go to its normalized tables instead.
+        """
         try:
             # Save features data
-            with open(features_tsv, 'w', newline='') as f_out:
-                writer = csv.DictWriter(f_out, fieldnames=['feature_uid', 'seq_id', 'feature_type', 'feature_ontology', 'start', 'end', 'strand', 'score', 'phase', 'original_id', 'parent', 'assembly_md5', 'contig_md5', 'protein_id'], delimiter='\t')
-                writer.writeheader()
+            f_out, writer = self.open_tsv_writer(features_tsv, FEATURE_FIELDS, append)
+            with f_out:
                 writer.writerows(self.features)
             print(f"Features saved to {features_tsv}")
 
             # Save feature associations data
-            with open(associations_tsv, 'w', newline='') as f_out:
-                writer = csv.DictWriter(f_out, fieldnames=['feature_id', 'key', 'value'], delimiter='\t')
-                writer.writeheader()
-                writer.writerows(self.feature_associations)
-            print(f"Feature associations saved to {associations_tsv}")
+            if attribute_writer:
+                attribute_writer.writerows(self.feature_associations)
+                print(f"Feature associations saved to {attribute_writer.directory}")
+            else:
+                f_out, writer = self.open_tsv_writer(associations_tsv, ASSOCIATION_FIELDS, append)
+                with f_out:
+                    writer.writerows(self.feature_associations)
+                print(f"Feature associations saved to {associations_tsv}")
 
             # Save feature-protein associations data
-            with open(protein_associations_tsv, 'w', newline='') as f_out:
-                writer = csv.DictWriter(f_out, fieldnames=['feature_id', 'protein_id', 'protein_md5'], delimiter='\t')
-                writer.writeheader()
+            f_out, writer = self.open_tsv_writer(protein_associations_tsv, PROTEIN_ASSOCIATION_FIELDS, append)
+            with f_out:
                 writer.writerows(self.feature_protein_associations)
             print(f"Feature-protein associations saved to {protein_associations_tsv}")
 
         except Exception as e:
             print(f"Error saving TSV files: {e}")
 
+    @profiled('gff.save_as_shards', item=lambda self, output: self.gff_file, records=lambda self, result: result)
+    def save_as_shards(self, output):
+        """Write the tables to a ShardedOutput, partitioned by the assembly MD5. Returns the number of rows written."""
+        rows = output.writerows('features', FEATURE_FIELDS, self.features, self.assembly_md5)
+        rows += output.writerows('feature_associations', ASSOCIATION_FIELDS, self.feature_associations, self.assembly_md5)
+        rows += output.writerows('feature_protein_associations', PROTEIN_ASSOCIATION_FIELDS,
+                                 self.feature_protein_associations, self.assembly_md5)
+        print(f"Wrote {rows} rows to the shards in {output.directory}")
+        return rows
+
 def main():
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Parse GFF3, assembly, and protein files and generate TSV outputs.")
@@ -275,8 +543,48 @@ def main():
     parser.add_argument('--features_output', type=str, default='features.tsv', help='Output TSV file for features')
     parser.add_argument('--associations_output', type=str, default='feature_associations.tsv', help='Output TSV file for feature associations')
     parser.add_argument('--protein_associations_output', type=str, default='feature_protein_associations.tsv', help='Output TSV file for feature-protein associations')
+    parser.add_argument('--sqlite', type=str, default=None, help='Load the tables into this SQLite database instead of writing TSV files')
+    parser.add_argument('--binary_ids', action='store_true', help='With --sqlite, store MD5 ID columns as 16-byte BLOBs instead of hex text')
+    parser.add_argument('--protein_store', type=str, default=None, help='Directory of a deduplicated protein sequence store to add the proteins to')
+    parser.add_argument('--contig_store', type=str, default=None, help='Directory of a contig sequence store to add the contigs to')
+    parser.add_argument('--normalized_attributes', type=str, default=None, help='Write the feature associations as a key dictionary, interned values and integer references to this directory')
+    parser.add_argument('--shard_dir', type=str, default=None, help='Write compressed shards and a manifest to this directory instead of single TSV files')
+    parser.add_argument('--shard_rows', type=int, default=None, help='Start a new shard after this many rows')
+    parser.add_argument('--shard_bytes', type=int, default=None, help='Start a new shard once it reaches this many compressed bytes')
+    parser.add_argument('--partition_chars', type=int, default=0, help='Partition the shards by this many leading hex characters of the assembly MD5')
+    parser.add_argument('--compression', type=str, choices=['gzip', 'zstd', 'none'], default='gzip', help='Compression of the shards (zstd needs the zstandard package)')
+    parser.add_argument('--validation_report', type=str, default=None, help='Cross-check GFF and FAA protein IDs and write one JSON report line per genome to this file')
+    add_profiling_arguments(parser)
 
     args = parser.parse_args()
+    if args.normalized_attributes and (args.sqlite or args.shard_dir):
+        parser.error("--normalized_attributes only applies to TSV output, not to --sqlite or --shard_dir")
+    start_profiling(args)
+    loader = None
+    if args.sqlite:
+        from .sql_loader import SQLiteLoader
+        loader = SQLiteLoader(args.sqlite, binary_ids=args.binary_ids)
+    protein_store = None
+    if args.protein_store:
+        from .protein_store import ProteinStore
+        protein_store = ProteinStore(args.protein_store)
+    contig_store = None
+    if args.contig_store:
+        from .contig_store import ContigStore
+        contig_store = ContigStore(args.contig_store)
+    shards = None
+    if args.shard_dir:
+        from .sharded_writer import ShardedOutput
+        shards = ShardedOutput(args.shard_dir, max_rows=args.shard_rows, max_bytes=args.shard_bytes,
+                               partition_chars=args.partition_chars, compression=args.compression)
+    attribute_writer = None
+    if args.normalized_attributes:
+        from .attribute_dictionary import NormalizedAttributeWriter
+        attribute_writer = NormalizedAttributeWriter(args.normalized_attributes)
+    report_file = None
+    if args.validation_report:
+        from .protein_validation import ProteinCrossCheck
+        report_file = open(args.validation_report, 'w')
 
     # Set the delimiter based on user input
     delimiter = ' ' if args.delimiter == 'space' else '\t'
@@ -284,18 +592,48 @@ def main():
     # Read the input TSV file to get file paths
     with open(args.input_tsv, 'r') as input_file:
         reader = csv.reader(input_file, delimiter=delimiter)
+        processed = 0
         for row in reader:
             if len(row) < 3:
                 print("Skipping row due to missing file paths.")
+                REPORT.count('genomes.skipped')
                 continue  # Skip rows that don't have all three file paths
             assembly_file, gff_file, protein_file = row
             print(f"Processing: Assembly: {assembly_file}, GFF: {gff_file}, Protein: {protein_file}")
-            parser = GFFParser(assembly_file, gff_file, protein_file)
+            cross_check = ProteinCrossCheck() if report_file else None
+            parser = GFFParser(assembly_file, gff_file, protein_file, protein_store=protein_store,
+                               contig_store=contig_store, cross_check=cross_check)
             parser.calculate_md5_checksums()
             parser.prepare_gff3_data()
             parser.prepare_protein_associations()
             parser.match_proteins_to_features()
-            parser.save_as_tsv(args.features_output, args.associations_output, args.protein_associations_output)
+            if cross_check:
+                report_file.write(json.dumps(parser.validation_report()) + '\n')
+                cross_check.close()
+            if loader:
+                loader.load_gff_parser(parser)
+            elif shards:
+                parser.save_as_shards(shards)
+            else:
+                # Append every genome after the first so the outputs hold all rows of the input TSV
+                parser.save_as_tsv(args.features_output, args.associations_output, args.protein_associations_output,
+                                   append=processed > 0, attribute_writer=attribute_writer)
+            processed += 1
+            REPORT.count('genomes.processed')
+
+    if loader:
+        loader.close()
+    if shards:
+        shards.close()
+    if attribute_writer:
+        attribute_writer.close()
+    if protein_store:
+        protein_store.close()
+    if contig_store:
+        contig_store.close()
+    if report_file:
+        report_file.close()
+    finish_profiling()
 
 if __name__ == "__main__":
     main()
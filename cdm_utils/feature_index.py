@@ -0,0 +1,216 @@
+import csv
+import sys
+import gzip
+import json
+import struct
+import argparse
+from array import array
+from bisect import bisect_left, bisect_right
+from .feature_and_protein_table import FEATURE_FIELDS
+
+START = FEATURE_FIELDS.index('start')
+END = FEATURE_FIELDS.index('end')
+SEQ_ID = FEATURE_FIELDS.index('seq_id')
+CONTIG_MD5 = FEATURE_FIELDS.index('contig_md5')
+FEATURE_UID = FEATURE_FIELDS.index('feature_uid')
+ORIGINAL_ID = FEATURE_FIELDS.index('original_id')
+PROTEIN_ID = FEATURE_FIELDS.index('protein_id')
+
+# Saved indexes start with this tag, then the length of a JSON header as a little-endian
+# unsigned 64-bit integer, the header (fields, rows and contig table) and the sorted arrays
+# of every contig as little-endian 64-bit integers
+INDEX_MAGIC = b'CDMFIDX1'
+
+class FeatureIndex:
+    """
+    Per-genome index over the features table. Features on each contig are kept in arrays sorted
+    by start. Because no feature in those arrays is longer than a per-contig limit, the features
+    overlapping a region lie in a start window found with two binary searches. The few features
+    longer than the limit (whole-contig regions, for example) are kept aside and checked directly.
+    The arrays are kept per (contig_md5, seq_id), since contigs with identical sequences share
+    a contig_md5. Features can also be looked up by feature_uid, original_id and protein_id.
+    """
+
+    # Share of features per contig that may be set aside as long features
+    LONG_FEATURE_FRACTION = 0.01
+
+    def __init__(self, rows=()):
+        self.rows = []
+        self.contigs = {}
+        self.contig_keys = {}
+        self.by_feature_uid = {}
+        self.by_original_id = {}
+        self.by_protein_id = {}
+        for row in rows:
+            self.add(row)
+        self.build()
+
+    def add(self, row):
+        """Add a feature given as a dictionary or as a tuple ordered like FEATURE_FIELDS."""
+        if isinstance(row, dict):
+            row = tuple(row.get(name) for name in FEATURE_FIELDS)
+        row = list(row)
+        row[START] = int(row[START])
+        row[END] = int(row[END])
+        self.rows.append(tuple(value if value != '' else None for value in row))
+
+    def build(self):
+        """Sort the features of every contig and build the lookup tables."""
+        positions = {}
+        for row_id, row in enumerate(self.rows):
+            positions.setdefault((row[CONTIG_MD5], row[SEQ_ID]), []).append(row_id)
+
+        self.contigs = {}
+        for key, row_ids in positions.items():
+            row_ids.sort(key=lambda row_id: self.rows[row_id][START])
+            lengths = sorted(self.rows[row_id][END] - self.rows[row_id][START] for row_id in row_ids)
+            max_length = lengths[min(len(lengths) - 1, int(len(lengths) * (1 - self.LONG_FEATURE_FRACTION)))]
+
+            short_ids = array('q')
+            long_ids = array('q')
+            for row_id in row_ids:
+                row = self.rows[row_id]
+                (short_ids if row[END] - row[START] <= max_length else long_ids).append(row_id)
+            starts = array('q', (self.rows[row_id][START] for row_id in short_ids))
+            self.contigs[key] = (starts, short_ids, max_length, long_ids)
+        self.build_lookups()
+
+    def build_lookups(self):
+        """Build the ID lookup tables and the contig names accepted by overlapping()."""
+        self.by_feature_uid = {}
+        self.by_original_id = {}
+        self.by_protein_id = {}
+        for row_id, row in enumerate(self.rows):
+            self.by_feature_uid[row[FEATURE_UID]] = row_id
+            if row[ORIGINAL_ID]:
+                self.by_original_id.setdefault(row[ORIGINAL_ID], []).append(row_id)
+            if row[PROTEIN_ID]:
+                self.by_protein_id.setdefault(row[PROTEIN_ID], []).append(row_id)
+
+        # Contigs can be queried by their name in the GFF or by their contig_md5
+        self.contig_keys = {}
+        for key in self.contigs:
+            contig_md5, seq_id = key
+            self.contig_keys.setdefault(seq_id, []).append(key)
+            if contig_md5:
+                self.contig_keys.setdefault(contig_md5, []).append(key)
+
+    def as_dict(self, row_id):
+        """Return a feature as a dictionary keyed by FEATURE_FIELDS."""
+        return dict(zip(FEATURE_FIELDS, self.rows[row_id]))
+
+    def overlapping(self, contig, start, end):
+        """
+        Return the features on contig (seq_id or contig_md5) that overlap start..end (inclusive),
+        sorted by start. A contig_md5 shared by several contigs returns the features of all of them.
+        """
+        matches = []
+        for key in self.contig_keys.get(contig, ()):
+            starts, short_ids, max_length, long_ids = self.contigs[key]
+
+            # A short feature overlapping start..end must start within max_length before start
+            first = bisect_left(starts, start - max_length)
+            last = bisect_right(starts, end)
+            matches.extend(row_id for row_id in short_ids[first:last] if self.rows[row_id][END] >= start)
+            matches.extend(row_id for row_id in long_ids
+                           if self.rows[row_id][START] <= end and self.rows[row_id][END] >= start)
+        matches.sort(key=lambda row_id: self.rows[row_id][START])
+        return [self.as_dict(row_id) for row_id in matches]
+
+    def get(self, feature_uid):
+        """Return the feature with the given feature_uid, or None."""
+        row_id = self.by_feature_uid.get(feature_uid)
+        return self.as_dict(row_id) if row_id is not None else None
+
+    def find_by_original_id(self, original_id):
+        """Return the features whose GFF ID attribute is original_id."""
+        return [self.as_dict(row_id) for row_id in self.by_original_id.get(original_id, [])]
+
+    def find_by_protein_id(self, protein_id):
+        """Return the features with the given protein_id."""
+        return [self.as_dict(row_id) for row_id in self.by_protein_id.get(protein_id, [])]
+
+    def save(self, path):
+        """Write the rows and the sorted arrays to an index file (see INDEX_MAGIC); no code is pickled."""
+        header = {
+            'fields': FEATURE_FIELDS,
+            'rows': self.rows,
+            'contigs': [[contig_md5, seq_id, max_length, len(short_ids), len(long_ids)]
+                        for (contig_md5, seq_id), (_, short_ids, max_length, long_ids) in self.contigs.items()],
+        }
+        header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(INDEX_MAGIC)
+            f.write(struct.pack('<Q', len(header_bytes)))
+            f.write(header_bytes)
+            for starts, short_ids, _, long_ids in self.contigs.values():
+                for values in (starts, short_ids, long_ids):
+                    f.write(little_endian(values).tobytes())
+
+    @classmethod
+    def load(cls, path):
+        """Load an index saved with save(). Raises ValueError if the file is not a feature index."""
+        index = cls.__new__(cls)
+        with open(path, 'rb') as f:
+            if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                raise ValueError(f"{path} is not a feature index file")
+            header_length, = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_length).decode('utf-8'))
+            if header['fields'] != FEATURE_FIELDS:
+                raise ValueError(f"{path} was written with different feature fields")
+            index.rows = [tuple(row) for row in header['rows']]
+            index.contigs = {}
+            for contig_md5, seq_id, max_length, short_count, long_count in header['contigs']:
+                starts, short_ids, long_ids = (read_int64s(f, count) for count in (short_count, short_count, long_count))
+                index.contigs[(contig_md5, seq_id)] = (starts, short_ids, max_length, long_ids)
+        index.build_lookups()
+        return index
+
+    @classmethod
+    def from_parser(cls, parser):
+        """Build the index from the features of a GFFParser."""
+        return cls(parser.features)
+
+    @classmethod
+    def from_tsv(cls, features_tsv):
+        """Build the index from a features TSV written by GFFParser.save_as_tsv."""
+        open_func = gzip.open if features_tsv.endswith('.gz') else open
+        with open_func(features_tsv, 'rt', newline='') as f:
+            return cls(csv.DictReader(f, delimiter='\t'))
+
+
+def little_endian(values):
+    """Return an array('q') in little-endian byte order."""
+    if sys.byteorder == 'little':
+        return values
+    swapped = array('q', values)
+    swapped.byteswap()
+    return swapped
+
+def read_int64s(f, count):
+    """Read count little-endian 64-bit integers into an array('q')."""
+    values = array('q')
+    values.frombytes(f.read(count * 8))
+    if len(values) != count:
+        raise ValueError("Feature index file is truncated")
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a feature index from a features TSV file and optionally query it.")
+    parser.add_argument('features_tsv', type=str, help='Features TSV file (one genome)')
+    parser.add_argument('index_file', type=str, help='Path of the index file to write')
+    parser.add_argument('--region', type=str, default=None, help='Print the features overlapping contig:start-end')
+    args = parser.parse_args()
+
+    index = FeatureIndex.from_tsv(args.features_tsv)
+    index.save(args.index_file)
+    print(f"Indexed {len(index.rows)} features on {len(index.contigs)} contigs into {args.index_file}")
+
+    if args.region:
+        contig, coordinates = args.region.rsplit(':', 1)
+        start, end = (int(value) for value in coordinates.split('-'))
+        for feature in index.overlapping(contig, start, end):
+            print('\t'.join('' if feature[name] is None else str(feature[name]) for name in FEATURE_FIELDS))
@@ -0,0 +1,179 @@
+import csv
+import gzip
+import hashlib
+import argparse
+from itertools import product
+from .feature_and_protein_table import FEATURE_FIELDS
+
+SEQUENCE_FEATURE_TYPES = ('CDS', 'rRNA', 'tRNA')
+SEQUENCE_FIELDS = ['feature_id', 'feature_type', 'contig_md5', 'length', 'sequence_md5', 'translation_md5']
+
+COMPLEMENT = str.maketrans('ACGTUMRWSYKVHDBNacgtumrwsykvhdbn', 'TGCAAKYWSRMBDHVNtgcaakywsrmbdhvn')
+
+# NCBI translation table 11 (bacteria, archaea and plastids)
+AMINO_ACIDS_11 = 'FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG'
+CODON_TABLE_11 = {''.join(codon): amino_acid for codon, amino_acid in zip(product('TCAG', repeat=3), AMINO_ACIDS_11)}
+START_CODONS_11 = {'TTG', 'CTG', 'ATT', 'ATC', 'ATA', 'ATG', 'GTG'}
+
+START = FEATURE_FIELDS.index('start')
+END = FEATURE_FIELDS.index('end')
+STRAND = FEATURE_FIELDS.index('strand')
+PHASE = FEATURE_FIELDS.index('phase')
+SEQ_ID = FEATURE_FIELDS.index('seq_id')
+FEATURE_TYPE = FEATURE_FIELDS.index('feature_type')
+FEATURE_UID = FEATURE_FIELDS.index('feature_uid')
+CONTIG_MD5 = FEATURE_FIELDS.index('contig_md5')
+
+def reverse_complement(sequence):
+    """Return the reverse complement of a nucleotide sequence, keeping IUPAC codes and case."""
+    return sequence.translate(COMPLEMENT)[::-1]
+
+def translate(sequence, phase=0, table=CODON_TABLE_11, start_codons=START_CODONS_11):
+    """
+    Translate a coding sequence, skipping phase bases at its 5' end. An alternative start codon
+    is translated as M when the sequence starts in phase 0, a trailing stop is dropped, and
+    codons with ambiguous bases become X.
+    """
+    sequence = sequence[phase:].upper()
+    protein = ''.join([table.get(sequence[i:i + 3], 'X') for i in range(0, len(sequence) - 2, 3)])
+    if phase == 0 and sequence[:3] in start_codons:
+        protein = 'M' + protein[1:]
+    if protein.endswith('*'):
+        protein = protein[:-1]
+    return protein
+
+class FeatureSequenceExtractor:
+    """
+    Extract the nucleotide sequences (and optionally the translations) of features. Features
+    are grouped by contig and sorted by start, so each contig is read once, either while
+    streaming the assembly FASTA or from a ContigStore, and all of its features are sliced
+    from it before moving on to the next contig.
+    """
+
+    def __init__(self, features, feature_types=SEQUENCE_FEATURE_TYPES, translate=False):
+        self.feature_types = set(feature_types)
+        self.translate = translate
+        self.contigs = {}
+        for row in features:
+            self.add(row)
+        for contig_features in self.contigs.values():
+            contig_features.sort()
+
+    def add(self, row):
+        """Add a feature given as a dictionary or as a tuple ordered like FEATURE_FIELDS."""
+        if isinstance(row, dict):
+            row = tuple(row.get(name) for name in FEATURE_FIELDS)
+        if row[FEATURE_TYPE] not in self.feature_types:
+            return
+        phase = int(row[PHASE]) if row[PHASE] not in (None, '') else 0
+        self.contigs.setdefault(row[SEQ_ID], []).append(
+            (int(row[START]), int(row[END]), row[STRAND], phase, row[FEATURE_TYPE], row[FEATURE_UID], row[CONTIG_MD5]))
+
+    def extract_contig(self, seq_id, sequence):
+        """Yield (feature_uid, feature_type, contig_md5, sequence, translation) for the features on one contig."""
+        for start, end, strand, phase, feature_type, feature_uid, contig_md5 in self.contigs.get(seq_id, ()):
+            feature_sequence = sequence[start - 1:end]
+            if strand == '-':
+                feature_sequence = reverse_complement(feature_sequence)
+            translation = None
+            if self.translate and feature_type == 'CDS':
+                translation = translate(feature_sequence, phase)
+            yield feature_uid, feature_type, contig_md5, feature_sequence, translation
+
+    def extract_from_assembly(self, assembly_file):
+        """Stream an assembly FASTA file and extract the features of each contig as it is read."""
+        open_func = gzip.open if assembly_file.endswith('.gz') else open
+        with open_func(assembly_file, 'rt', encoding='utf-8', errors='ignore') as file:
+            current_contig = None
+            parts = []
+            for line in file:
+                if line.startswith('>'):
+                    if current_contig in self.contigs:
+                        yield from self.extract_contig(current_contig, ''.join(parts))
+                    current_contig = line[1:].strip().split()[0]
+                    parts = []
+                elif current_contig in self.contigs:
+                    parts.append(line.strip())
+            if current_contig in self.contigs:
+                yield from self.extract_contig(current_contig, ''.join(parts))
+
+    def extract_from_store(self, contig_store):
+        """Extract the features of each contig from a ContigStore, looking contigs up by contig_md5."""
+        for seq_id, contig_features in self.contigs.items():
+            contig_md5 = contig_features[0][6]
+            sequence = contig_store.fetch(contig_md5) if contig_md5 else None
+            if sequence is None:
+                print(f"Contig {seq_id} ({contig_md5}) not found in contig store, skipping {len(contig_features)} features")
+                continue
+            yield from self.extract_contig(seq_id, sequence)
+
+    @staticmethod
+    def write(records, sequences_tsv, nucleotide_fasta=None, protein_fasta=None, append=False):
+        """
+        Write one row per feature to sequences_tsv with the MD5s of its sequence and translation,
+        and each distinct sequence once to the optional FASTA files, with its MD5 as the header.
+        """
+        nucleotide_md5s = set()
+        protein_md5s = set()
+        mode = 'a' if append else 'w'
+        nucleotide_out = open(nucleotide_fasta, mode) if nucleotide_fasta else None
+        protein_out = open(protein_fasta, mode) if protein_fasta else None
+        count = 0
+        try:
+            with open(sequences_tsv, mode, newline='') as f_out:
+                writer = csv.writer(f_out, delimiter='\t')
+                if not append or f_out.tell() == 0:
+                    writer.writerow(SEQUENCE_FIELDS)
+                for feature_uid, feature_type, contig_md5, sequence, translation in records:
+                    sequence_md5 = hashlib.md5(sequence.encode()).hexdigest()
+                    translation_md5 = hashlib.md5(translation.encode()).hexdigest() if translation is not None else None
+                    writer.writerow([feature_uid, feature_type, contig_md5, len(sequence), sequence_md5, translation_md5])
+                    if nucleotide_out and sequence_md5 not in nucleotide_md5s:
+                        nucleotide_md5s.add(sequence_md5)
+                        nucleotide_out.write(f">{sequence_md5}\n{sequence}\n")
+                    if protein_out and translation_md5 and translation_md5 not in protein_md5s:
+                        protein_md5s.add(translation_md5)
+                        protein_out.write(f">{translation_md5}\n{translation}\n")
+                    count += 1
+        finally:
+            if nucleotide_out:
+                nucleotide_out.close()
+            if protein_out:
+                protein_out.close()
+        print(f"Wrote sequences for {count} features to {sequences_tsv}")
+        return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract feature nucleotide sequences and translations from a features TSV file.")
+    parser.add_argument('features_tsv', type=str, help='Features TSV file written by feature_and_protein_table')
+    parser.add_argument('--assembly', type=str, default=None, help='Assembly FASTA file of the genome in features_tsv')
+    parser.add_argument('--contig_store', type=str, default=None, help='Contig store directory to read contigs from by contig_md5')
+    parser.add_argument('--output', type=str, default='feature_sequences.tsv', help='Output TSV file with the sequence MD5s of each feature')
+    parser.add_argument('--nucleotide_fasta', type=str, default=None, help='Output FASTA file of distinct nucleotide sequences')
+    parser.add_argument('--protein_fasta', type=str, default=None, help='Output FASTA file of distinct CDS translations')
+    parser.add_argument('--feature_types', type=str, default=','.join(SEQUENCE_FEATURE_TYPES), help='Comma-separated feature types to extract')
+    parser.add_argument('--translate', action='store_true', help='Translate CDS features with translation table 11')
+    args = parser.parse_args()
+
+    if bool(args.assembly) == bool(args.contig_store):
+        parser.error("Give exactly one of --assembly or --contig_store")
+
+    open_func = gzip.open if args.features_tsv.endswith('.gz') else open
+    with open_func(args.features_tsv, 'rt', newline='') as f:
+        extractor = FeatureSequenceExtractor(csv.DictReader(f, delimiter='\t'),
+                                             feature_types=args.feature_types.split(','),
+                                             translate=args.translate or bool(args.protein_fasta))
+
+    if args.assembly:
+        records = extractor.extract_from_assembly(args.assembly)
+        FeatureSequenceExtractor.write(records, args.output, args.nucleotide_fasta, args.protein_fasta)
+    else:
+        from .contig_store import ContigStore
+        store = ContigStore(args.contig_store)
+        FeatureSequenceExtractor.write(extractor.extract_from_store(store), args.output,
+                                       args.nucleotide_fasta, args.protein_fasta)
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+# Conversions between the 32-character hex MD5 IDs used in the TSV outputs and their compact
+# forms: 16-byte binary strings (SQLite BLOB, fixed-size binary columns) or pairs of signed
+# 64-bit integers (for integer-only columnar formats). Values that are not 32-character hex
+# strings, such as accessions used as IDs, are passed through unchanged.
+
+ID_HEX_LENGTH = 32
+
+def encode_id(value):
+    """Return the 16-byte binary form of a hex MD5 ID, or value unchanged if it is not one."""
+    if isinstance(value, str) and len(value) == ID_HEX_LENGTH:
+        try:
+            return bytes.fromhex(value)
+        except ValueError:
+            return value
+    return value
+
+def decode_id(value):
+    """Return the hex form of a 16-byte binary ID, or value unchanged if it is not one."""
+    if isinstance(value, (bytes, bytearray, memoryview)) and len(value) == ID_HEX_LENGTH // 2:
+        return bytes(value).hex()
+    return value
+
+def split_id(value):
+    """Split a hex or binary MD5 ID into (high, low) signed 64-bit integers."""
+    binary = encode_id(value) if isinstance(value, str) else bytes(value)
+    return int.from_bytes(binary[:8], 'big', signed=True), int.from_bytes(binary[8:], 'big', signed=True)
+
+def join_id(high, low):
+    """Return the hex MD5 ID of a (high, low) pair made by split_id."""
+    return (high.to_bytes(8, 'big', signed=True) + low.to_bytes(8, 'big', signed=True)).hex()
@@ -1,9 +1,9 @@
 import json
 import hashlib
-import pandas as pd
 import sys
 import re
 import argparse
+from .profiling import profiled, add_profiling_arguments, start_profiling, finish_profiling
 
 
 class NCBIJSONLParser:
@@ -53,6 +53,8 @@ class NCBIJSONLParser:
         lon = float(lon) * (1 if lon_dir == 'E' else -1)
         return lat, lon
 
+    @profiled('ncbi_jsonl.parse', input_file=lambda self: self.input_file,
+              records=lambda self, result: len(self.sample_details_data))
     def parse(self):
         """Parse the JSONL file and extract relevant information."""
         with open(self.input_file, 'r') as file:
@@ -242,8 +244,13 @@ class NCBIJSONLParser:
                 }  
                 self.observation_details_data.append(observation_details_entry) 
 
+    @profiled('ncbi_jsonl.save_to_tsv', item=lambda self: self.input_file,
+              records=lambda self, result: len(self.sample_details_data),
+              outputs=lambda self: (self.sample_details_file, self.sample_attributes_file,
+                                    self.source_details_file, self.observation_details_file))
     def save_to_tsv(self):
         """Convert the extracted data to dataframes and save to TSV files."""
+        import pandas as pd  # Imported here so parsing and SQLite loading do not need pandas
         pd.DataFrame(self.sample_details_data).to_csv(self.sample_details_file, sep='\t', index=False)
         pd.DataFrame(self.sample_attributes_data).to_csv(self.sample_attributes_file, sep='\t', index=False)
         pd.DataFrame(self.source_details_data).to_csv(self.source_details_file, sep='\t', index=False)
@@ -261,9 +268,14 @@ if __name__ == '__main__':
     parser.add_argument('--sample_attributes_path', type=str, default='sample_attributes.tsv', help='Path to the output sample attributes TSV file')
     parser.add_argument('--source_details_path', type=str, default='source_details.tsv', help='Path to the output source details TSV file')
     parser.add_argument('--observation_details_path', type=str, default='observation_details.tsv', help='Path to the output observation details TSV file')
+    parser.add_argument('--sqlite', type=str, default=None, help='Load the tables into this SQLite database instead of writing TSV files')
+    parser.add_argument('--binary_ids', action='store_true', help='With --sqlite, store MD5 ID columns as 16-byte BLOBs instead of hex text')
+
+    add_profiling_arguments(parser)
 
     # Parse the arguments
     args = parser.parse_args()
+    start_profiling(args)
 
     # Assign the parsed arguments to variables
     input_file_path = args.input_file_path
@@ -275,4 +287,11 @@ if __name__ == '__main__':
     # Create an instance of NCBIJSONLParser
     parser_instance = NCBIJSONLParser(input_file_path, sample_details_path, sample_attributes_path, source_details_path, observation_details_path)
     parser_instance.parse()
-    parser_instance.save_to_tsv()
+    if args.sqlite:
+        from cdm_utils.sql_loader import SQLiteLoader
+        loader = SQLiteLoader(args.sqlite, binary_ids=args.binary_ids)
+        loader.load_ncbi_parser(parser_instance)
+        loader.close()
+    else:
+        parser_instance.save_to_tsv()
+    finish_profiling()
@@ -1,4 +1,3 @@
-import pandas as pd
 import hashlib
 import argparse
 
@@ -34,12 +33,15 @@ class ObservationAndAssembly:
         self.observations.append(observation_entry)
 
     def to_dataframe(self):
+        import pandas as pd
         assembly_df = pd.DataFrame(self.assemblies).drop_duplicates()
         observation_df = pd.DataFrame(self.observations)
         return assembly_df, observation_df
 
 # Main function to handle command-line arguments and process files
 def main(input_file_path, assembly_output_path, observation_output_path, protocol_output_path):
+    import pandas as pd  # Imported here so the module loads quickly without pandas
+
     # Load the TSV file
     df = pd.read_csv(input_file_path, sep='\t')
 
@@ -1,27 +1,36 @@
 import subprocess
+import shlex
 import sys
 import os
 import uuid
 import re
+import hashlib
+from .feature_and_protein_table import GFFParser
+from .profiling import profiled
 
 class ProdigalAnnotation:
-    def __init__(self, assembly_file, prefix, output_dir):
+    def __init__(self, assembly_file, prefix, output_dir, contig_store=None):
         self.assembly_file = assembly_file
         self.prefix = prefix
+        self.contig_store = contig_store  # Filled while the assembly is hashed, if given
         self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
         self.decompressed_file = os.path.join(self.output_dir, f"{prefix}_decompressed.fna")
         self.gff_output = os.path.join(self.output_dir, f"{self.prefix}_original.gff")
         self.faa_output = os.path.join(self.output_dir, f"{self.prefix}_prodigal.faa")
         self.updated_gff_output = os.path.join(self.output_dir, f"{self.prefix}_prodigal.gff")
+        # Checksums computed while preparing the inputs and outputs, reusable by GFFParser
+        self.assembly_md5 = None
+        self.contig_md5s = {}
+        self.gff_md5 = None
 
     def run_command(self, command):
-        """Helper method to run a shell command."""
+        """Helper method to run a command given as a list of arguments, without a shell."""
         try:
-            subprocess.run(command, shell=True, check=True)
-            print(f"Executed: {command}")
-        except subprocess.CalledProcessError as e:
-            print(f"Error executing command: {command}")
+            subprocess.run(command, check=True)
+            print(f"Executed: {shlex.join(command)}")
+        except (subprocess.CalledProcessError, OSError) as e:
+            print(f"Error executing command: {shlex.join(command)}")
             print(e)  # Print the error message for debugging
             sys.exit(1)
 
@@ -32,33 +41,45 @@ class ProdigalAnnotation:
             sys.exit(1)
 
         if self.assembly_file.endswith('.gz'):
-            command = f"gzip -dc {self.assembly_file} > {self.decompressed_file}"
-            self.run_command(command)
+            # Decompress and compute the assembly and contig MD5s in the same pass
+            self.assembly_md5, self.contig_md5s = GFFParser.hash_assembly(self.assembly_file, copy_to=self.decompressed_file,
+                                                                          contig_store=self.contig_store)
             # Use the decompressed file
             self.assembly_file = self.decompressed_file
         else:
             # Use the provided uncompressed file directly
             self.decompressed_file = self.assembly_file
+            self.assembly_md5, self.contig_md5s = GFFParser.hash_assembly(self.assembly_file, contig_store=self.contig_store)
 
+    def prodigal_command(self):
+        """Return the Prodigal command line as a list of arguments."""
+        return ['prodigal', '-i', self.decompressed_file, '-o', self.gff_output, '-a', self.faa_output, '-f', 'gff']
+
+    @profiled('prodigal.run', input_file=lambda self: self.assembly_file)
     def run_prodigal(self):
         """Run Prodigal with a specified prefix, outputting to a UUID directory."""
         if not os.path.isfile(self.decompressed_file):
             print(f"Error: The decompressed file {self.decompressed_file} does not exist.")
             sys.exit(1)
-        command = f"prodigal -i {self.decompressed_file} -o {self.gff_output} -a {self.faa_output} -f gff"
-        self.run_command(command)
+        self.run_command(self.prodigal_command())
 
         print(f"GFF output: {self.gff_output}")
         print(f"Protein FASTA output: {self.faa_output}")
 
     def update_gff_ids(self):
         """Update the GFF file with gene entries and corresponding CDS entries with Parent attributes."""
+        gff_md5 = hashlib.md5()
         with open(self.gff_output, 'r') as infile, open(self.updated_gff_output, 'w') as outfile:
+            def write(text):
+                # Hash the updated GFF while writing it so it does not have to be re-read later
+                gff_md5.update(text.encode('utf-8'))
+                outfile.write(text)
+
             cds_counter = 1  # Initialize counter for CDS
 
             for line in infile:
                 if line.startswith("#"):
-                    outfile.write(line)  # Write headers and comments as-is
+                    write(line)  # Write headers and comments as-is
                 else:
                     fields = line.strip().split("\t")
                     seq_id = fields[0]  # Get the sequence ID
@@ -83,7 +104,7 @@ class ProdigalAnnotation:
                             seq_id, "Prodigal_v2.6.3", "gene", start, end, ".", strand, ".",
                             f"ID={gene_id};Name={gene_id}"
                         ]) + "\n"
-                        outfile.write(gene_entry)
+                        write(gene_entry)
 
                         # Construct the protein_id by appending "_prot" to the new CDS ID
                         protein_id = f"{new_cds_id}_prot"
@@ -91,11 +112,12 @@ class ProdigalAnnotation:
                         # Update the CDS entry with the new ID, Parent attribute, and protein_id
                         attributes = re.sub(r'ID=[^;]+', f'ID={new_cds_id};Parent={gene_id};protein_id={protein_id}', attributes)
                         fields[-1] = attributes
-                        outfile.write("\t".join(fields) + "\n")
+                        write("\t".join(fields) + "\n")
 
                         # Increment the CDS counter for unique ID assignment
                         cds_counter += 1
 
+        self.gff_md5 = gff_md5.hexdigest()
         print(f"Updated GFF file with gene and CDS entries saved as {self.updated_gff_output}")
 
     def update_faa_file(self):
@@ -115,6 +137,10 @@ class ProdigalAnnotation:
             faa_file.writelines(modified_faa_lines)
         print(f"Modified FAA file saved with updated protein IDs.")
 
+    def output_files(self):
+        """Return the paths of the final GFF and FAA files."""
+        return self.updated_gff_output, self.faa_output
+
     def clean_up(self):
         """Clean up the decompressed file if it was originally gzipped."""
         if self.assembly_file.endswith('.gz') and os.path.exists(self.decompressed_file):
@@ -135,7 +161,7 @@ class ProdigalAnnotation:
 
 if __name__ == "__main__":
     if len(sys.argv) != 4:
-        print("Usage: python prodigal_annotation.py <path_to_assembly_file> <prefix> <output_dir>")
+        print("Usage: python -m cdm_utils.prodigal_annotation <path_to_assembly_file> <prefix> <output_dir>")
         sys.exit(1)
 
     assembly_file = sys.argv[1]
@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import time
+import resource
+import threading
+import functools
+from contextlib import contextmanager
+
+class StageStats:
+    """Accumulated timings and counts of one named stage."""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.records = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.items = {}  # Seconds per input file (or other item), to find unusually slow genomes
+
+    def to_dict(self, slowest=10):
+        return {
+            'calls': self.calls,
+            'seconds': round(self.seconds, 6),
+            'records': self.records,
+            'records_per_sec': round(self.records / self.seconds, 1) if self.seconds and self.records else None,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'slowest': [[item, round(seconds, 6)] for item, seconds in
+                        sorted(self.items.items(), key=lambda entry: entry[1], reverse=True)[:slowest]],
+        }
+
+class StageTimer:
+    """Handle yielded by RunReport.stage() for adding counts while the stage runs."""
+
+    def __init__(self):
+        self.records = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def add(self, records=0, bytes_in=0, bytes_out=0):
+        self.records += records
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+
+class RunReport:
+    """
+    Timings and counters for one invocation. Stages are timed with the stage() context
+    manager or the profiled() decorator, and counters (cache hits, skipped records) are added
+    with count(). Timing a stage costs two clock reads, so it is always on; the report is only
+    written when a path is configured. cProfile and tracemalloc capture are optional because
+    they slow the run down.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.report_path = None
+        self.cprofile_path = None
+        self.profiler = None
+        self.tracemalloc = False
+
+    @contextmanager
+    def stage(self, name, item=None):
+        """Time a block of code as stage name. item (an input file, for example) is recorded with its duration."""
+        timer = StageTimer()
+        started = time.perf_counter()
+        try:
+            yield timer
+        finally:
+            seconds = time.perf_counter() - started
+            with self.lock:
+                stats = self.stages.get(name)
+                if stats is None:
+                    stats = self.stages[name] = StageStats()
+                stats.calls += 1
+                stats.seconds += seconds
+                stats.records += timer.records
+                stats.bytes_in += timer.bytes_in
+                stats.bytes_out += timer.bytes_out
+                if item is not None:
+                    stats.items[str(item)] = stats.items.get(str(item), 0) + seconds
+
+    def count(self, name, value=1):
+        """Add value to the counter name."""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def configure(self, report_path=None, cprofile_path=None, tracemalloc=False):
+        """Set where the report goes and start the optional cProfile and tracemalloc capture."""
+        self.report_path = report_path
+        self.cprofile_path = cprofile_path
+        if cprofile_path:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        if tracemalloc:
+            import tracemalloc as tracemalloc_module
+            tracemalloc_module.start()
+            self.tracemalloc = True
+
+    def to_dict(self):
+        with self.lock:
+            report = {
+                'command': sys.argv,
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'wall_seconds': round(time.time() - self.started, 3),
+                'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                'stages': {name: stats.to_dict() for name, stats in self.stages.items()},
+                'counters': dict(self.counters),
+            }
+        if self.tracemalloc:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics('lineno')[:10]
+            report['tracemalloc'] = {
+                'current_bytes': current,
+                'peak_bytes': peak,
+                'top': [[str(stat.traceback), stat.size] for stat in top],
+            }
+        return report
+
+    def finish(self):
+        """Stop the optional capture and write the cProfile output and the JSON report, if configured."""
+        if self.profiler:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.cprofile_path)
+            print(f"cProfile output written to {self.cprofile_path}")
+        if self.report_path:
+            with open(self.report_path, 'w') as f:
+                json.dump(self.to_dict(), f, indent=2)
+            print(f"Run report written to {self.report_path}")
+
+# The report of the current process
+REPORT = RunReport()
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+def profiled(name, input_file=None, item=None, records=None, outputs=None):
+    """
+    Decorator that times a method as stage name in REPORT.
+    input_file(self, *args) returns the file the call reads; it names the call in the report and its size counts as bytes in.
+    item(self, *args) names the call instead, for stages that do not read a file.
+    records(self, result) returns the number of records the call handled.
+    outputs(self, *args) returns the files the call writes or appends to; how much they grow counts as bytes out.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            path = input_file(self, *args, **kwargs) if input_file else None
+            label = item(self, *args, **kwargs) if item else path
+            output_paths = list(outputs(self, *args, **kwargs)) if outputs else []
+            sizes_before = [file_size(out) for out in output_paths]
+            with REPORT.stage(name, item=label) as timer:
+                result = method(self, *args, **kwargs)
+                bytes_out = 0
+                for out, before in zip(output_paths, sizes_before):
+                    after = file_size(out)
+                    bytes_out += after - before if after >= before else after  # A smaller file was overwritten
+                timer.add(records=records(self, result) if records else 0, bytes_in=file_size(path), bytes_out=bytes_out)
+            return result
+        return wrapper
+    return decorator
+
+def add_profiling_arguments(parser):
+    """Add the --profile_report, --cprofile and --tracemalloc options to an argparse parser."""
+    parser.add_argument('--profile_report', type=str, default=os.environ.get('CDM_PROFILE_REPORT'),
+                        help='Write a JSON report of stage timings and counters to this file (default: $CDM_PROFILE_REPORT)')
+    parser.add_argument('--cprofile', type=str, default=None, help='Write cProfile statistics for the whole run to this file')
+    parser.add_argument('--tracemalloc', action='store_true', help='Trace Python memory allocations and add the top allocation sites to the report')
+
+def start_profiling(args):
+    REPORT.configure(args.profile_report, args.cprofile, args.tracemalloc)
+
+def finish_profiling():
+    REPORT.finish()
@@ -1,25 +1,50 @@
 import subprocess
+import shlex
 import sys
 import os
 import uuid
 import shutil
+import queue
+import tempfile
+import argparse
+import csv
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from .feature_and_protein_table import GFFParser
+from .profiling import profiled, add_profiling_arguments, start_profiling, finish_profiling
 
 class ProkkaAnnotation:
-    def __init__(self, assembly_file, prefix, output_dir):
+    def __init__(self, assembly_file, prefix, output_dir, work_dir=None, cpus=None, contig_store=None):
         self.assembly_file = assembly_file
         self.prefix = prefix
         self.output_dir = output_dir
-        self.temp_fna_dir = os.path.join(os.path.dirname(self.output_dir), str(uuid.uuid4()))  # Temporary directory for .fna file
-        self.temp_prokka_dir = os.path.join(os.path.dirname(self.output_dir), str(uuid.uuid4()))  # Temporary directory for Prokka output
+        self.cpus = cpus
+        self.contig_store = contig_store  # Filled while the assembly is hashed, if given
+        # A caller-provided work_dir (e.g. a slot on fast local scratch) is reused across jobs,
+        # otherwise fresh temporary directories are created next to the output directory.
+        self.reuse_work_dir = work_dir is not None
+        if self.reuse_work_dir:
+            self.temp_fna_dir = os.path.join(work_dir, "fna")
+            self.temp_prokka_dir = os.path.join(work_dir, "prokka")
+        else:
+            self.temp_fna_dir = os.path.join(os.path.dirname(self.output_dir), str(uuid.uuid4()))  # Temporary directory for .fna file
+            self.temp_prokka_dir = os.path.join(os.path.dirname(self.output_dir), str(uuid.uuid4()))  # Temporary directory for Prokka output
         self.temp_fna_path = os.path.join(self.temp_fna_dir, "temp.fna")  # Decompressed file path in temp_fna_dir
+        # Checksums computed while preparing the inputs and outputs, reusable by GFFParser
+        self.assembly_md5 = None
+        self.contig_md5s = {}
+        self.gff_md5 = None
+        # Results are assembled in a hidden sibling of output_dir and renamed into place at the end
+        self.staging_dir = os.path.join(os.path.dirname(os.path.abspath(self.output_dir)),
+                                        f".{os.path.basename(os.path.normpath(self.output_dir))}.{uuid.uuid4()}.partial")
 
     def run_command(self, command):
-        """Helper method to run a shell command and print output."""
+        """Helper method to run a command given as a list of arguments, without a shell."""
         try:
-            subprocess.run(command, shell=True, check=True, executable='/bin/bash')
-            print(f"Executed: {command}")
-        except subprocess.CalledProcessError as e:
-            print(f"Error executing command: {command}")
+            subprocess.run(command, check=True)
+            print(f"Executed: {shlex.join(command)}")
+        except (subprocess.CalledProcessError, OSError) as e:
+            print(f"Error executing command: {shlex.join(command)}")
             print(e)
             sys.exit(1)
 
@@ -28,9 +53,9 @@ class ProkkaAnnotation:
         if os.path.exists(self.output_dir):
             print(f"Error: Output directory {self.output_dir} already exists. Please provide a non-existing directory.")
             sys.exit(1)
-        os.makedirs(self.output_dir, exist_ok=False)  # Create output directory
-        os.makedirs(self.temp_fna_dir, exist_ok=False)  # Create temporary directory for .fna file
-        os.makedirs(self.temp_prokka_dir, exist_ok=False)  # Create temporary directory for Prokka output
+        os.makedirs(self.staging_dir, exist_ok=False)  # Create staging directory for the outputs
+        os.makedirs(self.temp_fna_dir, exist_ok=self.reuse_work_dir)  # Create temporary directory for .fna file
+        os.makedirs(self.temp_prokka_dir, exist_ok=self.reuse_work_dir)  # Create temporary directory for Prokka output
 
     def prepare_assembly_file(self):
         """Prepare the assembly file for Prokka, handling both gzipped and uncompressed formats."""
@@ -39,89 +64,127 @@ class ProkkaAnnotation:
             sys.exit(1)
 
         if self.assembly_file.endswith('.gz'):
-            command = f"gzip -dc {self.assembly_file} > {self.temp_fna_path}"
-            self.run_command(command)
+            # Decompress and compute the assembly and contig MD5s in the same pass
+            self.assembly_md5, self.contig_md5s = GFFParser.hash_assembly(self.assembly_file, copy_to=self.temp_fna_path,
+                                                                          contig_store=self.contig_store)
             # Check if the decompressed file was created and is not empty
             if not os.path.exists(self.temp_fna_path) or os.stat(self.temp_fna_path).st_size == 0:
                 print(f"Error: The file {self.temp_fna_path} was not created or is empty.")
                 sys.exit(1)
         else:
             self.temp_fna_path = self.assembly_file  # Use the uncompressed file directly
+            self.assembly_md5, self.contig_md5s = GFFParser.hash_assembly(self.assembly_file, contig_store=self.contig_store)
+
+    def prokka_command(self):
+        """Return the Prokka command line as a list of arguments."""
+        command = ['prokka', '--outdir', self.temp_prokka_dir, '--prefix', self.prefix, '--addgenes', '--force']
+        if self.cpus:
+            command.extend(['--cpus', str(self.cpus)])
+        command.append(self.temp_fna_path)
+        return command
 
+    @profiled('prokka.run', input_file=lambda self: self.assembly_file)
     def run_prokka(self):
-        """Run Prokka in a temporary directory and copy results to the output directory."""
-        prokka_command = f"prokka --outdir {self.temp_prokka_dir} --prefix {self.prefix} --addgenes --force {self.temp_fna_path}"
-        self.run_command(prokka_command)
+        """Run Prokka in a temporary directory and write the rewritten results to the staging directory."""
+        self.run_command(self.prokka_command())
+        self.collect_outputs()
 
-        # Copy GFF and FAA files to output directory
+    def collect_outputs(self):
+        """Check the Prokka outputs and write the rewritten GFF and FAA files to the staging directory."""
+        # Copy GFF and FAA files to the staging directory, rewriting protein IDs on the way
         gff_file = os.path.join(self.temp_prokka_dir, f"{self.prefix}.gff")
         faa_file = os.path.join(self.temp_prokka_dir, f"{self.prefix}.faa")
-        if os.path.exists(gff_file) and os.path.exists(faa_file):
-            shutil.copy(gff_file, self.output_dir)
-            shutil.copy(faa_file, self.output_dir)
-            print(f"Copied {gff_file} and {faa_file} to {self.output_dir}.")
-        else:
+        if not (os.path.exists(gff_file) and os.path.exists(faa_file)):
             print(f"Error: Prokka did not produce the expected output files.")
+            sys.exit(1)
+        self.modify_gff_file(gff_file)  # Add protein IDs to the GFF file
+        self.modify_faa_file(faa_file)  # Update the FAA file to match the new protein IDs
 
-    def modify_gff_file(self):
-        """Modify the GFF file to add protein IDs to CDS entries."""
-        gff_file_path = os.path.join(self.output_dir, f"{self.prefix}.gff")
+    @staticmethod
+    def add_protein_id(line):
+        """Return a GFF line with a protein_id attribute derived from the ID of CDS entries."""
+        fields = line.strip().split('\t')
+        if len(fields) < 9 or fields[2] != 'CDS' or line.startswith('#'):
+            return line
 
-        if not os.path.exists(gff_file_path):
-            print(f"Error: GFF file not found in output directory.")
-            sys.exit(1)
+        cds_id = None
+        for attribute in fields[8].split(';'):
+            key, sep, value = attribute.partition('=')
+            if sep and key.strip() == 'ID':
+                cds_id = value.strip()
+                break
 
-        modified_gff_lines = []
-        with open(gff_file_path, 'r') as gff_file:
-            for line in gff_file:
-                if line.startswith('#') or '\tCDS\t' not in line:
-                    modified_gff_lines.append(line)
-                    continue
-
-                fields = line.strip().split('\t')
-                attributes = fields[-1]
-                cds_id = None
-                if 'ID=' in attributes:
-                    cds_id = attributes.split('ID=')[1].split(';')[0]
-
-                if cds_id:
-                    protein_id = f"{cds_id}_prot"  # Construct protein_id from CDS ID
-                    attributes += f";protein_id={protein_id}"
-                    fields[-1] = attributes
-                    modified_gff_lines.append('\t'.join(fields) + '\n')
-                else:
-                    modified_gff_lines.append(line)
-
-        # Write modified GFF back to file
-        with open(gff_file_path, 'w') as gff_file:
-            gff_file.writelines(modified_gff_lines)
-        print(f"Modified GFF file saved with protein IDs added.")
-
-    def modify_faa_file(self):
-        """Modify the FAA file to match protein IDs with the updated GFF file."""
-        faa_file_path = os.path.join(self.output_dir, f"{self.prefix}.faa")
-
-        if not os.path.exists(faa_file_path):
-            print(f"Error: FAA file not found in output directory.")
-            sys.exit(1)
+        if not cds_id:
+            return line
+        protein_id = f"{cds_id}_prot"  # Construct protein_id from CDS ID
+        fields[8] = f"{fields[8]};protein_id={protein_id}"
+        return '\t'.join(fields) + '\n'
+
+    @staticmethod
+    def rename_protein(line):
+        """
+        Return a FASTA line with the protein ID in the header suffixed with _prot. The rest of the
+        header is kept after an added space, so the files match those of earlier releases byte for byte.
+        """
+        if not line.startswith('>'):
+            return line
+        header = line[1:]
+        protein_id = header.split()[0] if header.strip() else ''
+        return f">{protein_id}_prot {header[len(protein_id):]}"
+
+    def rewrite_file(self, source_path, target_path, rewrite_line):
+        """
+        Stream source_path through rewrite_line into a temporary file and rename it to target_path.
+        Returns the MD5 checksum of the written content.
+        """
+        md5 = hashlib.md5()
+        temp_path = f"{target_path}.tmp"
+        with open(source_path, 'r') as src, open(temp_path, 'w') as dst:
+            for line in src:
+                line = rewrite_line(line)
+                md5.update(line.encode('utf-8'))
+                dst.write(line)
+        os.replace(temp_path, target_path)
+        return md5.hexdigest()
 
-        modified_faa_lines = []
-        with open(faa_file_path, 'r') as faa_file:
-            for line in faa_file:
-                if line.startswith('>'):
-                    protein_id = line.split()[0][1:]  # Extract protein ID from fasta header
-                    new_protein_id = f"{protein_id}_prot"  # Update protein ID with _prot suffix
-                    modified_faa_lines.append(f">{new_protein_id} {line[len(protein_id)+1:]}")  # Replace old ID with new ID
-                else:
-                    modified_faa_lines.append(line)
-
-        # Write modified FAA back to file
-        with open(faa_file_path, 'w') as faa_file:
-            faa_file.writelines(modified_faa_lines)
-        print(f"Modified FAA file saved with updated protein IDs.")
+    def modify_gff_file(self, source_path):
+        """Copy the Prokka GFF file to the staging directory, adding protein IDs to CDS entries."""
+        gff_file_path = os.path.join(self.staging_dir, f"{self.prefix}.gff")
+        self.gff_md5 = self.rewrite_file(source_path, gff_file_path, self.add_protein_id)
+        print(f"Modified GFF file saved to {gff_file_path} with protein IDs added.")
+
+    def modify_faa_file(self, source_path):
+        """Copy the Prokka FAA file to the staging directory, matching protein IDs with the updated GFF file."""
+        faa_file_path = os.path.join(self.staging_dir, f"{self.prefix}.faa")
+        self.rewrite_file(source_path, faa_file_path, self.rename_protein)
+        print(f"Modified FAA file saved to {faa_file_path} with updated protein IDs.")
+
+    def output_files(self):
+        """Return the paths of the final GFF and FAA files."""
+        return (os.path.join(self.output_dir, f"{self.prefix}.gff"),
+                os.path.join(self.output_dir, f"{self.prefix}.faa"))
+
+    def publish_outputs(self):
+        """Atomically rename the staging directory to the final output directory."""
+        os.rename(self.staging_dir, self.output_dir)
+        print(f"Moved outputs from {self.staging_dir} to {self.output_dir}.")
 
     def clean_up(self):
-        """Remove the temporary directories after Prokka runs."""
+        """Remove the temporary directories after Prokka runs, or empty them if they are reused."""
+        if os.path.exists(self.staging_dir):
+            shutil.rmtree(self.staging_dir)
+            print(f"Removed staging directory: {self.staging_dir}")
+        if self.reuse_work_dir:
+            for temp_dir in (self.temp_fna_dir, self.temp_prokka_dir):
+                if not os.path.isdir(temp_dir):
+                    continue  # The job failed before prepare_directories created it
+                for entry in os.scandir(temp_dir):
+                    if entry.is_dir(follow_symlinks=False):
+                        shutil.rmtree(entry.path)
+                    else:
+                        os.remove(entry.path)
+            print(f"Emptied reusable work directories {self.temp_fna_dir} and {self.temp_prokka_dir}")
+            return
         if os.path.exists(self.temp_fna_dir) and self.assembly_file.endswith('.gz'):
             shutil.rmtree(self.temp_fna_dir)  # Remove the entire temporary .fna directory
             print(f"Removed temporary directory: {self.temp_fna_dir}")
@@ -133,21 +196,104 @@ class ProkkaAnnotation:
         """Main method to execute the full workflow."""
         self.prepare_directories()
         self.prepare_assembly_file()
-        self.run_prokka()
-        self.modify_gff_file()  # Modify the GFF file to add protein IDs
-        self.modify_faa_file()  # Modify the FAA file to match the updated protein IDs
+        self.run_prokka()  # Runs Prokka and rewrites the GFF and FAA files into the staging directory
+        self.publish_outputs()
         self.clean_up()
         print(f"All outputs are stored in: {self.output_dir}")
 
-if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: python run_prokka.py <path_to_assembly_fasta_file> <prefix> <output_dir>")
-        sys.exit(1)
 
-    assembly_file = sys.argv[1]
-    prefix = sys.argv[2]
-    output_dir = sys.argv[3]
+class ProkkaBatchRunner:
+    """Run Prokka on many assemblies concurrently, reusing work directories on fast scratch storage."""
+
+    def __init__(self, jobs, scratch_dir=None, cpus=8, max_workers=2):
+        """
+        Parameters:
+        - jobs: Iterable of (assembly_file, prefix, output_dir) tuples.
+        - scratch_dir: Directory for temporary files, e.g. $TMPDIR or /dev/shm (defaults to $TMPDIR).
+        - cpus: Total number of CPUs, split evenly across the concurrent Prokka jobs.
+        - max_workers: Number of Prokka jobs running at the same time.
+        """
+        self.jobs = list(jobs)
+        self.scratch_dir = scratch_dir or os.environ.get('TMPDIR') or tempfile.gettempdir()
+        self.max_workers = max(1, max_workers)
+        self.cpus_per_job = max(1, cpus // self.max_workers)
+        self.work_dirs = queue.Queue()
+
+    def prepare_work_dirs(self):
+        """Create one reusable work directory, with its fna and prokka subdirectories, per concurrent job slot."""
+        root = tempfile.mkdtemp(prefix='prokka_batch_', dir=self.scratch_dir)
+        for slot in range(self.max_workers):
+            work_dir = os.path.join(root, f"slot_{slot}")
+            os.makedirs(os.path.join(work_dir, "fna"))
+            os.makedirs(os.path.join(work_dir, "prokka"))
+            self.work_dirs.put(work_dir)
+        return root
 
-    annotation = ProkkaAnnotation(assembly_file, prefix, output_dir)
+    def run_job(self, assembly_file, prefix, output_dir):
+        """Run a single Prokka job in a free work directory slot."""
+        work_dir = self.work_dirs.get()
+        annotation = ProkkaAnnotation(assembly_file, prefix, output_dir, work_dir=work_dir, cpus=self.cpus_per_job)
+        try:
+            annotation.run()
+            return True
+        except (Exception, SystemExit) as e:
+            # ProkkaAnnotation exits on errors; report the failure and keep the batch going
+            print(f"Error annotating {assembly_file}: {e}")
+            annotation.clean_up()
+            return False
+        finally:
+            self.work_dirs.put(work_dir)
+
+    def run(self):
+        """Run all jobs and return the list of output directories that failed."""
+        root = self.prepare_work_dirs()
+        print(f"Running {len(self.jobs)} Prokka jobs, {self.max_workers} at a time with {self.cpus_per_job} CPUs each, in {root}")
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(executor.map(lambda job: self.run_job(*job), self.jobs))
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+        failed = [job[2] for job, ok in zip(self.jobs, results) if not ok]
+        print(f"Finished Prokka batch: {len(self.jobs) - len(failed)} succeeded, {len(failed)} failed.")
+        return failed
+
+    @staticmethod
+    def read_jobs(jobs_file):
+        """Read (assembly_file, prefix, output_dir) rows from a tab-delimited file."""
+        with open(jobs_file, 'r') as f:
+            return [tuple(row[:3]) for row in csv.reader(f, delimiter='\t') if len(row) >= 3]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Prokka on a single assembly or on a batch of assemblies.")
+    parser.add_argument('assembly_file', nargs='?', help='Path to the assembly FASTA file (single run)')
+    parser.add_argument('prefix', nargs='?', help='Prefix for the Prokka outputs (single run)')
+    parser.add_argument('output_dir', nargs='?', help='Output directory, must not exist (single run)')
+    parser.add_argument('--batch', type=str, help='Tab-delimited file with assembly_file, prefix and output_dir per line')
+    parser.add_argument('--scratch_dir', type=str, default=None, help='Scratch directory for temporary files (default: $TMPDIR)')
+    parser.add_argument('--cpus', type=int, default=None, help='Total number of CPUs to use (batch default: 8)')
+    parser.add_argument('--jobs', type=int, default=2, help='Number of concurrent Prokka jobs in batch mode')
+    add_profiling_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args)
+
+    if args.batch:
+        runner = ProkkaBatchRunner(ProkkaBatchRunner.read_jobs(args.batch), scratch_dir=args.scratch_dir,
+                                   cpus=args.cpus or 8, max_workers=args.jobs)
+        failed = runner.run()
+        finish_profiling()
+        sys.exit(1 if failed else 0)
+
+    if not (args.assembly_file and args.prefix and args.output_dir):
+        print("Usage: python -m cdm_utils.prokka_annotation <path_to_assembly_fasta_file> <prefix> <output_dir>")
+        print("   or: python -m cdm_utils.prokka_annotation --batch <jobs.tsv> [--scratch_dir DIR] [--cpus N] [--jobs N]")
+        sys.exit(1)
+
+    annotation = ProkkaAnnotation(args.assembly_file, args.prefix, args.output_dir, cpus=args.cpus)
     annotation.run()
+    finish_profiling()
+
+if __name__ == "__main__":
+    main()
 
@@ -0,0 +1,144 @@
+import os
+import gzip
+import zlib
+import argparse
+from bisect import bisect_left
+from .profiling import REPORT
+
+class SortedDigests:
+    """Read-only sorted sequence of 16-byte MD5 digests packed into one bytes object."""
+
+    def __init__(self, digests=()):
+        self.blob = b''.join(sorted(digests))
+
+    def __len__(self):
+        return len(self.blob) // 16
+
+    def __getitem__(self, i):
+        return self.blob[i * 16:(i + 1) * 16]
+
+    def __contains__(self, digest):
+        i = bisect_left(self, digest)
+        return i < len(self) and self[i] == digest
+
+class ProteinStore:
+    """
+    Deduplicated protein sequence store keyed by protein_md5.
+
+    Sequences are appended to proteins.fa.gz as a series of gzip members (one per block of
+    sequences), which together still form a valid gzipped FASTA file with the MD5 as the header.
+    proteins.idx records, for each MD5, the block's offset and size in the compressed file and
+    the sequence's offset and length inside the block, so a sequence can be read back by
+    decompressing a single block. MD5s already in the store, from this or any previous run,
+    are skipped, so the store grows with the number of unique proteins.
+    Only one process should write to a store at a time.
+    """
+
+    def __init__(self, directory, block_size=1 << 20):
+        self.directory = directory
+        self.block_size = block_size
+        os.makedirs(directory, exist_ok=True)
+        self.fasta_path = os.path.join(directory, 'proteins.fa.gz')
+        self.index_path = os.path.join(directory, 'proteins.idx')
+
+        self.known = SortedDigests(self.read_index_digests())
+        self.added = set()
+        self.block = []
+        self.block_bytes = 0
+        self.locations = None
+        self.skipped = 0
+
+    def read_index_digests(self):
+        """Yield the digests of all sequences already in the store."""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'r') as index_file:
+            for line in index_file:
+                yield bytes.fromhex(line[:32])
+
+    def __contains__(self, protein_md5):
+        digest = bytes.fromhex(protein_md5)
+        return digest in self.added or digest in self.known
+
+    def __len__(self):
+        return len(self.known) + len(self.added)
+
+    def add(self, protein_md5, sequence):
+        """Add a sequence unless its MD5 is already stored. Returns True if it was added."""
+        digest = bytes.fromhex(protein_md5)
+        if digest in self.added or digest in self.known:
+            self.skipped += 1
+            return False
+        self.added.add(digest)
+        self.block.append((protein_md5, sequence))
+        self.block_bytes += len(sequence) + 35
+        if self.block_bytes >= self.block_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Write the pending sequences as one gzip member and record their locations in the index."""
+        if not self.block:
+            return
+        parts = []
+        entries = []
+        position = 0
+        for protein_md5, sequence in self.block:
+            header = f">{protein_md5}\n"
+            entries.append((protein_md5, position + len(header), len(sequence)))
+            parts.append(f"{header}{sequence}\n")
+            position += len(header) + len(sequence) + 1
+        member = gzip.compress(''.join(parts).encode('ascii'))
+
+        with open(self.fasta_path, 'ab') as fasta_file:
+            member_offset = fasta_file.tell()
+            fasta_file.write(member)
+        with open(self.index_path, 'a') as index_file:
+            for protein_md5, offset, length in entries:
+                index_file.write(f"{protein_md5}\t{member_offset}\t{len(member)}\t{offset}\t{length}\n")
+                if self.locations is not None:
+                    self.locations[protein_md5] = (member_offset, len(member), offset, length)
+
+        self.block = []
+        self.block_bytes = 0
+
+    def get(self, protein_md5):
+        """Return the stored sequence for protein_md5, or None."""
+        self.flush()
+        if self.locations is None:
+            self.locations = {}
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r') as index_file:
+                    for line in index_file:
+                        md5, member_offset, member_length, offset, length = line.rstrip('\n').split('\t')
+                        self.locations[md5] = (int(member_offset), int(member_length), int(offset), int(length))
+        location = self.locations.get(protein_md5)
+        if location is None:
+            return None
+        member_offset, member_length, offset, length = location
+        with open(self.fasta_path, 'rb') as fasta_file:
+            fasta_file.seek(member_offset)
+            block = zlib.decompress(fasta_file.read(member_length), wbits=31)
+        return block[offset:offset + length].decode('ascii')
+
+    def close(self):
+        """Flush pending sequences."""
+        self.flush()
+        REPORT.count('protein_store.added', len(self.added))
+        REPORT.count('protein_store.hits', self.skipped)
+        print(f"Protein store {self.directory}: {len(self.added)} new sequences, {self.skipped} already stored")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up protein sequences in a protein store by protein_md5.")
+    parser.add_argument('store_dir', type=str, help='Protein store directory')
+    parser.add_argument('protein_md5', nargs='+', help='Protein MD5s to print as FASTA')
+    args = parser.parse_args()
+
+    store = ProteinStore(args.store_dir)
+    for protein_md5 in args.protein_md5:
+        sequence = store.get(protein_md5)
+        if sequence is None:
+            print(f"Protein {protein_md5} not found in {args.store_dir}")
+        else:
+            print(f">{protein_md5}\n{sequence}")
@@ -0,0 +1,131 @@
+import heapq
+import tempfile
+from itertools import groupby
+
+class SortedIdSpool:
+    """
+    Collect IDs and return them in sorted order with bounded memory. IDs are buffered in memory
+    and, once max_in_memory are held, sorted and written to a temporary run file. Iterating
+    merges the runs and the remaining buffer with heapq.merge, one ID per run in memory at a time.
+    """
+
+    def __init__(self, max_in_memory=1000000, directory=None):
+        self.max_in_memory = max_in_memory
+        self.directory = directory
+        self.buffer = []
+        self.runs = []
+        self.count = 0
+
+    def add(self, value):
+        self.buffer.append(value)
+        self.count += 1
+        if len(self.buffer) >= self.max_in_memory:
+            self.spill()
+
+    def spill(self):
+        """Write the buffered IDs to a new sorted run file."""
+        if not self.buffer:
+            return
+        self.buffer.sort()
+        run = tempfile.TemporaryFile('w+', dir=self.directory)
+        run.writelines(f"{value}\n" for value in self.buffer)
+        self.runs.append(run)
+        self.buffer = []
+
+    @staticmethod
+    def read_run(run):
+        run.seek(0)
+        for line in run:
+            yield line[:-1]
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        self.buffer.sort()
+        return heapq.merge(*(self.read_run(run) for run in self.runs), self.buffer)
+
+    def close(self):
+        for run in self.runs:
+            run.close()
+        self.runs = []
+        self.buffer = []
+
+class ProteinCrossCheck:
+    """
+    Cross-check the protein IDs of CDS features in a GFF file against the IDs in its FAA file.
+    IDs are collected while both files are streamed, then compared with a sorted merge, so
+    memory stays bounded however large the genome. The report counts duplicates and IDs missing
+    on either side and keeps a few examples of each, instead of stopping at the first problem.
+    """
+
+    def __init__(self, max_in_memory=1000000, max_examples=5, directory=None):
+        self.gff_ids = SortedIdSpool(max_in_memory, directory)
+        self.faa_ids = SortedIdSpool(max_in_memory, directory)
+        self.max_examples = max_examples
+
+    def add_gff(self, protein_id):
+        self.gff_ids.add(protein_id)
+
+    def add_faa(self, protein_id):
+        self.faa_ids.add(protein_id)
+
+    @staticmethod
+    def count_ids(ids):
+        """Yield (id, occurrences) pairs from a sorted iterable of IDs."""
+        for value, group in groupby(ids):
+            yield value, sum(1 for _ in group)
+
+    def report(self):
+        """Compare the two ID streams and return a dictionary of counts and examples."""
+        report = {
+            'gff_protein_ids': 0,
+            'faa_protein_ids': 0,
+            'matched': 0,
+            'missing_in_faa': 0,
+            'missing_in_gff': 0,
+            'duplicate_gff_ids': 0,
+            'duplicate_faa_ids': 0,
+        }
+        examples = {key: [] for key in ('missing_in_faa', 'missing_in_gff', 'duplicate_gff_ids', 'duplicate_faa_ids')}
+
+        def record(key, value):
+            report[key] += 1
+            if len(examples[key]) < self.max_examples:
+                examples[key].append(value)
+
+        gff = self.count_ids(self.gff_ids)
+        faa = self.count_ids(self.faa_ids)
+        gff_item = next(gff, None)
+        faa_item = next(faa, None)
+        while gff_item is not None or faa_item is not None:
+            if faa_item is None or (gff_item is not None and gff_item[0] < faa_item[0]):
+                record('missing_in_faa', gff_item[0])
+                current, gff_item = gff_item, next(gff, None)
+                side = 'gff'
+            elif gff_item is None or faa_item[0] < gff_item[0]:
+                record('missing_in_gff', faa_item[0])
+                current, faa_item = faa_item, next(faa, None)
+                side = 'faa'
+            else:
+                report['matched'] += 1
+                report['gff_protein_ids'] += 1
+                report['faa_protein_ids'] += 1
+                if gff_item[1] > 1:
+                    record('duplicate_gff_ids', gff_item[0])
+                if faa_item[1] > 1:
+                    record('duplicate_faa_ids', faa_item[0])
+                gff_item, faa_item = next(gff, None), next(faa, None)
+                continue
+            report[f'{side}_protein_ids'] += 1
+            if current[1] > 1:
+                record(f'duplicate_{side}_ids', current[0])
+
+        report['examples'] = {key: values for key, values in examples.items() if values}
+        # A CDS split over several GFF rows repeats its protein_id, so GFF duplicates alone are not an error
+        report['valid'] = not (report['missing_in_faa'] or report['missing_in_gff'] or report['duplicate_faa_ids'])
+        return report
+
+    def close(self):
+        self.gff_ids.close()
+        self.faa_ids.close()
@@ -0,0 +1,222 @@
+import os
+import csv
+import gzip
+import json
+import argparse
+from .id_codec import encode_id, decode_id
+from .protein_validation import SortedIdSpool
+
+# (child table, child column, parent table, parent column) for every MD5 link between the CDM tables
+FOREIGN_KEYS = [
+    ('contigs', 'assembly_id', 'assembly', 'id'),
+    ('features', 'assembly_md5', 'assembly', 'id'),
+    ('features', 'contig_md5', 'contigs', 'id'),
+    ('feature_associations', 'feature_id', 'features', 'feature_uid'),
+    ('feature_protein_associations', 'feature_id', 'features', 'feature_uid'),
+    ('feature_keys', 'feature_id', 'features', 'feature_uid'),
+    ('sample_details', 'source_id', 'source_details', 'id'),
+    ('sample_attributes', 'sample_id', 'sample_details', 'id'),
+    ('observation', 'sample_id', 'sample_details', 'id'),
+]
+
+class ParentKeys:
+    """
+    The keys of one parent column, shared by every foreign key that refers to it. Keys are held
+    in a set of compact binary digests until there are max_in_memory of them, and from then on
+    in a SortedIdSpool, so the foreign keys have to be checked with a sorted merge.
+    """
+
+    def __init__(self, max_in_memory, directory):
+        self.max_in_memory = max_in_memory
+        self.directory = directory
+        self.keys = set()
+        self.spool = None
+
+    def add(self, value):
+        if self.spool is not None:
+            self.spool.add(value)
+            return
+        self.keys.add(encode_id(value))
+        if len(self.keys) >= self.max_in_memory:
+            self.spool = SortedIdSpool(self.max_in_memory, self.directory)
+            for key in self.keys:
+                self.spool.add(decode_id(key))
+            self.keys = set()
+
+    def __contains__(self, value):
+        return encode_id(value) in self.keys
+
+    def close(self):
+        if self.spool is not None:
+            self.spool.close()
+        self.keys = set()
+
+class ForeignKeyCheck:
+    """Orphan counts of one foreign key."""
+
+    def __init__(self, child, child_column, parent, parent_column, parent_keys, max_examples):
+        self.child, self.child_column = child, child_column
+        self.parent, self.parent_column = parent, parent_column
+        self.parent_keys = parent_keys
+        self.max_examples = max_examples
+        self.child_spool = None  # Child values kept for a sorted merge when the parent keys were spooled
+        self.finished = False
+        self.rows = 0
+        self.empty = 0
+        self.orphan_rows = 0
+        self.examples = []
+
+    def add_child(self, value):
+        self.rows += 1
+        if not value:
+            self.empty += 1
+        elif self.parent_keys.spool is not None:
+            if self.child_spool is None:
+                self.child_spool = SortedIdSpool(self.parent_keys.max_in_memory, self.parent_keys.directory)
+            self.child_spool.add(value)
+        elif value not in self.parent_keys:
+            self.orphan(value)
+
+    def orphan(self, value):
+        self.orphan_rows += 1
+        if len(self.examples) < self.max_examples and value not in self.examples:
+            self.examples.append(value)
+
+    def finish(self):
+        """Compare the spooled child values with the parent keys, if they were spooled."""
+        if self.child_spool is not None:
+            parents = iter(self.parent_keys.spool)
+            parent = next(parents, None)
+            for value in self.child_spool:
+                while parent is not None and parent < value:
+                    parent = next(parents, None)
+                if parent != value:
+                    self.orphan(value)
+            self.child_spool.close()
+            self.child_spool = None
+        self.finished = True
+
+    def report(self):
+        return {
+            'child': f"{self.child}.{self.child_column}",
+            'parent': f"{self.parent}.{self.parent_column}",
+            'rows': self.rows,
+            'empty': self.empty,
+            'orphan_rows': self.orphan_rows,
+            'examples': self.examples,
+        }
+
+class ReferentialChecker:
+    """
+    Check the foreign keys between CDM tables in one pass over each table file.
+
+    Tables are read parents first, so the keys of a parent table are in memory when the tables
+    referring to it are streamed, and each child value is checked the moment it is read: the
+    cost is linear in the number of rows. A parent key set that grows past max_in_memory keys
+    falls back to sorted runs on disk and a merge at the end. Empty child values are counted
+    separately from orphans. Only foreign keys whose two tables are both given are checked.
+    """
+
+    def __init__(self, tables, foreign_keys=FOREIGN_KEYS, max_in_memory=10000000, max_examples=5, directory=None):
+        self.tables = tables  # Table name to a list of TSV files (plain or gzipped, each with a header)
+        self.parent_keys = {}  # (parent table, column) to ParentKeys
+        self.checks = []
+        for child, child_column, parent, parent_column in foreign_keys:
+            if child in tables and parent in tables:
+                parent_keys = self.parent_keys.setdefault((parent, parent_column), ParentKeys(max_in_memory, directory))
+                self.checks.append(ForeignKeyCheck(child, child_column, parent, parent_column, parent_keys, max_examples))
+
+    def table_order(self):
+        """Order the tables so that each parent table is read before the tables referring to it."""
+        order = []
+        remaining = set(self.tables)
+        while remaining:
+            ready = sorted(table for table in remaining
+                           if not any(check.child == table and check.parent in remaining and check.parent != table
+                                      for check in self.checks))
+            if not ready:
+                raise ValueError(f"Circular foreign keys between {', '.join(sorted(remaining))}")
+            order.extend(ready)
+            remaining.difference_update(ready)
+        return order
+
+    @staticmethod
+    def read_rows(path):
+        """Yield the header and rows of a TSV file."""
+        open_func = gzip.open if path.endswith('.gz') else open
+        with open_func(path, 'rt', encoding='utf-8', newline='') as f:
+            yield from csv.reader(f, delimiter='\t')
+
+    def check_table(self, table):
+        as_child = [check for check in self.checks if check.child == table]
+        as_parent = [(column, keys) for (parent, column), keys in self.parent_keys.items() if parent == table]
+        if not (as_child or as_parent):
+            return
+        for path in self.tables[table]:
+            rows = self.read_rows(path)
+            header = next(rows, None)
+            if header is None:
+                continue
+            try:
+                child_columns = [(header.index(check.child_column), check) for check in as_child]
+                parent_columns = [(header.index(column), keys) for column, keys in as_parent]
+            except ValueError as e:
+                raise ValueError(f"{path}: {e}")
+            for row in rows:
+                if not row:
+                    continue
+                for i, keys in parent_columns:
+                    keys.add(row[i])
+                for i, check in child_columns:
+                    check.add_child(row[i])
+
+        for check in as_child:
+            check.finish()
+        # Release the keys of a parent once every table referring to it has been checked
+        for (parent, column), keys in self.parent_keys.items():
+            if all(check.finished for check in self.checks if check.parent_keys is keys):
+                keys.close()
+
+    def run(self):
+        """Read every table once and return the report of each foreign key."""
+        for table in self.table_order():
+            print(f"Checking {table}")
+            self.check_table(table)
+        return [check.report() for check in self.checks]
+
+def tables_from_manifest(directory):
+    """Return {table: [shard paths]} for the shards listed in a sharded output manifest."""
+    from .sharded_writer import ShardedOutput
+    manifest = ShardedOutput.load_manifest(directory) or {'tables': {}}
+    return {table: [os.path.join(directory, shard['path']) for shard in entry['shards']]
+            for table, entry in manifest['tables'].items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the MD5 foreign keys between CDM table files and report orphaned references.")
+    parser.add_argument('tables', nargs='*', help='Tables as table=path.tsv[.gz], e.g. features=features.tsv contigs=contigs_output.tsv; repeat a table for several files')
+    parser.add_argument('--shard_dir', type=str, default=None, help='Also check the tables listed in the manifest of this sharded output directory')
+    parser.add_argument('--max_in_memory', type=int, default=10000000, help='Keys of each parent column held in memory before spilling sorted runs to disk')
+    parser.add_argument('--max_examples', type=int, default=5, help='Orphaned values reported per foreign key')
+    parser.add_argument('--tmp_dir', type=str, default=None, help='Directory for the sorted runs')
+    parser.add_argument('--report', type=str, default=None, help='Write the report as JSON to this file')
+    args = parser.parse_args()
+
+    tables = tables_from_manifest(args.shard_dir) if args.shard_dir else {}
+    for spec in args.tables:
+        table, path = spec.split('=', 1)
+        tables.setdefault(table, []).append(path)
+
+    checker = ReferentialChecker(tables, max_in_memory=args.max_in_memory, max_examples=args.max_examples,
+                                 directory=args.tmp_dir)
+    reports = checker.run()
+    for report in reports:
+        status = "ok" if report['orphan_rows'] == 0 else f"{report['orphan_rows']} orphaned rows"
+        print(f"{report['child']} -> {report['parent']}: {report['rows']} rows, {report['empty']} empty, {status}")
+        for example in report['examples']:
+            print(f"    e.g. {example}")
+    if not checker.checks:
+        print("No foreign keys to check between the given tables.")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(reports, f, indent=2)
+    raise SystemExit(1 if any(report['orphan_rows'] for report in reports) else 0)
@@ -0,0 +1,256 @@
+import os
+import io
+import csv
+import gzip
+import json
+import hashlib
+import argparse
+
+MANIFEST_NAME = 'manifest.json'
+COMPRESSIONS = ('gzip', 'zstd', 'none')
+EXTENSIONS = {'gzip': '.tsv.gz', 'zstd': '.tsv.zst', 'none': '.tsv'}
+
+class HashingFile(io.RawIOBase):
+    """Binary file wrapper that counts and hashes the bytes written, i.e. the bytes on disk."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.file = open(path, 'wb')
+        self.md5 = hashlib.md5()
+        self.bytes = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.md5.update(data)
+        self.bytes += len(data)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        super().close()  # Flushes first
+        self.file.close()
+
+class Shard:
+    """One open shard file: a header row followed by at most max_rows rows."""
+
+    def __init__(self, path, fieldnames, compression, compresslevel):
+        self.path = path
+        self.rows = 0
+        self.raw = HashingFile(path)
+        if compression == 'gzip':
+            # mtime=0 keeps the shard checksums reproducible between runs
+            self.stream = gzip.GzipFile(fileobj=self.raw, mode='wb', compresslevel=compresslevel, mtime=0)
+        elif compression == 'zstd':
+            import zstandard
+            self.stream = zstandard.ZstdCompressor(level=compresslevel).stream_writer(self.raw, closefd=False)
+        else:
+            self.stream = io.BufferedWriter(self.raw)
+        self.text = io.TextIOWrapper(self.stream, encoding='utf-8', newline='', write_through=True)
+        self.writer = csv.writer(self.text, delimiter='\t')
+        self.writer.writerow(fieldnames)
+
+    def close(self):
+        """Close the shard and return its manifest entry (without the partition)."""
+        self.text.detach()  # Flushes the text layer without closing the stream under it
+        self.stream.close()
+        self.raw.close()
+        return {'rows': self.rows, 'bytes': self.raw.bytes, 'md5': self.raw.md5.hexdigest()}
+
+class ShardedTableWriter:
+    """
+    Write the rows of one table to numbered shard files instead of a single TSV. A new shard
+    is started after max_rows rows or once max_bytes compressed bytes have reached the disk
+    (checked after each write, so shards can overshoot by one write). With partition_chars,
+    rows are split into one subdirectory per assembly_md5 prefix of that many hex characters;
+    each partition has its own open shard, so 1 or 2 characters keep the number of open files
+    small. Every shard starts with the header row and can be loaded on its own.
+    """
+
+    def __init__(self, directory, table, fieldnames, max_rows=None, max_bytes=None, partition_chars=0,
+                 compression='gzip', compresslevel=None, first_index=0):
+        self.directory = directory
+        self.table = table
+        self.fieldnames = list(fieldnames)
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.partition_chars = partition_chars
+        self.compression = compression
+        if compresslevel is None:
+            compresslevel = 3 if compression == 'zstd' else 6
+        self.compresslevel = compresslevel
+        self.next_index = first_index
+        self.open_shards = {}  # Partition to its current Shard
+        self.shards = []  # Manifest entries of the closed shards
+
+    def partition(self, assembly_md5):
+        if not self.partition_chars:
+            return ''
+        return (assembly_md5 or '')[:self.partition_chars].lower() or 'none'
+
+    def shard_for(self, partition):
+        shard = self.open_shards.get(partition)
+        if shard is not None and (
+                (self.max_rows and shard.rows >= self.max_rows) or
+                (self.max_bytes and shard.raw.bytes >= self.max_bytes)):
+            self.close_shard(partition)
+            shard = None
+        if shard is None:
+            relative = f"{self.table}-{self.next_index:05d}{EXTENSIONS[self.compression]}"
+            if partition:
+                relative = os.path.join(self.table, partition, relative)
+            else:
+                relative = os.path.join(self.table, relative)
+            self.next_index += 1
+            os.makedirs(os.path.join(self.directory, os.path.dirname(relative)), exist_ok=True)
+            shard = Shard(os.path.join(self.directory, relative), self.fieldnames, self.compression, self.compresslevel)
+            shard.relative = relative
+            self.open_shards[partition] = shard
+        return shard
+
+    def close_shard(self, partition):
+        shard = self.open_shards.pop(partition)
+        entry = {'path': shard.relative, 'partition': partition or None}
+        entry.update(shard.close())
+        self.shards.append(entry)
+
+    def writerows(self, rows, assembly_md5=None):
+        """Write rows that all belong to the assembly assembly_md5. Returns the number of rows written."""
+        partition = self.partition(assembly_md5)
+        count = 0
+        shard = self.shard_for(partition)
+        for row in rows:
+            if self.max_rows and shard.rows >= self.max_rows:
+                shard = self.shard_for(partition)
+            shard.writer.writerow(row)
+            shard.rows += 1
+            count += 1
+            if self.max_bytes and shard.raw.bytes >= self.max_bytes:
+                shard = self.shard_for(partition)
+        return count
+
+    def close(self):
+        """Close all open shards, dropping shards that received no rows, and return the manifest entries."""
+        for partition in list(self.open_shards):
+            shard = self.open_shards[partition]
+            if shard.rows == 0:
+                self.open_shards.pop(partition).close()
+                os.remove(shard.path)
+                continue
+            self.close_shard(partition)
+        self.shards.sort(key=lambda entry: entry['path'])
+        return self.shards
+
+class ShardedOutput:
+    """
+    A directory of sharded tables with a manifest.json listing every shard with its row count,
+    size and MD5 checksum, so loaders can ingest the shards in parallel and verify them. An
+    existing manifest is extended: new shards are numbered after the ones already listed.
+    """
+
+    def __init__(self, directory, max_rows=None, max_bytes=None, partition_chars=0, compression='gzip', compresslevel=None):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression {compression}, expected one of {', '.join(COMPRESSIONS)}")
+        if compression == 'zstd':
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                raise ImportError("zstd compression needs the zstandard package (pip install zstandard)") from None
+        self.directory = directory
+        self.options = {'max_rows': max_rows, 'max_bytes': max_bytes, 'partition_chars': partition_chars,
+                        'compression': compression, 'compresslevel': compresslevel}
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = self.load_manifest(directory) or {'tables': {}}
+        self.writers = {}
+
+    @staticmethod
+    def load_manifest(directory):
+        path = os.path.join(directory, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def table(self, table, fieldnames):
+        """Return the writer of table, creating it on first use."""
+        writer = self.writers.get(table)
+        if writer is None:
+            existing = self.manifest['tables'].get(table)
+            if existing and existing['fields'] != list(fieldnames):
+                raise ValueError(f"Fields of {table} do not match the shards already in {self.directory}")
+            first_index = existing['next_index'] if existing else 0
+            writer = self.writers[table] = ShardedTableWriter(self.directory, table, fieldnames,
+                                                              first_index=first_index, **self.options)
+        return writer
+
+    def writerows(self, table, fieldnames, rows, assembly_md5=None):
+        return self.table(table, fieldnames).writerows(rows, assembly_md5)
+
+    def close(self):
+        """Close every table and write the manifest."""
+        for table, writer in self.writers.items():
+            entry = self.manifest['tables'].setdefault(table, {'fields': writer.fieldnames, 'shards': []})
+            entry['shards'].extend(writer.close())
+            entry['rows'] = sum(shard['rows'] for shard in entry['shards'])
+            entry['next_index'] = writer.next_index
+        temp_path = os.path.join(self.directory, MANIFEST_NAME + '.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(temp_path, os.path.join(self.directory, MANIFEST_NAME))
+        self.writers = {}
+        return self.manifest
+
+def open_shard(path):
+    """Open a shard for reading as text, decompressing by file extension."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    if path.endswith('.zst'):
+        import zstandard
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True),
+                                encoding='utf-8', newline='')
+    return open(path, 'r', newline='')
+
+def read_shard(path):
+    """Yield the header and then the rows of a shard as lists of strings."""
+    with open_shard(path) as f:
+        yield from csv.reader(f, delimiter='\t')
+
+def verify_manifest(directory):
+    """Check the row count and checksum of every shard in the manifest. Returns a list of problems."""
+    manifest = ShardedOutput.load_manifest(directory)
+    if manifest is None:
+        return [f"No {MANIFEST_NAME} in {directory}"]
+    problems = []
+    for table, entry in sorted(manifest['tables'].items()):
+        for shard in entry['shards']:
+            path = os.path.join(directory, shard['path'])
+            if not os.path.exists(path):
+                problems.append(f"{shard['path']}: missing")
+                continue
+            md5 = hashlib.md5()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    md5.update(block)
+            if md5.hexdigest() != shard['md5']:
+                problems.append(f"{shard['path']}: checksum {md5.hexdigest()} does not match {shard['md5']}")
+                continue
+            rows = sum(1 for _ in read_shard(path)) - 1
+            if rows != shard['rows']:
+                problems.append(f"{shard['path']}: {rows} rows, manifest lists {shard['rows']}")
+    return problems
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify the shards listed in the manifest of a sharded output directory.")
+    parser.add_argument('directory', type=str, help='Sharded output directory')
+    args = parser.parse_args()
+
+    problems = verify_manifest(args.directory)
+    for problem in problems:
+        print(problem)
+    manifest = ShardedOutput.load_manifest(args.directory) or {'tables': {}}
+    for table, entry in sorted(manifest['tables'].items()):
+        print(f"{table}: {len(entry['shards'])} shards, {entry['rows']} rows")
+    raise SystemExit(1 if problems else 0)
@@ -0,0 +1,307 @@
+import sqlite3
+import os
+import argparse
+import csv
+from .assembly_table import ASSEMBLY_COLUMNS
+from .feature_and_protein_table import FEATURE_FIELDS, ASSOCIATION_FIELDS, PROTEIN_ASSOCIATION_FIELDS
+from .id_codec import encode_id, decode_id
+
+# Table definitions: typed columns (None means the columns are taken from the rows),
+# the key used for upserts and the MD5 ID columns that are indexed after the load.
+TABLE_SCHEMAS = {
+    'features': {
+        'columns': [(name, 'INTEGER' if name in ('start', 'end') else 'TEXT') for name in FEATURE_FIELDS],
+        'key': ['feature_uid'],
+        'indexes': ['assembly_md5', 'contig_md5', 'protein_id'],
+    },
+    'feature_associations': {
+        'columns': [(name, 'TEXT') for name in ASSOCIATION_FIELDS],
+        'key': ['feature_id', 'key', 'value'],
+        'indexes': ['feature_id'],
+    },
+    'feature_protein_associations': {
+        'columns': [(name, 'TEXT') for name in PROTEIN_ASSOCIATION_FIELDS],
+        'key': ['feature_id', 'protein_id'],
+        'indexes': ['protein_md5'],
+    },
+    'attribute_keys': {
+        'columns': [('key_id', 'INTEGER'), ('key', 'TEXT')],
+        'key': ['key_id'],
+        'indexes': [],
+    },
+    'attribute_values': {
+        'columns': [('value_id', 'INTEGER'), ('key_id', 'INTEGER'), ('value', 'TEXT')],
+        'key': ['value_id'],
+        'indexes': ['key_id'],
+    },
+    'feature_keys': {
+        'columns': [('feature_key', 'INTEGER'), ('feature_id', 'TEXT')],
+        'key': ['feature_key'],
+        'indexes': ['feature_id'],
+    },
+    'feature_attribute_refs': {
+        'columns': [('feature_key', 'INTEGER'), ('value_id', 'INTEGER')],
+        'key': ['feature_key', 'value_id'],
+        'indexes': ['value_id'],
+    },
+    'feature_attribute_values': {
+        'columns': [('feature_key', 'INTEGER'), ('key_id', 'INTEGER'), ('value', 'TEXT')],
+        'key': ['feature_key', 'key_id', 'value'],
+        'indexes': ['key_id'],
+    },
+    'contigs': {
+        'columns': [('id', 'TEXT'), ('contig_name', 'TEXT'), ('length', 'INTEGER'), ('gc_content', 'REAL'),
+                    ('assembly_id', 'TEXT'), ('fasta_file', 'TEXT')],
+        'key': ['id', 'assembly_id'],
+        'indexes': ['assembly_id'],
+    },
+    'assembly': {
+        'columns': ASSEMBLY_COLUMNS,
+        'key': ['id'],
+        'indexes': [],
+    },
+    'sample_details': {'columns': None, 'key': ['id'], 'indexes': ['source_id']},
+    'sample_attributes': {'columns': None, 'key': ['sample_id', 'metadata_key'], 'indexes': ['sample_id']},
+    'source_details': {'columns': None, 'key': ['id'], 'indexes': []},
+    'observation_details': {'columns': None, 'key': ['id'], 'indexes': []},
+    'observation': {'columns': None, 'key': ['observation_id'], 'indexes': ['sample_id']},
+    'sample': {'columns': None, 'key': ['sample_id'], 'indexes': ['project_id']},
+    'project': {'columns': None, 'key': ['project_id'], 'indexes': []},
+    'isolate': {'columns': None, 'key': ['isolate_id'], 'indexes': ['sample_id']},
+    'cultivation': {'columns': None, 'key': ['sample_id'], 'indexes': []},
+}
+
+# MD5 ID columns of each table, stored as 16-byte BLOBs when the loader runs with binary_ids
+ID_COLUMNS = {
+    'features': ['feature_uid', 'assembly_md5', 'contig_md5'],
+    'feature_associations': ['feature_id'],
+    'feature_protein_associations': ['feature_id', 'protein_md5'],
+    'feature_keys': ['feature_id'],
+    'contigs': ['id', 'assembly_id'],
+    'assembly': ['id'],
+    'sample_details': ['id', 'source_id'],
+    'sample_attributes': ['sample_id'],
+    'source_details': ['id'],
+    'observation_details': ['id'],
+    'observation': ['observation_id', 'sample_id'],
+    'sample': ['sample_id'],
+    'isolate': ['isolate_id', 'sample_id'],
+    'cultivation': ['sample_id'],
+}
+
+class SQLiteLoader:
+    """
+    Stream CDM table rows into a local SQLite database with batched upserts.
+
+    With binary_ids, MD5 ID columns are stored as 16-byte BLOBs instead of 32-character hex
+    text, which halves the key storage and makes index lookups and joins cheaper. Hex values
+    are converted on the way in, and the id_hex() SQL function converts them back for output,
+    e.g. SELECT id_hex(feature_uid) FROM features. The mode is recorded in the database and
+    a database cannot be loaded in both modes.
+    """
+
+    def __init__(self, db_path, batch_size=10000, binary_ids=False):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.binary_ids = binary_ids
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.create_function('id_hex', 1, decode_id, deterministic=True)
+        self.check_id_mode()
+        self.loaded_tables = set()
+
+    def check_id_mode(self):
+        """Record the ID mode in a new database, or check that it matches the mode of an existing one."""
+        mode = 'binary' if self.binary_ids else 'hex'
+        with self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS cdm_settings (name TEXT PRIMARY KEY, value TEXT)')
+            self.conn.execute("INSERT OR IGNORE INTO cdm_settings (name, value) VALUES ('id_mode', ?)", (mode,))
+        stored = self.conn.execute("SELECT value FROM cdm_settings WHERE name = 'id_mode'").fetchone()[0]
+        if stored != mode:
+            self.conn.close()
+            raise ValueError(f"{self.db_path} stores IDs as {stored}, not {mode}")
+
+    def id_positions(self, table, column_names):
+        """Return the positions of the ID columns of table in column_names, or [] unless binary_ids is set."""
+        if not self.binary_ids:
+            return []
+        ids = ID_COLUMNS.get(table, ())
+        return [i for i, name in enumerate(column_names) if name in ids]
+
+    @staticmethod
+    def encode_rows(rows, positions):
+        for row in rows:
+            row = list(row)
+            for i in positions:
+                row[i] = encode_id(row[i])
+            yield row
+
+    @staticmethod
+    def quote(name):
+        """Quote an identifier for use in SQL (column names such as 'end' and 'key' are reserved words)."""
+        return '"' + name.replace('"', '""') + '"'
+
+    def create_table(self, table, columns, key):
+        """Create the table and the unique index on its key columns if they do not exist yet."""
+        column_sql = ', '.join(f"{self.quote(name)} {sql_type}" for name, sql_type in columns)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {self.quote(table)} ({column_sql})")
+        key_sql = ', '.join(self.quote(name) for name in key)
+        self.conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {self.quote(table + '_key')} ON {self.quote(table)} ({key_sql})")
+
+    def upsert_sql(self, table, column_names, key):
+        """Build the INSERT ... ON CONFLICT statement that replaces rows with the same key."""
+        columns_sql = ', '.join(self.quote(name) for name in column_names)
+        placeholders = ', '.join('?' for _ in column_names)
+        key_sql = ', '.join(self.quote(name) for name in key)
+        updates = [f"{self.quote(name)} = excluded.{self.quote(name)}" for name in column_names if name not in key]
+        conflict_sql = f"DO UPDATE SET {', '.join(updates)}" if updates else "DO NOTHING"
+        return f"INSERT INTO {self.quote(table)} ({columns_sql}) VALUES ({placeholders}) ON CONFLICT ({key_sql}) {conflict_sql}"
+
+    def load_rows(self, table, column_names, rows, encoded=False):
+        """
+        Insert an iterable of row tuples (ordered like column_names) into table in batches,
+        inside a single transaction. Rows whose key already exists are updated in place.
+        With binary_ids, hex IDs are converted unless encoded says the rows already hold binary IDs.
+        Returns the number of rows written.
+        """
+        schema = TABLE_SCHEMAS[table]
+        columns = schema['columns'] or [(name, '') for name in column_names]
+        positions = self.id_positions(table, column_names)
+        if positions:
+            ids = ID_COLUMNS[table]
+            columns = [(name, 'BLOB' if name in ids else sql_type) for name, sql_type in columns]
+            if not encoded:
+                rows = self.encode_rows(rows, positions)
+        self.create_table(table, columns, schema['key'])
+        sql = self.upsert_sql(table, column_names, schema['key'])
+
+        count = 0
+        batch = []
+        with self.conn:
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    self.conn.executemany(sql, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                self.conn.executemany(sql, batch)
+                count += len(batch)
+
+        self.loaded_tables.add(table)
+        print(f"Loaded {count} rows into {table}")
+        return count
+
+    def load_dicts(self, table, records, column_names=None):
+        """Insert a list of dictionaries, using the keys of the first record when no columns are given."""
+        if not records:
+            return 0
+        column_names = column_names or list(records[0].keys())
+        return self.load_rows(table, column_names, (tuple(record.get(name) for name in column_names) for record in records))
+
+    def load_dataframe(self, table, df):
+        """Insert the rows of a pandas DataFrame, storing missing values as NULL."""
+        if df is None or df.empty:
+            return 0
+        rows = (tuple(None if value != value else value for value in row)  # NaN is the only value not equal to itself
+                for row in df.itertuples(index=False, name=None))
+        return self.load_rows(table, [str(name) for name in df.columns], rows)
+
+    def load_gff_parser(self, parser):
+        """
+        Load the features, feature associations and feature-protein associations of a GFFParser.
+        Raises ValueError if its proteins have not been matched to features yet.
+        """
+        if any(feature_id is None for feature_id, _, _ in parser.feature_protein_associations):
+            raise ValueError("Feature-protein associations without a feature_id; run match_proteins_to_features first")
+        if self.binary_ids:
+            # The columnar stores hand out their binary UIDs directly
+            self.load_rows('features', FEATURE_FIELDS, parser.features.iter_binary(), encoded=True)
+            self.load_rows('feature_associations', ASSOCIATION_FIELDS, parser.feature_associations.iter_binary(), encoded=True)
+        else:
+            self.load_rows('features', FEATURE_FIELDS, parser.features)
+            self.load_rows('feature_associations', ASSOCIATION_FIELDS, parser.feature_associations)
+        self.load_rows('feature_protein_associations', PROTEIN_ASSOCIATION_FIELDS, parser.feature_protein_associations)
+
+    def load_contig_table(self, contig_table):
+        """Load the contig statistics of a ContigTable."""
+        self.load_dicts('contigs', contig_table.contig_stats, [name for name, _ in TABLE_SCHEMAS['contigs']['columns']])
+
+    def load_assembly_table(self, assembly_table):
+        """Load the assembly statistics of an AssemblyTable."""
+        self.load_dicts('assembly', assembly_table.assemblies, [name for name, _ in ASSEMBLY_COLUMNS])
+
+    def load_ncbi_parser(self, ncbi_parser):
+        """Load the sample, attribute, source and observation details of an NCBIJSONLParser."""
+        self.load_dicts('sample_details', ncbi_parser.sample_details_data)
+        self.load_dicts('sample_attributes', ncbi_parser.sample_attributes_data)
+        self.load_dicts('source_details', ncbi_parser.source_details_data)
+        self.load_dicts('observation_details', ncbi_parser.observation_details_data)
+
+    def load_sample_table(self, sample_table):
+        """Load the sample, project, isolate and cultivation tables of a SampleTable."""
+        self.load_dataframe('sample', sample_table.sample_df)
+        self.load_dataframe('project', sample_table.project_df)
+        self.load_dataframe('isolate', sample_table.isolate_df)
+        self.load_dataframe('cultivation', sample_table.cultivation_df)
+
+    def create_indexes(self):
+        """Create the indexes on the MD5 ID columns of every loaded table."""
+        with self.conn:
+            for table in sorted(self.loaded_tables):
+                existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({self.quote(table)})")}
+                for column in TABLE_SCHEMAS[table]['indexes']:
+                    if column in existing:
+                        self.conn.execute(f"CREATE INDEX IF NOT EXISTS {self.quote(f'{table}_{column}')} "
+                                          f"ON {self.quote(table)} ({self.quote(column)})")
+        print(f"Created indexes for {', '.join(sorted(self.loaded_tables))}")
+
+    def create_views(self):
+        """Create a feature_attributes view with (feature_id, key, value) rows over the normalized attribute tables."""
+        tables = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if not tables.issuperset(('attribute_keys', 'attribute_values', 'feature_keys',
+                                  'feature_attribute_refs', 'feature_attribute_values')):
+            return
+        with self.conn:
+            self.conn.execute(
+                'CREATE VIEW IF NOT EXISTS feature_attributes AS '
+                'SELECT f.feature_id, k."key", v."value" FROM feature_attribute_refs r '
+                'JOIN feature_keys f ON f.feature_key = r.feature_key '
+                'JOIN attribute_values v ON v.value_id = r.value_id JOIN attribute_keys k ON k.key_id = v.key_id '
+                'UNION ALL '
+                'SELECT f.feature_id, k."key", i."value" FROM feature_attribute_values i '
+                'JOIN feature_keys f ON f.feature_key = i.feature_key '
+                'JOIN attribute_keys k ON k.key_id = i.key_id')
+
+    def close(self):
+        """Create the indexes and views and close the database connection."""
+        self.create_indexes()
+        self.create_views()
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load CDM TSV files into a SQLite database.")
+    parser.add_argument('db_path', type=str, help='Path to the SQLite database')
+    parser.add_argument('tables', nargs='*', help='Tables to load as table=path.tsv, e.g. features=features.tsv')
+    parser.add_argument('--shard_dir', type=str, default=None, help='Also load every shard listed in the manifest of this sharded output directory')
+    parser.add_argument('--binary_ids', action='store_true', help='Store MD5 ID columns as 16-byte BLOBs instead of hex text')
+    args = parser.parse_args()
+
+    loader = SQLiteLoader(args.db_path, binary_ids=args.binary_ids)
+    if args.shard_dir:
+        from .sharded_writer import ShardedOutput, read_shard
+        manifest = ShardedOutput.load_manifest(args.shard_dir) or {'tables': {}}
+        for table, entry in sorted(manifest['tables'].items()):
+            for shard in entry['shards']:
+                rows = read_shard(os.path.join(args.shard_dir, shard['path']))
+                header = next(rows)
+                loader.load_rows(table, header, (tuple(value if value != '' else None for value in row) for row in rows))
+    for spec in args.tables:
+        table, path = spec.split('=', 1)
+        with open(path, 'r', newline='') as tsv_file:
+            reader = csv.reader(tsv_file, delimiter='\t')
+            header = next(reader)
+            loader.load_rows(table, header, (tuple(value if value != '' else None for value in row) for row in reader))
+    loader.close()
@@ -0,0 +1,209 @@
+import io
+import os
+import gzip
+import json
+import random
+import argparse
+from .feature_sequences import CODON_TABLE_11, reverse_complement
+
+SENSE_CODONS = [codon for codon, amino_acid in CODON_TABLE_11.items() if amino_acid != '*']
+STOP_CODONS = [codon for codon, amino_acid in CODON_TABLE_11.items() if amino_acid == '*']
+LINE_WIDTH = 80
+
+# Share of genes of each type, and the length range of the RNA genes
+RNA_GENES = [('tRNA', 0.05, 70, 95), ('rRNA', 0.01, 110, 2900)]
+
+class SyntheticGenomeGenerator:
+    """
+    Generate matching assembly FASTA, GFF3 and FAA files for synthetic genomes, plus NCBI-style
+    assembly_data_report.jsonl records. Everything derives from the seed, and each genome has its
+    own random stream, so any genome can be regenerated on its own and the same seed always gives
+    the same files. Files are written one contig at a time, so memory use depends on the contig
+    length and not on the number or size of the genomes.
+
+    CDS features are built from random sense codons between a start and a stop codon, and the FAA
+    holds their translations, so the GFF, FAA and assembly are consistent with each other for
+    GFFParser and for feature sequence extraction.
+    """
+
+    def __init__(self, seed=0, contigs=10, contig_length=100000, gene_density=0.9, attributes=3,
+                 compress=True, compresslevel=6):
+        self.seed = seed
+        self.contigs = contigs
+        self.contig_length = contig_length
+        self.gene_density = gene_density  # Genes per kb
+        self.attributes = attributes  # Extra attributes on each CDS, beyond the standard ones
+        self.compress = compress
+        self.compresslevel = compresslevel
+
+    def open_output(self, path):
+        """Open a text file for writing, gzipped with a fixed timestamp so the output is reproducible."""
+        if self.compress:
+            return io.TextIOWrapper(gzip.GzipFile(path, 'wb', compresslevel=self.compresslevel, mtime=0),
+                                    encoding='ascii', newline='')
+        return open(path, 'w', encoding='ascii', newline='')
+
+    def genome_name(self, index):
+        return f"SYN_{self.seed:04d}{index:07d}.1"
+
+    def genome_paths(self, index, directory):
+        """Return the assembly, GFF and FAA paths of a genome."""
+        suffix = '.gz' if self.compress else ''
+        prefix = os.path.join(directory, self.genome_name(index))
+        return (f"{prefix}_genomic.fna{suffix}", f"{prefix}_genomic.gff{suffix}", f"{prefix}_protein.faa{suffix}")
+
+    def generate_contig(self, rng, contig_name, locus_prefix):
+        """Return a contig sequence, its GFF rows and its (protein_id, protein) pairs."""
+        parts = []
+        rows = []
+        proteins = []
+        position = 0  # Bases written so far
+        spacing = 1000 / self.gene_density
+        gene = 0
+
+        while True:
+            gap = rng.randint(10, max(11, int(spacing * 0.3)))
+            roll = rng.random()
+            feature_type = 'CDS'
+            for rna_type, share, min_length, max_length in RNA_GENES:
+                if roll < share:
+                    feature_type = rna_type
+                    length = rng.randint(min_length, max_length)
+                    break
+                roll -= share
+            else:
+                codons = rng.randint(max(30, int(spacing * 0.6) // 3), max(31, int(spacing * 1.1) // 3))
+                length = codons * 3 + 6
+            if position + gap + length > self.contig_length:
+                break
+
+            parts.append(''.join(rng.choices('ACGT', k=gap)))
+            start = position + gap + 1
+            end = start + length - 1
+            strand = rng.choice('+-')
+            gene += 1
+            locus_tag = f"{locus_prefix}_{gene * 5:05d}"
+
+            if feature_type == 'CDS':
+                body = ''.join(rng.choices(SENSE_CODONS, k=codons))
+                coding = 'ATG' + body + rng.choice(STOP_CODONS)
+                protein_id = f"SYP_{locus_prefix}{gene:06d}.1"
+                proteins.append((protein_id, 'M' + ''.join([CODON_TABLE_11[body[i:i + 3]] for i in range(0, len(body), 3)])))
+                biotype = 'protein_coding'
+                child = (f"ID=cds-{protein_id};Parent=gene-{locus_tag};Name={protein_id};"
+                         f"product=hypothetical protein;protein_id={protein_id};locus_tag={locus_tag};transl_table=11")
+                child += ''.join(f";note_{k}=value {rng.randint(0, 999)}" for k in range(self.attributes))
+                phase = '0'
+            else:
+                coding = ''.join(rng.choices('ACGT', k=length))
+                biotype = feature_type
+                child = f"ID=rna-{locus_tag};Parent=gene-{locus_tag};locus_tag={locus_tag};product={feature_type}"
+                phase = '.'
+            parts.append(coding if strand == '+' else reverse_complement(coding))
+
+            rows.append(f"{contig_name}\tSynthetic\tgene\t{start}\t{end}\t.\t{strand}\t.\t"
+                        f"ID=gene-{locus_tag};Name={locus_tag};gbkey=Gene;gene_biotype={biotype};locus_tag={locus_tag}\n")
+            rows.append(f"{contig_name}\tSynthetic\t{feature_type}\t{start}\t{end}\t.\t{strand}\t{phase}\t{child}\n")
+            position = end
+
+        parts.append(''.join(rng.choices('ACGT', k=self.contig_length - position)))
+        return ''.join(parts), rows, proteins
+
+    def write_genome(self, index, directory):
+        """Write the assembly, GFF and FAA files of one genome and return their paths."""
+        rng = random.Random(f"{self.seed}:{index}")
+        assembly_path, gff_path, faa_path = self.genome_paths(index, directory)
+        name = self.genome_name(index)
+        with self.open_output(assembly_path) as fna, self.open_output(gff_path) as gff, self.open_output(faa_path) as faa:
+            gff.write("##gff-version 3\n")
+            for contig in range(self.contigs):
+                contig_name = f"{name.split('.')[0]}_contig{contig + 1}"
+                sequence, rows, proteins = self.generate_contig(rng, contig_name, f"S{index}C{contig + 1}")
+                gff.write(f"##sequence-region {contig_name} 1 {len(sequence)}\n")
+                gff.write(f"{contig_name}\tSynthetic\tregion\t1\t{len(sequence)}\t.\t+\t.\tID={contig_name}:1..{len(sequence)}\n")
+                gff.writelines(rows)
+                fna.write(f">{contig_name} synthetic contig {contig + 1}\n")
+                fna.writelines(sequence[i:i + LINE_WIDTH] + '\n' for i in range(0, len(sequence), LINE_WIDTH))
+                for protein_id, protein in proteins:
+                    faa.write(f">{protein_id} hypothetical protein [Synthetic organism]\n")
+                    faa.writelines(protein[i:i + LINE_WIDTH] + '\n' for i in range(0, len(protein), LINE_WIDTH))
+        return assembly_path, gff_path, faa_path
+
+    def assembly_report(self, index):
+        """Return an NCBI datasets assembly_data_report record for a genome."""
+        rng = random.Random(f"{self.seed}:report:{index}")
+        name = self.genome_name(index)
+        project = f"PRJNA{900000 + index // 10}"
+        biosample = f"SAMN{90000000 + index:08d}"
+        return {
+            'accession': name,
+            'assemblyInfo': {
+                'assemblyLevel': rng.choice(['Contig', 'Scaffold', 'Complete Genome']),
+                'assemblyName': f"ASM{index}v1",
+                'assemblyStatus': 'current',
+                'bioprojectAccession': project,
+                'bioprojectLineage': [{'bioprojects': [{'accession': project, 'title': f"Synthetic project {index // 10}"}]}],
+                'biosample': {
+                    'accession': biosample,
+                    'attributes': [
+                        {'name': 'strain', 'value': f"SYN {index}"},
+                        {'name': 'collection_date', 'value': f"{rng.randint(1990, 2024)}-{rng.randint(1, 12):02d}"},
+                        {'name': 'geo_loc_name', 'value': rng.choice(['USA: California', 'Japan', 'missing'])},
+                        {'name': 'lat_lon', 'value': f"{rng.uniform(0, 80):.4f} N {rng.uniform(0, 170):.4f} W"},
+                        {'name': 'depth', 'value': str(rng.randint(0, 500))},
+                        {'name': 'env_broad_scale', 'value': 'missing'},
+                        {'name': 'isolation_source', 'value': rng.choice(['soil', 'hot spring', 'sediment'])},
+                    ],
+                    'bioprojects': [{'accession': project}],
+                    'description': {'title': f"Synthetic sample {index}", 'comment': 'Generated for scale testing'},
+                    'lastUpdated': '2024-01-01T00:00:00.000',
+                    'models': ['Microbe'],
+                    'package': 'Microbe.1.0',
+                    'sampleIds': [{'db': 'SRA', 'value': f"SRS{index:07d}"}, {'label': 'Sample name', 'value': f"SYN {index}"}],
+                    'submissionDate': '2023-01-01',
+                },
+                'submitter': 'Synthetic submitter',
+            },
+        }
+
+    def write_assembly_reports(self, path, records):
+        """Write records assembly_data_report lines, one per genome index."""
+        with open(path, 'w') as f:
+            for index in range(records):
+                f.write(json.dumps(self.assembly_report(index)) + '\n')
+        return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic assembly, GFF3, FAA and JSONL inputs for scale testing.")
+    parser.add_argument('output_dir', type=str, help='Directory to write the generated files to')
+    parser.add_argument('--genomes', type=int, default=1, help='Number of genomes')
+    parser.add_argument('--first_genome', type=int, default=0, help='Index of the first genome, to generate a large set in parts')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--contigs', type=int, default=10, help='Contigs per genome')
+    parser.add_argument('--contig_length', type=int, default=100000, help='Length of each contig in bases')
+    parser.add_argument('--gene_density', type=float, default=0.9, help='Genes per kb')
+    parser.add_argument('--attributes', type=int, default=3, help='Extra attributes per CDS feature')
+    parser.add_argument('--plain', action='store_true', help='Write uncompressed files instead of gzip')
+    parser.add_argument('--compresslevel', type=int, default=6, help='gzip compression level')
+    parser.add_argument('--jsonl_records', type=int, default=None, help='Number of assembly_data_report.jsonl records (default: one per genome)')
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    generator = SyntheticGenomeGenerator(args.seed, args.contigs, args.contig_length, args.gene_density,
+                                         args.attributes, compress=not args.plain, compresslevel=args.compresslevel)
+
+    # The manifest can be passed straight to feature_and_protein_table
+    manifest = os.path.join(args.output_dir, 'genomes.tsv')
+    with open(manifest, 'a' if args.first_genome else 'w') as f:
+        for index in range(args.first_genome, args.first_genome + args.genomes):
+            paths = generator.write_genome(index, args.output_dir)
+            f.write('\t'.join(paths) + '\n')
+            print(f"Generated {generator.genome_name(index)}")
+
+    records = args.jsonl_records if args.jsonl_records is not None else args.first_genome + args.genomes
+    report = generator.write_assembly_reports(os.path.join(args.output_dir, 'assembly_data_report.jsonl'), records)
+    print(f"Wrote {manifest} and {records} records to {report}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import os
+import sys
+import csv
+import shlex
+import asyncio
+import argparse
+from collections import deque
+from .bbmap_assembly_stats import BBMapAssemblyStats, StatsReportParser
+from .profiling import REPORT, add_profiling_arguments, start_profiling, finish_profiling
+
+class ToolError(Exception):
+    """Raised when an external tool exits with an error or runs past its timeout."""
+
+    def __init__(self, command, message, stderr_tail=()):
+        super().__init__(f"{shlex.join(command)}: {message}")
+        self.command = command
+        self.stderr_tail = list(stderr_tail)
+
+class AsyncToolRunner:
+    """
+    Run prodigal, prokka and stats.sh for many genomes at once from one Python process.
+
+    At most max_processes jobs run at a time. The output of each process is read line by
+    line as it is produced, so stats.sh reports are parsed incrementally and stderr is only
+    kept as a short tail for error messages. Each process is killed when it runs longer than
+    timeout seconds, and when its job is cancelled. The Python steps around the tools
+    (decompressing, hashing and rewriting files) run in threads so they do not block the loop.
+    The cpus (default: all of them) are split evenly across the concurrent Prokka jobs.
+    """
+
+    def __init__(self, max_processes=4, timeout=None, stderr_lines=20, verbose=False, cpus=None):
+        self.max_processes = max(1, max_processes)
+        self.cpus_per_job = max(1, (cpus or os.cpu_count() or 1) // self.max_processes)
+        self.timeout = timeout
+        self.stderr_lines = stderr_lines
+        self.verbose = verbose
+        self.semaphore = None  # Created inside the running event loop
+        self.bbmap = None
+
+    def limit(self):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_processes)
+        return self.semaphore
+
+    @staticmethod
+    async def in_thread(func):
+        """Run func in the loop's default thread pool (asyncio.to_thread needs Python 3.9)."""
+        return await asyncio.get_running_loop().run_in_executor(None, func)
+
+    @staticmethod
+    async def read_lines(stream, handle_line):
+        while True:
+            line = await stream.readline()
+            if not line:
+                return
+            handle_line(line.decode('utf-8', errors='replace'))
+
+    async def run(self, command, stdout_line=None, timeout=None):
+        """
+        Run command (a list of arguments) and pass each line of its stdout to stdout_line.
+        Raises ToolError on a non-zero exit or a timeout.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        stderr_tail = deque(maxlen=self.stderr_lines)
+
+        def stderr_line(line):
+            stderr_tail.append(line.rstrip('\n'))
+            if self.verbose:
+                print(line, end='', file=sys.stderr)
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command, stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        except OSError as e:
+            raise ToolError(command, str(e))
+
+        readers = asyncio.gather(self.read_lines(process.stdout, stdout_line or (lambda line: None)),
+                                 self.read_lines(process.stderr, stderr_line))
+        try:
+            await asyncio.wait_for(asyncio.shield(readers), timeout)
+            returncode = await process.wait()
+        except asyncio.TimeoutError:
+            self.kill(process)
+            await process.wait()
+            raise ToolError(command, f"timed out after {timeout} seconds", stderr_tail)
+        except BaseException:
+            # Cancelled: do not leave the tool running without anyone reading its output
+            self.kill(process)
+            await process.wait()
+            raise
+        finally:
+            if not readers.done():
+                readers.cancel()
+                try:
+                    await readers
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+        if returncode != 0:
+            raise ToolError(command, f"exited with status {returncode}", stderr_tail)
+
+    @staticmethod
+    def kill(process):
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+
+    async def stats(self, assembly_file):
+        """Run stats.sh on one assembly and return the parsed statistics."""
+        if self.bbmap is None:
+            self.bbmap = BBMapAssemblyStats()
+        stats_path = getattr(self.bbmap, 'stats_path', 'stats.sh')
+        parser = StatsReportParser()
+        async with self.limit():
+            with REPORT.stage('bbmap.stats', item=assembly_file) as timer:
+                await self.run([stats_path, f'in={assembly_file}', 'format=2'], parser.feed)
+                timer.add(bytes_in=os.path.getsize(assembly_file))
+        return parser.stats
+
+    async def prodigal(self, assembly_file, prefix, output_dir):
+        """Annotate one assembly with Prodigal and return the paths of the GFF and FAA files."""
+        from .prodigal_annotation import ProdigalAnnotation
+        async with self.limit():
+            annotation = ProdigalAnnotation(assembly_file, prefix, output_dir)
+            await self.in_thread(annotation.prepare_assembly_file)
+            try:
+                with REPORT.stage('prodigal.run', item=assembly_file):
+                    await self.run(annotation.prodigal_command())
+                await self.in_thread(annotation.update_gff_ids)
+                await self.in_thread(annotation.update_faa_file)
+            finally:
+                await self.in_thread(annotation.clean_up)
+        return annotation.output_files()
+
+    async def prokka(self, assembly_file, prefix, output_dir, cpus=None):
+        """Annotate one assembly with Prokka and return the paths of the GFF and FAA files."""
+        from .prokka_annotation import ProkkaAnnotation
+        async with self.limit():
+            annotation = ProkkaAnnotation(assembly_file, prefix, output_dir, cpus=cpus)
+            try:
+                await self.in_thread(annotation.prepare_directories)
+                await self.in_thread(annotation.prepare_assembly_file)
+                with REPORT.stage('prokka.run', item=assembly_file):
+                    await self.run(annotation.prokka_command())
+                await self.in_thread(annotation.collect_outputs)
+                await self.in_thread(annotation.publish_outputs)
+            finally:
+                await self.in_thread(annotation.clean_up)
+        return annotation.output_files()
+
+    async def run_job(self, job):
+        """Run one (tool, assembly_file, prefix, output_dir) job; returns its result or the error."""
+        tool, assembly_file = job[0], job[1]
+        try:
+            if tool == 'stats':
+                return await self.stats(assembly_file)
+            if tool == 'prodigal':
+                return await self.prodigal(assembly_file, job[2], job[3])
+            if tool == 'prokka':
+                return await self.prokka(assembly_file, job[2], job[3], cpus=self.cpus_per_job)
+            raise ValueError(f"Unknown tool {tool}")
+        except (Exception, SystemExit) as e:
+            # The annotation classes exit on errors; report the failure and keep the others going
+            print(f"Error running {tool} on {assembly_file}: {e}")
+            REPORT.count(f"{tool}.failed")
+            return e
+
+    async def run_jobs(self, jobs):
+        """Run all jobs concurrently and return their results in order; failures are returned as exceptions."""
+        return await asyncio.gather(*(self.run_job(job) for job in jobs))
+
+    @staticmethod
+    def read_jobs(jobs_file):
+        """Read tool, assembly_file[, prefix, output_dir] rows from a tab-delimited file."""
+        with open(jobs_file, 'r') as f:
+            return [tuple(row) for row in csv.reader(f, delimiter='\t') if len(row) >= 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run prodigal, prokka and stats.sh on many assemblies concurrently.")
+    parser.add_argument('jobs_file', type=str, help='Tab-delimited file with tool (stats, prodigal or prokka), assembly_file and, for annotation, prefix and output_dir per line')
+    parser.add_argument('--max_processes', type=int, default=4, help='Maximum number of jobs running at once')
+    parser.add_argument('--cpus', type=int, default=None, help='Total number of CPUs to split across the concurrent Prokka jobs (default: all)')
+    parser.add_argument('--timeout', type=float, default=None, help='Kill a tool that runs longer than this many seconds')
+    parser.add_argument('--stats_output', type=str, default='assembly_output.tsv', help='Output TSV file for the assembly statistics of stats jobs')
+    parser.add_argument('--verbose', action='store_true', help='Print the stderr of the tools as it is produced')
+    add_profiling_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args)
+
+    jobs = AsyncToolRunner.read_jobs(args.jobs_file)
+    runner = AsyncToolRunner(max_processes=args.max_processes, timeout=args.timeout, verbose=args.verbose,
+                             cpus=args.cpus)
+    results = asyncio.run(runner.run_jobs(jobs))
+
+    stats_jobs = [(job, result) for job, result in zip(jobs, results) if job[0] == 'stats' and isinstance(result, dict)]
+    if stats_jobs:
+        from .assembly_table import AssemblyTable
+        assembly_table = AssemblyTable(None)
+        for job, result in stats_jobs:
+            assembly_table.add_assembly(assembly_table.compute_md5(job[1]), job[1], result)
+        assembly_table.write_to_tsv(args.stats_output)
+        print(f"Assembly statistics saved to {args.stats_output}")
+
+    failed = sum(isinstance(result, BaseException) for result in results)
+    print(f"Finished {len(jobs)} jobs: {len(jobs) - failed} succeeded, {failed} failed.")
+    finish_profiling()
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+import os
+import csv
+import json
+import time
+import uuid
+import fcntl
+import signal
+import socket
+import argparse
+import traceback
+from .feature_and_protein_table import GFFParser
+from .profiling import REPORT, add_profiling_arguments, start_profiling, finish_profiling
+
+JOB_TYPES = ('features', 'contigs', 'assembly')
+
+def lock_store(directory):
+    """
+    Take an exclusive lock on a sequence store directory for the life of the process. The stores
+    keep their index in memory and allow a single writer, so each store can be given to one worker
+    only; raises BlockingIOError when another worker already holds the lock.
+    """
+    os.makedirs(directory, exist_ok=True)
+    lock_file = open(os.path.join(directory, 'writer.lock'), 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        raise
+    return lock_file
+
+class SpoolQueue:
+    """
+    Job queue kept in a spool directory, so any number of workers on a machine (or on hosts
+    sharing a file system with atomic rename) can take jobs from it without a server. Only one
+    of the workers can add to a given protein or contig store.
+
+    A job is a JSON file. submit() writes it to tmp/ and renames it into incoming/, so workers
+    never see partial files. A worker claims a job by renaming it from incoming/ into its own
+    processing/<host>.<pid>/ directory; the rename succeeds for exactly one worker. Finished jobs
+    go to done/ and failed jobs to failed/ with the error added. Jobs left behind by a worker
+    that died are moved back to incoming/ by recover().
+    """
+
+    def __init__(self, spool_dir):
+        self.spool_dir = spool_dir
+        self.dirs = {name: os.path.join(spool_dir, name) for name in ('tmp', 'incoming', 'processing', 'done', 'failed')}
+        for path in self.dirs.values():
+            os.makedirs(path, exist_ok=True)
+        self.worker_id = f"{socket.gethostname()}.{os.getpid()}"
+        self.claim_dir = os.path.join(self.dirs['processing'], self.worker_id)
+
+    def submit(self, job):
+        """Add a job (a dictionary with a 'type' and its input paths) and return its name."""
+        if job.get('type') not in JOB_TYPES:
+            raise ValueError(f"Unknown job type {job.get('type')}, expected one of {', '.join(JOB_TYPES)}")
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.json"
+        tmp_path = os.path.join(self.dirs['tmp'], name)
+        with open(tmp_path, 'w') as f:
+            json.dump(job, f)
+        os.rename(tmp_path, os.path.join(self.dirs['incoming'], name))
+        return name
+
+    def claim(self):
+        """Claim the oldest waiting job. Returns (name, job) or None when the queue is empty."""
+        os.makedirs(self.claim_dir, exist_ok=True)
+        for name in sorted(os.listdir(self.dirs['incoming'])):
+            claimed_path = os.path.join(self.claim_dir, name)
+            try:
+                os.rename(os.path.join(self.dirs['incoming'], name), claimed_path)
+            except FileNotFoundError:
+                continue  # Another worker claimed it first
+            with open(claimed_path, 'r') as f:
+                return name, json.load(f)
+        return None
+
+    def finish(self, name, error=None):
+        """Move a claimed job to done/, or to failed/ with the error recorded in the job file."""
+        claimed_path = os.path.join(self.claim_dir, name)
+        if error is None:
+            os.rename(claimed_path, os.path.join(self.dirs['done'], name))
+            return
+        with open(claimed_path, 'r') as f:
+            job = json.load(f)
+        job['error'] = error
+        job['worker'] = self.worker_id
+        with open(claimed_path, 'w') as f:
+            json.dump(job, f)
+        os.rename(claimed_path, os.path.join(self.dirs['failed'], name))
+
+    def recover(self):
+        """Move jobs claimed by workers on this host that are no longer running back to incoming/."""
+        host = socket.gethostname()
+        recovered = 0
+        for worker_id in os.listdir(self.dirs['processing']):
+            worker_host, _, pid = worker_id.rpartition('.')
+            if worker_host != host or not pid.isdigit() or worker_id == self.worker_id:
+                continue
+            try:
+                os.kill(int(pid), 0)
+                continue  # Still running
+            except ProcessLookupError:
+                pass
+            except PermissionError:
+                continue  # Running as another user
+            worker_dir = os.path.join(self.dirs['processing'], worker_id)
+            for name in os.listdir(worker_dir):
+                os.rename(os.path.join(worker_dir, name), os.path.join(self.dirs['incoming'], name))
+                recovered += 1
+            os.rmdir(worker_dir)
+        return recovered
+
+    def counts(self):
+        return {name: len(os.listdir(path)) for name, path in self.dirs.items() if name not in ('tmp', 'processing')}
+
+class Worker:
+    """
+    Long-running worker that takes jobs from a SpoolQueue and appends the results to shared
+    outputs. The interpreter, imported modules, open stores and SQLite connection stay warm
+    between jobs, so many small genomes are not dominated by startup time. Writes to the
+    shared TSV files are serialised between workers with an exclusive lock on a lock file. The
+    sequence stores are flushed before each job's rows are written, so the rows never refer to
+    sequences that a killed worker had not stored yet.
+    """
+
+    def __init__(self, queue, outputs, loader=None, protein_store=None, contig_store=None, poll_interval=1.0):
+        self.queue = queue
+        self.outputs = outputs
+        self.loader = loader
+        self.protein_store = protein_store
+        self.contig_store = contig_store
+        self.poll_interval = poll_interval
+        self.contig_table = None
+        self.assembly_table = None
+        self.stopping = False
+        self.processed = 0
+        self.failed = 0
+
+    def stop(self, *_):
+        """Finish the current job and then exit."""
+        self.stopping = True
+
+    def locked_outputs(self):
+        """Open the lock file that serialises appends to the shared outputs and take the lock."""
+        lock_path = os.path.join(self.queue.spool_dir, 'outputs.lock')
+        lock_file = open(lock_path, 'a')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def flush_stores(self):
+        for store in (self.protein_store, self.contig_store):
+            if store is not None:
+                store.flush()
+
+    @staticmethod
+    def check_inputs(job):
+        """Fail the job early on missing inputs, since the table builders print errors and carry on."""
+        missing = [job[field] for field in ('assembly_file', 'gff_file', 'protein_file')
+                   if field in job and not os.path.exists(job[field])]
+        if missing:
+            raise FileNotFoundError(f"Missing input files: {', '.join(missing)}")
+
+    def run_features(self, job):
+        parser = GFFParser(job['assembly_file'], job['gff_file'], job['protein_file'],
+                           protein_store=self.protein_store, contig_store=self.contig_store)
+        parser.calculate_md5_checksums()
+        parser.prepare_gff3_data()
+        parser.prepare_protein_associations()
+        parser.match_proteins_to_features()
+        self.flush_stores()
+        with self.locked_outputs():
+            if self.loader:
+                self.loader.load_gff_parser(parser)
+            else:
+                parser.save_as_tsv(self.outputs['features'], self.outputs['associations'],
+                                   self.outputs['protein_associations'], append=True)
+
+    def run_contigs(self, job):
+        if self.contig_table is None:
+            from .contig_table import ContigTable
+            self.contig_table = ContigTable(None, contig_store=self.contig_store)
+        self.contig_table.contig_stats = []
+        assembly_id = self.contig_table.compute_md5_from_file(job['assembly_file'])
+        self.contig_table.calculate_contig_stats(job['assembly_file'], assembly_id)
+        self.flush_stores()
+        with self.locked_outputs():
+            if self.loader:
+                self.loader.load_contig_table(self.contig_table)
+            else:
+                self.contig_table.write_to_tsv(self.outputs['contigs'], append=True)
+
+    def run_assembly(self, job):
+        if self.assembly_table is None:
+            from .assembly_table import AssemblyTable
+            self.assembly_table = AssemblyTable(None)
+        self.assembly_table.assemblies = []
+        md5sum = self.assembly_table.compute_md5(job['assembly_file'])
+        parsed_data = self.assembly_table.run_bbmap_and_parse(job['assembly_file'])
+        if not parsed_data:
+            raise RuntimeError(f"BBMap produced no statistics for {job['assembly_file']}")
+        self.assembly_table.add_assembly(md5sum, job['assembly_file'], parsed_data)
+        with self.locked_outputs():
+            if self.loader:
+                self.loader.load_assembly_table(self.assembly_table)
+            else:
+                self.assembly_table.write_to_tsv(self.outputs['assembly'], append=True)
+
+    def process(self, name, job):
+        """Run one job and record whether it succeeded. Errors fail the job, not the worker."""
+        print(f"Worker {self.queue.worker_id} processing {job['type']} job {name}")
+        try:
+            with REPORT.stage(f"worker.{job['type']}", item=name):
+                self.check_inputs(job)
+                getattr(self, f"run_{job['type']}")(job)
+        except Exception:
+            self.failed += 1
+            REPORT.count('worker.failed')
+            self.queue.finish(name, error=traceback.format_exc())
+            print(f"Job {name} failed, moved to {self.queue.dirs['failed']}")
+            return
+        self.processed += 1
+        REPORT.count('worker.processed')
+        self.queue.finish(name)
+
+    def run(self, exit_when_empty=False):
+        """Process jobs until stopped, or until the queue is empty if exit_when_empty is set."""
+        recovered = self.queue.recover()
+        if recovered:
+            print(f"Recovered {recovered} jobs left by stopped workers")
+        while not self.stopping:
+            claimed = self.queue.claim()
+            if claimed is None:
+                if exit_when_empty:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+            self.process(*claimed)
+        if os.path.isdir(self.queue.claim_dir) and not os.listdir(self.queue.claim_dir):
+            os.rmdir(self.queue.claim_dir)
+        print(f"Worker {self.queue.worker_id} stopping: {self.processed} jobs done, {self.failed} failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a resident worker that takes genome jobs from a spool directory, or submit jobs to it.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Process jobs from the spool directory')
+    run_parser.add_argument('spool_dir', type=str, help='Spool directory of the queue')
+    run_parser.add_argument('--features_output', type=str, default='features.tsv', help='Shared TSV file for features')
+    run_parser.add_argument('--associations_output', type=str, default='feature_associations.tsv', help='Shared TSV file for feature associations')
+    run_parser.add_argument('--protein_associations_output', type=str, default='feature_protein_associations.tsv', help='Shared TSV file for feature-protein associations')
+    run_parser.add_argument('--contigs_output', type=str, default='contigs_output.tsv', help='Shared TSV file for contigs')
+    run_parser.add_argument('--assembly_output', type=str, default='assembly_output.tsv', help='Shared TSV file for assemblies')
+    run_parser.add_argument('--sqlite', type=str, default=None, help='Load the tables into this SQLite database instead of writing TSV files')
+    run_parser.add_argument('--binary_ids', action='store_true', help='With --sqlite, store MD5 ID columns as 16-byte BLOBs instead of hex text')
+    run_parser.add_argument('--protein_store', type=str, default=None, help='Directory of a deduplicated protein sequence store to add the proteins to')
+    run_parser.add_argument('--contig_store', type=str, default=None, help='Directory of a contig sequence store to add the contigs to')
+    run_parser.add_argument('--poll_interval', type=float, default=1.0, help='Seconds to wait before checking an empty queue again')
+    run_parser.add_argument('--exit_when_empty', action='store_true', help='Exit once the queue is empty instead of waiting for more jobs')
+    add_profiling_arguments(run_parser)
+
+    submit_parser = subparsers.add_parser('submit', help='Add jobs to the spool directory')
+    submit_parser.add_argument('spool_dir', type=str, help='Spool directory of the queue')
+    submit_parser.add_argument('--type', type=str, choices=JOB_TYPES, default='features', help='Job type')
+    submit_parser.add_argument('paths', nargs='*', help='assembly_file [gff_file protein_file] for a single job')
+    submit_parser.add_argument('--manifest', type=str, default=None, help='Tab-delimited file with the paths of one job per line')
+    args = parser.parse_args()
+
+    queue = SpoolQueue(args.spool_dir)
+    if args.command == 'submit':
+        fields = ['assembly_file', 'gff_file', 'protein_file'] if args.type == 'features' else ['assembly_file']
+        rows = []
+        if args.manifest:
+            with open(args.manifest, 'r') as f:
+                rows.extend(row for row in csv.reader(f, delimiter='\t') if row)
+        if args.paths:
+            rows.append(args.paths)
+        for row in rows:
+            if len(row) < len(fields):
+                print(f"Skipping job with missing paths: {row}")
+                continue
+            job = {'type': args.type}
+            job.update((field, os.path.abspath(path)) for field, path in zip(fields, row))
+            queue.submit(job)
+        print(f"Queue {args.spool_dir}: {queue.counts()}")
+        return
+
+    store_locks = []
+    for option, directory in (('--protein_store', args.protein_store), ('--contig_store', args.contig_store)):
+        if directory:
+            try:
+                store_locks.append(lock_store(directory))
+            except BlockingIOError:
+                parser.error(f"{option} {directory} is in use by another worker; give each worker its own store")
+
+    start_profiling(args)
+    loader = None
+    if args.sqlite:
+        from .sql_loader import SQLiteLoader
+        loader = SQLiteLoader(args.sqlite, binary_ids=args.binary_ids)
+    protein_store = None
+    if args.protein_store:
+        from .protein_store import ProteinStore
+        protein_store = ProteinStore(args.protein_store)
+    contig_store = None
+    if args.contig_store:
+        from .contig_store import ContigStore
+        contig_store = ContigStore(args.contig_store)
+
+    outputs = {
+        'features': args.features_output,
+        'associations': args.associations_output,
+        'protein_associations': args.protein_associations_output,
+        'contigs': args.contigs_output,
+        'assembly': args.assembly_output,
+    }
+    worker = Worker(queue, outputs, loader=loader, protein_store=protein_store, contig_store=contig_store,
+                    poll_interval=args.poll_interval)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(exit_when_empty=args.exit_when_empty)
+
+    if loader:
+        loader.close()
+    if protein_store:
+        protein_store.close()
+    if contig_store:
+        contig_store.close()
+    finish_profiling()
+
+if __name__ == "__main__":
+    main()
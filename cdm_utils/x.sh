@@ -1,2 +1,7 @@
-python feature_and_protein_table.py  input.tsv --delimiter space --features_output features.tsv --associations_output features_association.tsv --protein_associations_output protein_associations.tsv
+python -m cdm_utils.feature_and_protein_table input.tsv --delimiter space --features_output features.tsv --associations_output features_association.tsv --protein_associations_output protein_associations.tsv
 
+
+python -m cdm_utils.annotation_pipeline --batch jobs.tsv --annotator prodigal --features_output features.tsv --associations_output features_association.tsv --protein_associations_output protein_associations.tsv
+
+
+cdm-utils features input.tsv --delimiter space --features_output features.tsv --associations_output features_association.tsv --protein_associations_output protein_associations.tsv
@@ -12,7 +12,7 @@ setup(
     ],
     entry_points={
         'console_scripts': [
-            # Define command-line scripts here if any
+            'cdm-utils=cdm_utils.cli:main',
         ],
     },
     test_suite='tests',
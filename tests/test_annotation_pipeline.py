@@ -0,0 +1,101 @@
+import unittest
+import io
+import os
+import gzip
+import contextlib
+import tempfile
+from unittest.mock import patch
+
+from cdm_utils.annotation_pipeline import AnnotationPipeline
+from cdm_utils.feature_and_protein_table import GFFParser
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+PREFIX = os.path.join(DATA_DIR, 'GCF_003633725.1_ASM363372v1_')
+ASSEMBLY = PREFIX + 'genomic.fna.gz'
+
+def prodigal_outputs():
+    """Turn the bundled RefSeq CDS annotation into GFF and FAA text laid out like Prodigal's output."""
+    proteins = {}
+    protein_id = None
+    with gzip.open(PREFIX + 'protein.faa.gz', 'rt') as f:
+        for line in f:
+            if line.startswith('>'):
+                protein_id = line[1:].split()[0]
+                proteins[protein_id] = []
+            else:
+                proteins[protein_id].append(line)
+
+    gff_lines = ['##gff-version  3\n']
+    faa_lines = []
+    with gzip.open(PREFIX + 'genomic.gff.gz', 'rt') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 9 or fields[2] != 'CDS':
+                continue
+            protein_id = GFFParser.parse_attributes(fields[8]).get('protein_id')
+            if protein_id not in proteins:
+                continue
+            # Prodigal numbers the genes 1, 2, ... across the whole assembly
+            number = len(faa_lines) + 1
+            strand = '1' if fields[6] == '+' else '-1'
+            gff_lines.append('\t'.join(fields[:1] + ['Prodigal_v2.6.3'] + fields[2:8]
+                                       + [f"ID=1_{number};partial=00;start_type=ATG"]) + '\n')
+            faa_lines.append(f">{fields[0]}_{number} # {fields[3]} # {fields[4]} # {strand} # ID=1_{number};partial=00\n"
+                             + ''.join(proteins[protein_id]))
+    return ''.join(gff_lines), ''.join(faa_lines)
+
+class TestAnnotationPipeline(unittest.TestCase):
+
+    def make_temp_dir(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        return temp_dir.name
+
+    def run_pipeline(self):
+        gff_text, faa_text = prodigal_outputs()
+
+        def fake_prodigal(command, check=False):
+            self.assertTrue(os.path.isfile(command[command.index('-i') + 1]))
+            with open(command[command.index('-o') + 1], 'w') as f:
+                f.write(gff_text)
+            with open(command[command.index('-a') + 1], 'w') as f:
+                f.write(faa_text)
+
+        pipeline = AnnotationPipeline(ASSEMBLY, 'sample', os.path.join(self.make_temp_dir(), 'prodigal'))
+        with patch('cdm_utils.prodigal_annotation.subprocess.run', side_effect=fake_prodigal), \
+                contextlib.redirect_stdout(io.StringIO()):
+            gff_file, protein_file = pipeline.annotate()
+            # The reuse path must not hash the GFF file a second time
+            with patch.object(GFFParser, 'generate_file_md5', side_effect=AssertionError('GFF file hashed again')) as mock_md5:
+                parser = pipeline.build_tables(gff_file, protein_file)
+            mock_md5.assert_not_called()
+        return pipeline, parser, gff_file, protein_file
+
+    def test_build_tables_matches_plain_parser(self):
+        pipeline, parser, gff_file, protein_file = self.run_pipeline()
+
+        plain = GFFParser(ASSEMBLY, gff_file, protein_file)
+        with contextlib.redirect_stdout(io.StringIO()):
+            plain.calculate_md5_checksums()
+            plain.prepare_gff3_data()
+            plain.prepare_protein_associations()
+            plain.match_proteins_to_features()
+
+        self.assertGreater(len(plain.features), 0)
+        self.assertEqual(list(parser.features), list(plain.features))
+        self.assertEqual(list(parser.feature_associations), list(plain.feature_associations))
+        self.assertEqual(parser.feature_protein_associations, plain.feature_protein_associations)
+        self.assertTrue(all(feature_id for feature_id, _, _ in parser.feature_protein_associations))
+
+    def test_reused_checksums_match_recomputed_ones(self):
+        pipeline, parser, gff_file, protein_file = self.run_pipeline()
+        assembly_md5, contig_md5s = GFFParser.hash_assembly(ASSEMBLY)
+
+        self.assertEqual(pipeline.annotation.assembly_md5, assembly_md5)
+        self.assertEqual(pipeline.annotation.contig_md5s, contig_md5s)
+        self.assertEqual(pipeline.annotation.gff_md5, GFFParser.generate_file_md5(gff_file))
+        self.assertEqual((parser.assembly_md5, parser.contig_md5s, parser.gff_md5),
+                         (assembly_md5, contig_md5s, GFFParser.generate_file_md5(gff_file)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import io
+import os
+import contextlib
+import tempfile
+import time
+
+from cdm_utils.assembly_table import AssemblyTable
+from cdm_utils.bbmap_assembly_stats import BBMapAssemblyStats
+
+class TestAssemblyTableConcurrent(unittest.TestCase):
+
+    def make_temp_dir(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        return temp_dir.name
+
+    def setUp(self):
+        self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
+        with open(os.path.join(self.data_dir, 'bbmap_output.txt'), 'r') as file:
+            self.bbmap_output = file.read()
+        self.assembly_file = os.path.join(self.data_dir, 'GCF_003633725.1_ASM363372v1_genomic.fna.gz')
+
+    def test_concurrent_results_follow_manifest_order(self):
+        # Alias the same assembly under different names so the order is visible
+        temp_dir = self.make_temp_dir()
+        assembly_paths = []
+        for i in range(4):
+            path = os.path.join(temp_dir, f"assembly_{i}.fna.gz")
+            os.symlink(self.assembly_file, path)
+            assembly_paths.append(path)
+
+        def fake_run_bbmap_stats(assembly_file):
+            # Finish the earlier assemblies last
+            time.sleep(0.05 * (4 - assembly_paths.index(assembly_file)))
+            if assembly_file.endswith('assembly_0.fna.gz'):
+                return self.bbmap_output
+            # Only the composition line, so any other field would be stale data from another assembly
+            return self.bbmap_output.split('\n\n')[0]
+
+        table = AssemblyTable(os.devnull)
+        table.bbmap_parser.run_bbmap_stats = fake_run_bbmap_stats
+        table.process_assemblies_concurrently(assembly_paths, hash_workers=2, max_stats_processes=4)
+
+        self.assertEqual([record['assembly_file'] for record in table.assemblies], assembly_paths)
+        self.assertEqual(len({record['id'] for record in table.assemblies}), 1)
+        self.assertEqual(table.assemblies[0]['scaffold_total'], 13)
+        for record in table.assemblies[1:]:
+            self.assertEqual(record['GC_content'], 0.634)
+            self.assertIsNone(record['scaffold_total'])
+
+    def test_batch_results_keyed_by_input_order_with_composition(self):
+        with open(os.path.join(self.data_dir, 'statswrapper_output.txt'), 'r') as file:
+            statswrapper_output = file.read()
+        table = AssemblyTable(os.devnull)
+        # The echoed file names do not match the paths that were passed in
+        table.bbmap_parser.run_bbmap_stats_batch = lambda assembly_files: statswrapper_output
+        table.bbmap_parser.run_bbmap_stats = lambda assembly_file: None
+        with contextlib.redirect_stdout(io.StringIO()):
+            table.process_assembly_batches([self.assembly_file, self.assembly_file], batch_size=2)
+            # Two rows for one assembly fails the batch, and stats.sh fails on its own as well
+            table.process_assembly_batches([self.assembly_file], batch_size=1)
+
+        self.assertEqual(len(table.assemblies), 2)
+        first, second = table.assemblies
+        self.assertEqual((first['scaffold_total'], second['scaffold_total']), (13, 1))
+        # The composition counted while hashing matches the stats.sh report of the same assembly
+        expected = BBMapAssemblyStats().parse_bbmap_output(self.bbmap_output)
+        for column in ('A_content', 'C_content', 'G_content', 'T_content', 'N_content', 'IUPAC_content', 'Other_content'):
+            self.assertEqual(first[column], expected[column])
+        self.assertEqual(first['id'], table.compute_md5(self.assembly_file))
+
+    def test_failed_batch_falls_back_to_stats_sh(self):
+        def failing_batch(assembly_files):
+            raise OSError("statswrapper.sh not found")
+
+        table = AssemblyTable(os.devnull)
+        table.bbmap_parser.run_bbmap_stats_batch = failing_batch
+        table.bbmap_parser.run_bbmap_stats = lambda assembly_file: self.bbmap_output
+        with contextlib.redirect_stdout(io.StringIO()):
+            table.process_assembly_batches([self.assembly_file, self.assembly_file], batch_size=2)
+
+        self.assertEqual(len(table.assemblies), 2)
+        expected = BBMapAssemblyStats().parse_bbmap_output(self.bbmap_output)
+        for record in table.assemblies:
+            self.assertEqual(record['id'], table.compute_md5(self.assembly_file))
+            self.assertEqual(record['scaffold_total'], expected['scaffold_total'])
+            self.assertEqual(record['A_content'], expected['A_content'])
+
+    def test_comma_paths_run_through_stats_sh(self):
+        with open(os.path.join(self.data_dir, 'statswrapper_output.txt'), 'r') as file:
+            statswrapper_output = file.read()
+        temp_dir = self.make_temp_dir()
+        assembly_paths = []
+        for name in ('first.fna.gz', 'with,comma.fna.gz', 'last.fna.gz'):
+            path = os.path.join(temp_dir, name)
+            os.symlink(self.assembly_file, path)
+            assembly_paths.append(path)
+
+        batches = []
+        stats_files = []
+
+        def fake_run_bbmap_stats_batch(assembly_files):
+            batches.append(assembly_files)
+            return statswrapper_output
+
+        def fake_run_bbmap_stats(assembly_file):
+            stats_files.append(assembly_file)
+            return self.bbmap_output
+
+        table = AssemblyTable(os.devnull)
+        table.bbmap_parser.run_bbmap_stats_batch = fake_run_bbmap_stats_batch
+        table.bbmap_parser.run_bbmap_stats = fake_run_bbmap_stats
+        with contextlib.redirect_stdout(io.StringIO()):
+            table.process_assembly_batches(assembly_paths, batch_size=3)
+
+        self.assertEqual(batches, [[assembly_paths[0], assembly_paths[2]]])
+        self.assertEqual(stats_files, [assembly_paths[1]])
+        self.assertEqual([record['assembly_file'] for record in table.assemblies], assembly_paths)
+        self.assertEqual([record['scaffold_total'] for record in table.assemblies], [13, 13, 1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import csv
+import io
+import os
+import sys
+import sqlite3
+import contextlib
+import tempfile
+from unittest.mock import patch
+
+from cdm_utils.attribute_dictionary import NormalizedAttributeWriter, read_normalized_attributes
+from cdm_utils.feature_and_protein_table import GFFParser, main
+from cdm_utils.sql_loader import SQLiteLoader
+
+class TestAttributeDictionary(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+
+    def test_interning_and_round_trip(self):
+        directory = self.temp_dir
+        writer = NormalizedAttributeWriter(directory, sample_size=4, max_distinct_ratio=0.5)
+        rows = [(f'f{i}', 'gbkey', 'CDS') for i in range(6)]
+        rows += [(f'f{i}', 'note', f'unique {i}') for i in range(6)]
+        rows += [('f0', 'ID', 'cds-1')]
+        writer.writerows(rows)
+        writer.close()
+
+        def count(table):
+            with open(os.path.join(directory, f'{table}.tsv'), 'r') as f:
+                return sum(1 for _ in f) - 1
+
+        # gbkey has one interned value; note stops being interned after its sample; ID is never interned
+        self.assertEqual(count('attribute_keys'), 3)
+        self.assertEqual(count('feature_keys'), 6 + 6 + 1)  # f0 to f5, twice, and f0 again
+        self.assertEqual(count('attribute_values'), 1 + 3)
+        self.assertEqual(count('feature_attribute_refs'), 6 + 3)
+        self.assertEqual(count('feature_attribute_values'), 3 + 1)
+        self.assertEqual(sorted(read_normalized_attributes(directory)), sorted(rows))
+
+        # A second writer on the same directory reuses the existing IDs
+        writer = NormalizedAttributeWriter(directory)
+        writer.writerows([('f9', 'gbkey', 'CDS')])
+        writer.close()
+        self.assertEqual(count('attribute_values'), 4)
+        self.assertIn(('f9', 'gbkey', 'CDS'), list(read_normalized_attributes(directory)))
+        with open(os.path.join(directory, 'feature_keys.tsv'), 'r') as f:
+            self.assertEqual(f.read().splitlines()[-1], '14\tf9')
+
+    def test_parser_output_and_sql_view(self):
+        prefix = os.path.join(os.path.dirname(__file__), 'data', 'GCF_003633725.1_ASM363372v1_')
+        parser = GFFParser(prefix + 'genomic.fna.gz', prefix + 'genomic.gff.gz', prefix + 'protein.faa.gz')
+        parser.calculate_md5_checksums()
+        parser.prepare_gff3_data()
+
+        directory = self.temp_dir
+        attribute_writer = NormalizedAttributeWriter(os.path.join(directory, 'attributes'))
+        parser.save_as_tsv(*(os.path.join(directory, name) for name in ('f.tsv', 'a.tsv', 'p.tsv')),
+                           attribute_writer=attribute_writer)
+        attribute_writer.close()
+        self.assertFalse(os.path.exists(os.path.join(directory, 'a.tsv')))
+        expected = sorted(parser.feature_associations)
+        self.assertEqual(sorted(tuple(row) for row in read_normalized_attributes(attribute_writer.directory)), expected)
+
+        loader = SQLiteLoader(os.path.join(directory, 'cdm.sqlite'))
+        for table in ('attribute_keys', 'attribute_values', 'feature_keys', 'feature_attribute_refs', 'feature_attribute_values'):
+            with open(os.path.join(attribute_writer.directory, f'{table}.tsv'), 'r', newline='') as f:
+                reader = csv.reader(f, delimiter='\t')
+                loader.load_rows(table, next(reader), reader)
+        loader.close()
+        conn = sqlite3.connect(os.path.join(directory, 'cdm.sqlite'))
+        self.assertEqual(sorted(conn.execute('SELECT feature_id, "key", "value" FROM feature_attributes')), expected)
+
+    def test_rejected_with_sqlite_or_shards(self):
+        for option in ('--sqlite', '--shard_dir'):
+            argv = ['feature_and_protein_table', os.devnull, '--normalized_attributes', self.temp_dir,
+                    option, os.path.join(self.temp_dir, 'out')]
+            with patch.object(sys, 'argv', argv), contextlib.redirect_stderr(io.StringIO()) as stderr:
+                with self.assertRaises(SystemExit):
+                    main()
+            self.assertIn('--normalized_attributes', stderr.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,7 @@
 import unittest
 import os
+import shutil
+import tempfile
 from unittest.mock import patch, MagicMock
 from io import StringIO
 
@@ -34,17 +36,86 @@ class TestBBMapAssemblyStatsWithFiles(unittest.TestCase):
         expected_result = {
             'A_content': 0.1862, 'C_content': 0.3191, 'G_content': 0.3149, 'T_content': 0.1798, 'N_content': 0.0004,
             'IUPAC_content': 0.0, 'Other_content': 0.0, 'GC_content': 0.634, 'GC_stdev': 0.0805, 'scaffold_total': 13,
-            'contig_total': 20, 'scaffold_sequence_total': '1.879 MB', 'contig_sequence_total': '1.878 MB  ',
-            'contig_gap_percentage': '0.042% gap', 'scaffold_N50': '2 KB', 'scaffold_L50': '247.538 KB', 
-            'contig_N50': '5 KB', 'contig_L50': '169.915 KB', 'scaffold_N90': '6 KB', 'scaffold_L90': '136.211 KB', 
-            'contig_N90': '10 KB', 'contig_L90': '95.394 KB', 'max_scaffold_length': '859.216 KB', 
-            'max_contig_length': '314.009 KB', 'large_scaffold_count_gt_50kb': 6, 
+            'contig_total': 20, 'scaffold_sequence_total': 1879126, 'contig_sequence_total': 1878328,
+            'contig_gap_percentage': 0.042, 'scaffold_N50': 2, 'scaffold_L50': 247538,
+            'contig_N50': 5, 'contig_L50': 169915, 'scaffold_N90': 6, 'scaffold_L90': 136211,
+            'contig_N90': 10, 'contig_L90': 95394, 'max_scaffold_length': 859216,
+            'max_contig_length': 314009, 'large_scaffold_count_gt_50kb': 6,
             'percent_genome_in_large_scaffolds_gt_50kb': 96.55
         }
 
         # Check if the parsed data matches the expected result
         self.assertEqual(stats, expected_result)
 
+    def test_parse_statswrapper_output(self):
+        # Synthetic statswrapper.sh format=3 output for two assemblies, laid out like BBMap's
+        # table with the first row's values taken from the stats.sh report in bbmap_output.txt;
+        # test_statswrapper_matches_stats_sh checks the parser against real BBMap where it is installed
+        with open(os.path.join(self.data_dir, 'statswrapper_output.txt'), 'r') as file:
+            statswrapper_output = file.read()
+
+        bbmap_parser = BBMapAssemblyStats()
+        stats_list = bbmap_parser.parse_statswrapper_output(statswrapper_output)
+        self.assertEqual(len(stats_list), 2)
+
+        expected_result = {
+            'GC_content': 0.634, 'GC_stdev': 0.0805, 'scaffold_total': 13, 'contig_total': 20,
+            'scaffold_sequence_total': 1879126, 'contig_sequence_total': 1878328,
+            'contig_gap_percentage': 0.042, 'scaffold_N50': 2, 'scaffold_L50': 247538,
+            'contig_N50': 5, 'contig_L50': 169915, 'scaffold_N90': 6, 'scaffold_L90': 136211,
+            'contig_N90': 10, 'contig_L90': 95394, 'max_scaffold_length': 859216,
+            'max_contig_length': 314009, 'large_scaffold_count_gt_50kb': 6,
+            'percent_genome_in_large_scaffolds_gt_50kb': 96.55
+        }
+        self.assertEqual(stats_list[0], expected_result)
+
+        second = stats_list[1]
+        self.assertEqual(second['scaffold_total'], 1)
+        self.assertEqual(second['max_contig_length'], 4641652)
+
+    @patch('subprocess.run')
+    def test_run_bbmap_stats_batch(self, mock_run):
+        mock_run.return_value = MagicMock(stdout=b'n_scaffolds\n', stderr=b'', returncode=0)
+
+        bbmap_parser = BBMapAssemblyStats()
+        bbmap_parser.statswrapper_path = 'statswrapper.sh'
+        output = bbmap_parser.run_bbmap_stats_batch(['a.fna', 'b.fna.gz'])
+
+        self.assertEqual(output, 'n_scaffolds\n')
+        self.assertEqual(mock_run.call_args[0][0], ['statswrapper.sh', 'in=a.fna,b.fna.gz', 'format=3'])
+
+    @patch('subprocess.run')
+    def test_run_bbmap_stats_batch_rejects_comma_paths(self, mock_run):
+        bbmap_parser = BBMapAssemblyStats()
+        bbmap_parser.statswrapper_path = 'statswrapper.sh'
+        with self.assertRaises(ValueError):
+            bbmap_parser.run_bbmap_stats_batch(['a.fna', 'b,c.fna'])
+        mock_run.assert_not_called()
+
+    @unittest.skipUnless(shutil.which('stats.sh') and shutil.which('statswrapper.sh'), 'BBMap is not installed')
+    def test_statswrapper_matches_stats_sh(self):
+        # Real statswrapper.sh format=3 output parses to the same values as stats.sh on each file
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        assembly_file = os.path.join(self.data_dir, 'GCF_003633725.1_ASM363372v1_genomic.fna.gz')
+        second_file = os.path.join(temp_dir.name, 'single_contig.fna')
+        with open(second_file, 'w') as f:
+            f.write('>contig_1\n' + 'ACGTTGCA' * 10000 + '\n')
+
+        bbmap_parser = BBMapAssemblyStats()
+        stats_list = bbmap_parser.parse_statswrapper_output(bbmap_parser.run_bbmap_stats_batch([assembly_file, second_file]))
+        self.assertEqual(len(stats_list), 2)
+        for assembly, batch_stats in zip((assembly_file, second_file), stats_list):
+            single_stats = BBMapAssemblyStats().parse_bbmap_output(bbmap_parser.run_bbmap_stats(assembly))
+            for key, value in batch_stats.items():
+                self.assertAlmostEqual(value, single_stats[key], places=3, msg=key)
+
+    def test_parse_length(self):
+        self.assertEqual(BBMapAssemblyStats.parse_length('247.538 KB'), 247538)
+        self.assertEqual(BBMapAssemblyStats.parse_length('1.879 MB  '), 1879000)
+        self.assertEqual(BBMapAssemblyStats.parse_length('1,879,126'), 1879126)
+        self.assertEqual(BBMapAssemblyStats.parse_count_and_length('2/247538'), (2, 247538))
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,52 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+
+from cdm_utils import cli
+
+# Cumulative import time allowed for each command module, in microseconds
+IMPORT_BUDGET_US = 300000
+HEAVY_MODULES = ('pandas', 'Bio', 'numpy')
+
+class TestCLI(unittest.TestCase):
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def make_temp_dir(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        return temp_dir.name
+
+    def import_times(self, module):
+        """Return {module name: cumulative microseconds} from python -X importtime."""
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                capture_output=True, text=True, cwd=self.root)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        times = {}
+        for line in result.stderr.splitlines():
+            if line.startswith('import time:') and '|' in line:
+                _, cumulative, name = line.split('|')
+                if cumulative.strip().isdigit():
+                    times[name.strip()] = int(cumulative)
+        return times
+
+    def test_command_modules_start_fast_without_heavy_dependencies(self):
+        for _, module, _ in cli.COMMANDS:
+            times = self.import_times(module)
+            heavy = [name for name in times if name.split('.')[0] in HEAVY_MODULES]
+            self.assertEqual(heavy, [], f"{module} imports {heavy} at startup")
+            self.assertLess(times[module], IMPORT_BUDGET_US, f"{module} took {times[module]} us to import")
+
+    def test_dispatch(self):
+        self.assertEqual(cli.main(['no-such-command']), 2)
+        output_dir = self.make_temp_dir()
+        result = subprocess.run([sys.executable, '-m', 'cdm_utils.cli', 'synthetic', output_dir, '--contigs', '1',
+                                 '--contig_length', '5000', '--plain'],
+                                capture_output=True, text=True, cwd=self.root)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertTrue(os.path.exists(os.path.join(output_dir, 'genomes.tsv')))
+
+if __name__ == '__main__':
+    unittest.main()
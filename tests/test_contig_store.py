@@ -0,0 +1,72 @@
+import unittest
+import gzip
+import hashlib
+import io
+import os
+import contextlib
+import tempfile
+
+from cdm_utils.feature_and_protein_table import GFFParser
+from cdm_utils.prodigal_annotation import ProdigalAnnotation
+from cdm_utils.contig_store import ContigStore
+
+class TestContigStore(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
+        self.assembly_file = os.path.join(self.data_dir, 'GCF_003633725.1_ASM363372v1_genomic.fna.gz')
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+        self.store_dir = os.path.join(self.temp_dir, 'contigs')
+
+    def read_contigs(self):
+        contigs = {}
+        with gzip.open(self.assembly_file, 'rt') as f:
+            name = None
+            for line in f:
+                if line.startswith('>'):
+                    name = line[1:].split()[0]
+                    contigs[name] = []
+                else:
+                    contigs[name].append(line.strip())
+        return {name: ''.join(parts) for name, parts in contigs.items()}
+
+    def test_contigs_are_stored_while_hashing(self):
+        store = ContigStore(self.store_dir)
+        assembly_md5, contig_md5s = GFFParser.hash_assembly(self.assembly_file, contig_store=store)
+        store.close()
+        contigs = self.read_contigs()
+        self.assertEqual(len(store), len(set(contig_md5s.values())))
+
+        store = ContigStore(self.store_dir)
+        for name, sequence in contigs.items():
+            contig_md5 = contig_md5s[name]
+            self.assertEqual(hashlib.md5(store.fetch(contig_md5).encode()).hexdigest(), contig_md5)
+            self.assertEqual(store.fetch(contig_md5, 101, 250), sequence[100:250])
+            self.assertEqual(store.fetch(contig_md5, len(sequence) - 9, len(sequence) + 50), sequence[-10:])
+        self.assertIsNone(store.fetch('0' * 32))
+
+        # Reopening and hashing the same assembly again adds nothing
+        size = os.path.getsize(os.path.join(self.store_dir, 'contigs.seq'))
+        GFFParser.hash_assembly(self.assembly_file, contig_store=store)
+        store.close()
+        self.assertEqual(store.added, 0)
+        self.assertEqual(os.path.getsize(os.path.join(self.store_dir, 'contigs.seq')), size)
+
+    def test_annotator_pass_fills_the_store(self):
+        store = ContigStore(self.store_dir)
+        annotation = ProdigalAnnotation(self.assembly_file, 'test', os.path.join(self.temp_dir, 'out'), contig_store=store)
+        annotation.prepare_assembly_file()
+        self.assertEqual(len(store), len(set(annotation.contig_md5s.values())))
+
+        # With the MD5s reused from the annotator, GFFParser does not read the assembly again
+        parser = GFFParser(os.path.join(self.temp_dir, 'missing.fna'), None, None,
+                           assembly_md5=annotation.assembly_md5, contig_md5s=annotation.contig_md5s, contig_store=store)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            parser.calculate_md5_checksums()
+        self.assertIn('Reusing precomputed MD5s', output.getvalue())
+        store.close()
+
+if __name__ == '__main__':
+    unittest.main()
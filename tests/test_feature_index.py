@@ -0,0 +1,66 @@
+import unittest
+import os
+import random
+import tempfile
+
+from cdm_utils.feature_and_protein_table import GFFParser
+from cdm_utils.feature_index import FeatureIndex, INDEX_MAGIC
+
+class TestFeatureIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
+        prefix = os.path.join(self.data_dir, 'GCF_003633725.1_ASM363372v1_')
+        parser = GFFParser(prefix + 'genomic.fna.gz', prefix + 'genomic.gff.gz', prefix + 'protein.faa.gz')
+        parser.calculate_md5_checksums()
+        parser.prepare_gff3_data()
+        self.features = list(parser.features.iter_dicts())
+        self.index = FeatureIndex.from_parser(parser)
+
+    def test_overlapping_matches_linear_scan(self):
+        rng = random.Random(1)
+        for _ in range(200):
+            feature = rng.choice(self.features)
+            start = max(1, feature['start'] - rng.randint(0, 5000))
+            end = start + rng.randint(0, 5000)
+            expected = sorted(f['feature_uid'] for f in self.features
+                              if f['seq_id'] == feature['seq_id'] and f['start'] <= end and f['end'] >= start)
+            found = self.index.overlapping(feature['seq_id'], start, end)
+            self.assertEqual(sorted(f['feature_uid'] for f in found), expected)
+            # Queries by contig_md5 give the same answer
+            by_md5 = self.index.overlapping(feature['contig_md5'], start, end)
+            self.assertEqual([f['feature_uid'] for f in by_md5], [f['feature_uid'] for f in found])
+
+    def test_id_lookups_and_persistence(self):
+        cds = next(f for f in self.features if f['protein_id'])
+        with tempfile.TemporaryDirectory() as temp_dir:
+            index_file = os.path.join(temp_dir, 'features.idx')
+            self.index.save(index_file)
+            index = FeatureIndex.load(index_file)
+            with open(index_file, 'rb') as f:
+                self.assertEqual(f.read(len(INDEX_MAGIC)), INDEX_MAGIC)
+            with self.assertRaises(ValueError):
+                FeatureIndex.load(os.path.join(self.data_dir, 'bbmap_output.txt'))
+
+        self.assertEqual(index.rows, self.index.rows)
+        self.assertEqual(index.contigs, self.index.contigs)
+
+        self.assertEqual(index.get(cds['feature_uid'])['protein_id'], cds['protein_id'])
+        self.assertIn(cds['feature_uid'], [f['feature_uid'] for f in index.find_by_protein_id(cds['protein_id'])])
+        self.assertIn(cds['feature_uid'], [f['feature_uid'] for f in index.find_by_original_id(cds['original_id'])])
+        self.assertIsNone(index.get('missing'))
+        self.assertEqual(index.overlapping('missing', 1, 10), [])
+
+    def test_contigs_with_identical_sequences(self):
+        # Two contigs with the same sequence share a contig_md5 but keep their own features
+        features = [dict(f, seq_id='copy', feature_uid='copy_' + f['feature_uid'])
+                    for f in self.features if f['seq_id'] == self.features[0]['seq_id']]
+        index = FeatureIndex(self.features + features)
+        original = self.index.overlapping(self.features[0]['seq_id'], 1, 10 ** 9)
+        copy = index.overlapping('copy', 1, 10 ** 9)
+        self.assertEqual(index.overlapping(self.features[0]['seq_id'], 1, 10 ** 9), original)
+        self.assertEqual([f['feature_uid'] for f in copy], ['copy_' + f['feature_uid'] for f in original])
+        self.assertEqual(len(index.overlapping(self.features[0]['contig_md5'], 1, 10 ** 9)), 2 * len(original))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import hashlib
+import os
+import tempfile
+
+from cdm_utils.feature_and_protein_table import GFFParser
+from cdm_utils.contig_store import ContigStore
+from cdm_utils.feature_sequences import FeatureSequenceExtractor, reverse_complement, translate
+
+class TestFeatureSequences(unittest.TestCase):
+
+    def make_temp_dir(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        return temp_dir.name
+
+    def setUp(self):
+        prefix = os.path.join(os.path.dirname(__file__), 'data', 'GCF_003633725.1_ASM363372v1_')
+        self.assembly_file = prefix + 'genomic.fna.gz'
+        self.parser = GFFParser(self.assembly_file, prefix + 'genomic.gff.gz', prefix + 'protein.faa.gz')
+        self.parser.calculate_md5_checksums()
+        self.parser.prepare_gff3_data()
+        self.parser.prepare_protein_associations()
+        self.parser.match_proteins_to_features()
+
+    def test_reverse_complement_and_translate(self):
+        self.assertEqual(reverse_complement('ATGCNryA'), 'TryNGCAT')
+        self.assertEqual(translate('GTGAAATAA'), 'MK')
+        self.assertEqual(translate('CGTGAAANN'), 'REX')
+        self.assertEqual(translate('AGTGAAATAG', phase=1), 'VK')
+
+    def test_translations_match_protein_file(self):
+        protein_md5s = {feature_id: protein_md5 for feature_id, _, protein_md5 in self.parser.feature_protein_associations}
+        extractor = FeatureSequenceExtractor(self.parser.features, translate=True)
+        records = list(extractor.extract_from_assembly(self.assembly_file))
+        matched = [hashlib.md5(translation.encode()).hexdigest() == protein_md5s[feature_id]
+                   for feature_id, _, _, _, translation in records if feature_id in protein_md5s]
+        # Only partial and pseudo genes may translate differently from the FAA file
+        self.assertGreater(len(matched), 1000)
+        self.assertGreater(sum(matched) / len(matched), 0.99)
+
+    def test_store_and_assembly_give_same_sequences(self):
+        store = ContigStore(os.path.join(self.make_temp_dir(), 'contigs'))
+        GFFParser.hash_assembly(self.assembly_file, contig_store=store)
+        extractor = FeatureSequenceExtractor(self.parser.features, translate=True)
+        from_store = sorted(extractor.extract_from_store(store))
+        from_assembly = sorted(extractor.extract_from_assembly(self.assembly_file))
+        store.close()
+        self.assertEqual(from_store, from_assembly)
+        self.assertTrue(all(record[1] in ('CDS', 'rRNA', 'tRNA') for record in from_store))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import io
+import os
+import contextlib
+import tempfile
+
+from cdm_utils.feature_and_protein_table import GFFParser
+
+class TestGFFAttributes(unittest.TestCase):
+
+    def test_plain_attributes(self):
+        attributes = GFFParser.parse_attributes('ID=cds1;Name=abc;product=a, b;empty')
+        self.assertEqual(attributes, {'ID': 'cds1', 'Name': 'abc', 'product': 'a, b'})
+
+    def test_multiple_values_are_split_before_decoding(self):
+        attributes = GFFParser.parse_attributes('ID=exon%3B1;Parent=tx1,tx2;Dbxref=GO:1,EC:2%2C3;Note=50%25')
+        self.assertEqual(attributes['ID'], 'exon;1')
+        self.assertEqual(attributes['Parent'], ['tx1', 'tx2'])
+        self.assertEqual(attributes['Dbxref'], ['GO:1', 'EC:2,3'])
+        self.assertEqual(attributes['Note'], ['50%'])
+
+    def test_multi_parent_feature_links_every_parent(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            gff_file = os.path.join(temp_dir, 'multi.gff')
+            with open(gff_file, 'w') as f:
+                f.write('ctg1\tsrc\texon\t1\t90\t.\t+\t.\tID=exon1;Parent=tx1,tx2;product=x%3By\n')
+            parser = GFFParser(None, gff_file, None, gff_md5='x')
+            with contextlib.redirect_stdout(io.StringIO()):
+                parser.prepare_gff3_data()
+        feature = parser.features[0]
+        self.assertEqual(feature[10], 'tx1')
+        self.assertEqual([row[1:] for row in parser.feature_associations],
+                         [('ID', 'exon1'), ('Parent', 'tx1'), ('Parent', 'tx2'), ('product', 'x;y')])
+
+    def test_uid_hashes_the_id_as_written(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            gff_file = os.path.join(temp_dir, 'escaped.gff')
+            with open(gff_file, 'w') as f:
+                f.write('ctg1\tsrc\texon\t1\t90\t.\t+\t.\tID=exon%3B1;Note=50%25\n')
+            parser = GFFParser(None, gff_file, None, gff_md5='x')
+            with contextlib.redirect_stdout(io.StringIO()):
+                parser.prepare_gff3_data()
+        feature = parser.features[0]
+        self.assertEqual(feature[0], GFFParser.generate_hash_id('ctg1', 1, 90, 'exon', 'x', 'exon%3B1'))
+        self.assertEqual(feature[9], 'exon;1')
+
+if __name__ == '__main__':
+    unittest.main()
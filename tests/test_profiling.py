@@ -0,0 +1,85 @@
+import unittest
+import json
+import os
+import tempfile
+import tracemalloc
+from unittest.mock import patch
+
+from cdm_utils.assembly_table import AssemblyTable
+from cdm_utils.profiling import RunReport, profiled
+
+class Writer:
+    def __init__(self, path):
+        self.path = path
+
+    @profiled('test.write', item=lambda self, lines: self.path, records=lambda self, result: result,
+              outputs=lambda self, lines: [self.path])
+    def write(self, lines):
+        with open(self.path, 'a') as f:
+            f.writelines(lines)
+        return len(lines)
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+
+    def test_stage_context_manager(self):
+        report = RunReport()
+        for item in ('a', 'b', 'a'):
+            with report.stage('parse', item=item) as timer:
+                timer.add(records=10, bytes_in=100)
+        report.count('cache.hits', 3)
+        stats = report.to_dict()['stages']['parse']
+        self.assertEqual(stats['calls'], 3)
+        self.assertEqual(stats['records'], 30)
+        self.assertEqual(stats['bytes_in'], 300)
+        self.assertEqual(sorted(item for item, _ in stats['slowest']), ['a', 'b'])
+        self.assertEqual(report.to_dict()['counters'], {'cache.hits': 3})
+
+    def test_decorator_counts_records_and_bytes_out(self):
+        # The decorator records into the module's REPORT, replaced here by a report of this test's own
+        report = RunReport()
+        patcher = patch('cdm_utils.profiling.REPORT', report)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        writer = Writer(os.path.join(self.temp_dir, 'out.txt'))
+        writer.write(['abc\n', 'de\n'])
+        writer.write(['f\n'])
+        stats = report.stages['test.write']
+        self.assertEqual(stats.calls, 2)
+        self.assertEqual(stats.records, 3)
+        self.assertEqual(stats.bytes_out, 9)
+        self.assertEqual(list(stats.items), [writer.path])
+
+    def test_assembly_hashing_stages_are_separate(self):
+        report = RunReport()
+        patcher = patch('cdm_utils.profiling.REPORT', report)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        assembly_file = os.path.join(os.path.dirname(__file__), 'data', 'GCF_003633725.1_ASM363372v1_genomic.fna.gz')
+        table = AssemblyTable(os.devnull)
+        table.compute_md5(assembly_file)
+        table.compute_md5_and_composition(assembly_file)
+        table.compute_md5_and_composition(assembly_file)
+        self.assertEqual(report.stages['assembly_table.compute_md5'].calls, 1)
+        self.assertEqual(report.stages['assembly_table.compute_md5_and_composition'].calls, 2)
+
+    def test_report_written_on_finish(self):
+        path = os.path.join(self.temp_dir, 'report.json')
+        report = RunReport()
+        report.configure(report_path=path, tracemalloc=True)
+        self.addCleanup(tracemalloc.stop)
+        with report.stage('work'):
+            [str(i) for i in range(1000)]
+        report.finish()
+        with open(path, 'r') as f:
+            written = json.load(f)
+        self.assertIn('work', written['stages'])
+        self.assertGreater(written['tracemalloc']['peak_bytes'], 0)
+        self.assertGreater(written['peak_rss_kb'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
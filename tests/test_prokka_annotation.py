@@ -0,0 +1,83 @@
+import unittest
+import io
+import os
+import contextlib
+import tempfile
+import hashlib
+
+from cdm_utils.prokka_annotation import ProkkaAnnotation, ProkkaBatchRunner
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+ASSEMBLY = os.path.join(DATA_DIR, 'GCF_003633725.1_ASM363372v1_genomic.fna.gz')
+
+class TestProkkaBatchRunner(unittest.TestCase):
+
+    def test_failing_job_does_not_abort_batch(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            existing = os.path.join(temp_dir, 'existing')
+            os.makedirs(existing)
+            jobs = [(ASSEMBLY, 'first', existing), (ASSEMBLY, 'second', existing)]
+            runner = ProkkaBatchRunner(jobs, scratch_dir=temp_dir, cpus=2, max_workers=1)
+            with contextlib.redirect_stdout(io.StringIO()):
+                failed = runner.run()
+            self.assertEqual(failed, [existing, existing])
+            self.assertEqual(sorted(os.listdir(temp_dir)), ['existing'])
+
+class TestProkkaRewriters(unittest.TestCase):
+
+    def test_add_protein_id(self):
+        cds = 'contig_1\tProdigal:002006\tCDS\t1\t90\t.\t+\t0\tID=PROKKA_00001;locus_tag=PROKKA_00001\n'
+        self.assertEqual(ProkkaAnnotation.add_protein_id(cds),
+                         'contig_1\tProdigal:002006\tCDS\t1\t90\t.\t+\t0\t'
+                         'ID=PROKKA_00001;locus_tag=PROKKA_00001;protein_id=PROKKA_00001_prot\n')
+        # A trailing separator is kept, as the original rewrite did
+        trailing = 'contig_1\tProdigal:002006\tCDS\t1\t90\t.\t+\t0\tID=PROKKA_00002;\n'
+        self.assertEqual(ProkkaAnnotation.add_protein_id(trailing),
+                         'contig_1\tProdigal:002006\tCDS\t1\t90\t.\t+\t0\tID=PROKKA_00002;;protein_id=PROKKA_00002_prot\n')
+
+        unchanged = [
+            'contig_1\tprokka\tgene\t1\t90\t.\t+\t.\tID=PROKKA_00001_gene;locus_tag=PROKKA_00001\n',
+            'contig_1\tProdigal:002006\tCDS\t1\t90\t.\t+\t0\tlocus_tag=PROKKA_00003\n',
+            '##gff-version 3\n',
+            '#contig_1\tProdigal:002006\tCDS\t1\t90\t.\t+\t0\tID=PROKKA_00001\n',
+            '##FASTA\n',
+            '>contig_1\n',
+            'ACGTACGTTTGA\n',
+        ]
+        for line in unchanged:
+            self.assertEqual(ProkkaAnnotation.add_protein_id(line), line)
+
+    def test_rename_protein(self):
+        self.assertEqual(ProkkaAnnotation.rename_protein('>PROKKA_00001 Chromosomal replication initiator protein DnaA\n'),
+                         '>PROKKA_00001_prot  Chromosomal replication initiator protein DnaA\n')
+        self.assertEqual(ProkkaAnnotation.rename_protein('>PROKKA_00002\n'), '>PROKKA_00002_prot \n')
+        self.assertEqual(ProkkaAnnotation.rename_protein('MSLKQ*\n'), 'MSLKQ*\n')
+
+    def test_rewrite_file(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        source_path = os.path.join(temp_dir.name, 'source.faa')
+        target_path = os.path.join(temp_dir.name, 'target.faa')
+        with open(source_path, 'w') as f:
+            f.write('>PROKKA_00001 hypothetical protein\nMSLKQ\n>PROKKA_00002\nMKV\n')
+        with open(target_path, 'w') as f:
+            f.write('stale\n')
+
+        def rewrite_line(line):
+            # The output is written to a temporary file and only replaces the target at the end
+            self.assertTrue(os.path.exists(target_path + '.tmp'))
+            with open(target_path, 'r') as f:
+                self.assertEqual(f.read(), 'stale\n')
+            return ProkkaAnnotation.rename_protein(line)
+
+        annotation = ProkkaAnnotation(ASSEMBLY, 'prefix', os.path.join(temp_dir.name, 'output'))
+        md5 = annotation.rewrite_file(source_path, target_path, rewrite_line)
+
+        with open(target_path, 'rb') as f:
+            content = f.read()
+        self.assertEqual(content, b'>PROKKA_00001_prot  hypothetical protein\nMSLKQ\n>PROKKA_00002_prot \nMKV\n')
+        self.assertEqual(md5, hashlib.md5(content).hexdigest())
+        self.assertEqual(sorted(os.listdir(temp_dir.name)), ['source.faa', 'target.faa'])
+
+if __name__ == '__main__':
+    unittest.main()
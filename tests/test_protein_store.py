@@ -0,0 +1,57 @@
+import unittest
+import gzip
+import hashlib
+import os
+import tempfile
+
+from cdm_utils.feature_and_protein_table import GFFParser
+from cdm_utils.protein_store import ProteinStore
+
+class TestProteinStore(unittest.TestCase):
+
+    def make_temp_dir(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        return temp_dir.name
+
+    def setUp(self):
+        self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
+        self.store_dir = os.path.join(self.make_temp_dir(), 'proteins')
+
+    def parse_genome(self, store):
+        prefix = os.path.join(self.data_dir, 'GCF_003633725.1_ASM363372v1_')
+        parser = GFFParser(prefix + 'genomic.fna.gz', prefix + 'genomic.gff.gz', prefix + 'protein.faa.gz',
+                           protein_store=store)
+        parser.calculate_md5_checksums()
+        parser.prepare_gff3_data()
+        parser.prepare_protein_associations()
+        return parser
+
+    def test_unique_sequences_are_stored_once_across_runs(self):
+        store = ProteinStore(self.store_dir, block_size=4096)
+        parser = self.parse_genome(store)
+        store.close()
+        unique_md5s = {protein_md5 for _, _, protein_md5 in parser.feature_protein_associations}
+        self.assertEqual(len(store.added), len(unique_md5s))
+
+        # A second run over the same genome writes nothing new
+        size = os.path.getsize(os.path.join(self.store_dir, 'proteins.fa.gz'))
+        store = ProteinStore(self.store_dir, block_size=4096)
+        self.parse_genome(store)
+        store.close()
+        self.assertEqual(len(store.added), 0)
+        self.assertEqual(os.path.getsize(os.path.join(self.store_dir, 'proteins.fa.gz')), size)
+
+        # Stored sequences can be read back and still hash to their key
+        protein_md5 = sorted(unique_md5s)[len(unique_md5s) // 2]
+        self.assertIn(protein_md5, store)
+        sequence = store.get(protein_md5)
+        self.assertEqual(hashlib.md5(sequence.encode()).hexdigest(), protein_md5)
+
+        # The concatenated blocks form one readable gzipped FASTA file
+        with gzip.open(os.path.join(self.store_dir, 'proteins.fa.gz'), 'rt') as fasta:
+            headers = [line[1:].strip() for line in fasta if line.startswith('>')]
+        self.assertEqual(sorted(headers), sorted(unique_md5s))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import gzip
+import os
+import tempfile
+
+from cdm_utils.feature_and_protein_table import GFFParser
+from cdm_utils.protein_validation import ProteinCrossCheck, SortedIdSpool
+
+class TestProteinValidation(unittest.TestCase):
+
+    def make_temp_dir(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        return temp_dir.name
+
+    def test_spool_merges_spilled_runs(self):
+        spool = SortedIdSpool(max_in_memory=3)
+        values = ['p%d' % i for i in (9, 3, 7, 1, 8, 3, 2, 6, 5, 4)]
+        for value in values:
+            spool.add(value)
+        self.assertEqual(len(spool.runs), 3)
+        self.assertEqual(list(spool), sorted(values))
+        spool.close()
+
+    def test_report_counts_both_directions(self):
+        check = ProteinCrossCheck(max_in_memory=2, max_examples=1)
+        for protein_id in ['a', 'b', 'b', 'c', 'd']:
+            check.add_gff(protein_id)
+        for protein_id in ['a', 'b', 'c', 'c', 'e', 'f']:
+            check.add_faa(protein_id)
+        report = check.report()
+        check.close()
+        self.assertEqual(report['matched'], 3)
+        self.assertEqual(report['missing_in_faa'], 1)
+        self.assertEqual(report['missing_in_gff'], 2)
+        self.assertEqual(report['duplicate_gff_ids'], 1)
+        self.assertEqual(report['duplicate_faa_ids'], 1)
+        self.assertEqual(report['examples']['missing_in_gff'], ['e'])
+        self.assertFalse(report['valid'])
+
+    def test_parser_reports_instead_of_raising(self):
+        prefix = os.path.join(os.path.dirname(__file__), 'data', 'GCF_003633725.1_ASM363372v1_')
+        protein_file = os.path.join(self.make_temp_dir(), 'proteins.faa')
+        with gzip.open(prefix + 'protein.faa.gz', 'rt') as f_in, open(protein_file, 'w') as f_out:
+            f_out.write(f_in.read())
+            f_out.write(">NOT_IN_GFF.1 extra protein\nMKV\n")
+
+        parser = GFFParser(prefix + 'genomic.fna.gz', prefix + 'genomic.gff.gz', protein_file,
+                           cross_check=ProteinCrossCheck(max_in_memory=500))
+        parser.calculate_md5_checksums()
+        parser.prepare_gff3_data()
+        parser.prepare_protein_associations()
+        report = parser.validation_report()
+        self.assertEqual(report['missing_in_gff'], 1)
+        self.assertEqual(report['examples']['missing_in_gff'], ['NOT_IN_GFF.1'])
+        self.assertEqual(report['matched'], report['faa_protein_ids'] - 1)
+        # The extra protein did not stop the rest of the file from being read
+        self.assertEqual(len(parser.feature_protein_associations), report['faa_protein_ids'])
+
+if __name__ == '__main__':
+    unittest.main()
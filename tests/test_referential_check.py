@@ -0,0 +1,66 @@
+import unittest
+import gzip
+import os
+import hashlib
+import tempfile
+
+from cdm_utils.referential_check import ReferentialChecker
+
+def md5(value):
+    return hashlib.md5(value.encode()).hexdigest()
+
+class TestReferentialCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.assemblies = [md5(f"assembly{i}") for i in range(3)]
+        self.contigs = [md5(f"contig{i}") for i in range(6)]
+        self.features = [md5(f"feature{i}") for i in range(10)]
+        self.orphan = md5('missing')
+
+        contig_rows = [[contig, self.assemblies[i % 3]] for i, contig in enumerate(self.contigs)]
+        contig_rows.append([md5('contig_orphan'), self.orphan])
+        feature_rows = [[feature, self.assemblies[i % 3], self.contigs[i % 6]] for i, feature in enumerate(self.features)]
+        feature_rows.append([md5('feature_empty'), self.assemblies[0], ''])
+        association_rows = [[feature, 'product', 'x'] for feature in self.features]
+        association_rows += [[self.orphan, 'product', 'y'], [self.orphan, 'note', 'z']]
+
+        self.tables = {
+            'assembly': [self.write('assembly.tsv', ['id', 'length'], [[a, '100'] for a in self.assemblies])],
+            'contigs': [self.write('contigs.tsv.gz', ['id', 'assembly_id'], contig_rows)],
+            'features': [self.write('features.tsv', ['feature_uid', 'assembly_md5', 'contig_md5'], feature_rows)],
+            'feature_associations': [self.write('associations.tsv', ['feature_id', 'key', 'value'], association_rows)],
+        }
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, name, header, rows):
+        path = os.path.join(self.temp_dir.name, name)
+        open_func = gzip.open if name.endswith('.gz') else open
+        with open_func(path, 'wt') as f:
+            for row in [header] + rows:
+                f.write('\t'.join(row) + '\n')
+        return path
+
+    def run_checker(self, **kwargs):
+        checker = ReferentialChecker(self.tables, directory=self.temp_dir.name, **kwargs)
+        self.assertEqual(checker.table_order(), ['assembly', 'contigs', 'features', 'feature_associations'])
+        return {report['child']: report for report in checker.run()}
+
+    def test_reports_orphans_and_empty_values(self):
+        reports = self.run_checker()
+        self.assertEqual(reports['contigs.assembly_id']['orphan_rows'], 1)
+        self.assertEqual(reports['contigs.assembly_id']['examples'], [self.orphan])
+        self.assertEqual(reports['features.assembly_md5']['orphan_rows'], 0)
+        self.assertEqual(reports['features.contig_md5']['empty'], 1)
+        self.assertEqual(reports['features.contig_md5']['orphan_rows'], 0)
+        self.assertEqual(reports['feature_associations.feature_id']['rows'], 12)
+        self.assertEqual(reports['feature_associations.feature_id']['orphan_rows'], 2)
+        self.assertEqual(reports['feature_associations.feature_id']['examples'], [self.orphan])
+
+    def test_spooled_keys_give_the_same_report(self):
+        self.assertEqual(self.run_checker(max_in_memory=2), self.run_checker())
+
+if __name__ == '__main__':
+    unittest.main()
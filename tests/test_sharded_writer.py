@@ -0,0 +1,68 @@
+import unittest
+import csv
+import os
+import tempfile
+
+from cdm_utils.feature_and_protein_table import GFFParser, ASSOCIATION_FIELDS
+from cdm_utils.sharded_writer import ShardedOutput, read_shard, verify_manifest
+
+class TestShardedWriter(unittest.TestCase):
+
+    def make_temp_dir(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        return temp_dir.name
+
+    def test_rollover_partitions_and_manifest(self):
+        directory = self.make_temp_dir()
+        output = ShardedOutput(directory, max_rows=3, partition_chars=1)
+        rows = [[f'f{i}', 'key', 'tab\tvalue' if i == 4 else f'v{i}'] for i in range(7)]
+        output.writerows('feature_associations', ASSOCIATION_FIELDS, rows[:5], 'ab12')
+        output.writerows('feature_associations', ASSOCIATION_FIELDS, rows[5:], 'cd34')
+        manifest = output.close()
+
+        entry = manifest['tables']['feature_associations']
+        self.assertEqual(entry['rows'], 7)
+        self.assertEqual([(shard['partition'], shard['rows']) for shard in entry['shards']],
+                         [('a', 3), ('a', 2), ('c', 2)])
+        self.assertEqual(verify_manifest(directory), [])
+        written = [row for shard in entry['shards'] for row in list(read_shard(os.path.join(directory, shard['path'])))[1:]]
+        self.assertEqual(written, rows)
+
+        # A second run adds shards after the existing ones
+        output = ShardedOutput(directory, max_rows=3, partition_chars=1)
+        output.writerows('feature_associations', ASSOCIATION_FIELDS, rows[:1], 'ab12')
+        self.assertEqual(output.close()['tables']['feature_associations']['rows'], 8)
+        self.assertEqual(verify_manifest(directory), [])
+
+        with open(os.path.join(directory, entry['shards'][0]['path']), 'ab') as f:
+            f.write(b'x')
+        self.assertEqual(len(verify_manifest(directory)), 1)
+
+    def test_shards_match_single_tsv(self):
+        prefix = os.path.join(os.path.dirname(__file__), 'data', 'GCF_003633725.1_ASM363372v1_')
+        parser = GFFParser(prefix + 'genomic.fna.gz', prefix + 'genomic.gff.gz', prefix + 'protein.faa.gz')
+        parser.calculate_md5_checksums()
+        parser.prepare_gff3_data()
+        parser.prepare_protein_associations()
+        parser.match_proteins_to_features()
+
+        directory = self.make_temp_dir()
+        tsv_paths = [os.path.join(directory, name) for name in ('f.tsv', 'a.tsv', 'p.tsv')]
+        parser.save_as_tsv(*tsv_paths)
+        output = ShardedOutput(os.path.join(directory, 'shards'), max_bytes=20000)
+        parser.save_as_shards(output)
+        manifest = output.close()
+
+        for table, tsv_path in zip(('features', 'feature_associations', 'feature_protein_associations'), tsv_paths):
+            with open(tsv_path, 'r', newline='') as f:
+                expected = list(csv.reader(f, delimiter='\t'))
+            shards = manifest['tables'][table]['shards']
+            written = [expected[0]]
+            for shard in shards:
+                written.extend(list(read_shard(os.path.join(directory, 'shards', shard['path'])))[1:])
+            self.assertEqual(written, expected)
+        self.assertGreater(len(manifest['tables']['feature_associations']['shards']), 1)
+
+if __name__ == '__main__':
+    unittest.main()
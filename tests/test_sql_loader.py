@@ -0,0 +1,125 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+import io
+import contextlib
+
+from cdm_utils.assembly_table import AssemblyTable
+from cdm_utils.feature_and_protein_table import GFFParser
+from cdm_utils.ncbi_jsonl_parser import NCBIJSONLParser
+from cdm_utils.id_codec import encode_id, decode_id, split_id, join_id
+from cdm_utils.sql_loader import SQLiteLoader
+
+class TestSQLiteLoader(unittest.TestCase):
+
+    def make_temp_dir(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        return temp_dir.name
+
+    def setUp(self):
+        self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
+        prefix = os.path.join(self.data_dir, 'GCF_003633725.1_ASM363372v1_')
+        self.parser = GFFParser(prefix + 'genomic.fna.gz', prefix + 'genomic.gff.gz', prefix + 'protein.faa.gz')
+        self.parser.calculate_md5_checksums()
+        self.parser.prepare_gff3_data()
+        self.parser.prepare_protein_associations()
+        self.parser.match_proteins_to_features()
+        self.db_path = os.path.join(self.make_temp_dir(), 'cdm.sqlite')
+
+    def test_unmatched_proteins_are_rejected(self):
+        prefix = os.path.join(self.data_dir, 'GCF_003633725.1_ASM363372v1_')
+        parser = GFFParser(prefix + 'genomic.fna.gz', prefix + 'genomic.gff.gz', prefix + 'protein.faa.gz')
+        parser.calculate_md5_checksums()
+        parser.prepare_gff3_data()
+        parser.prepare_protein_associations()
+        self.assertEqual({len(row) for row in parser.feature_protein_associations}, {3})
+        loader = SQLiteLoader(self.db_path)
+        with self.assertRaises(ValueError):
+            loader.load_gff_parser(parser)
+        loader.close()
+
+    def test_load_and_reload_gff_parser(self):
+        loader = SQLiteLoader(self.db_path, batch_size=500)
+        loader.load_gff_parser(self.parser)
+        # Loading the same genome again updates rows in place instead of duplicating them
+        loader.load_gff_parser(self.parser)
+        loader.close()
+
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM features').fetchone()[0], len(self.parser.features))
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM feature_protein_associations').fetchone()[0],
+                         len(self.parser.feature_protein_associations))
+
+        feature = next(self.parser.features.iter_dicts())
+        row = conn.execute('SELECT seq_id, "start", "end", contig_md5 FROM features WHERE feature_uid = ?',
+                           (feature['feature_uid'],)).fetchone()
+        self.assertEqual(row, (feature['seq_id'], feature['start'], feature['end'], feature['contig_md5']))
+
+        indexes = {row[1] for row in conn.execute("SELECT * FROM sqlite_master WHERE type = 'index'")}
+        self.assertIn('features_contig_md5', indexes)
+        self.assertIn('feature_associations_feature_id', indexes)
+        conn.close()
+
+    def test_binary_ids(self):
+        md5 = '0123456789abcdef0123456789abcdef'
+        self.assertEqual(decode_id(encode_id(md5)), md5)
+        self.assertEqual(join_id(*split_id(md5)), md5)
+        self.assertEqual(encode_id('SAMN01234567'), 'SAMN01234567')
+
+        loader = SQLiteLoader(self.db_path, binary_ids=True)
+        loader.load_gff_parser(self.parser)
+        loader.close()
+
+        conn = sqlite3.connect(self.db_path)
+        feature = next(self.parser.features.iter_dicts())
+        row = conn.execute('SELECT seq_id, length(feature_uid), contig_md5 FROM features WHERE feature_uid = ?',
+                           (encode_id(feature['feature_uid']),)).fetchone()
+        self.assertEqual(row, (feature['seq_id'], 16, encode_id(feature['contig_md5'])))
+        joined = conn.execute('SELECT COUNT(*) FROM features f JOIN feature_protein_associations p '
+                              'ON p.feature_id = f.feature_uid').fetchone()[0]
+        self.assertEqual(joined, len(self.parser.feature_protein_associations))
+        conn.close()
+
+        loader = SQLiteLoader(self.db_path, binary_ids=True)
+        uid = loader.conn.execute('SELECT id_hex(feature_id) FROM feature_associations LIMIT 1').fetchone()[0]
+        self.assertEqual(len(uid), 32)
+        loader.close()
+        with self.assertRaises(ValueError):
+            SQLiteLoader(self.db_path)
+
+    def test_binary_ids_across_loaders(self):
+        ncbi_parser = NCBIJSONLParser(os.path.join(self.data_dir, 'GCF_003633725.1_assembly_data_report.jsonl'))
+        ncbi_parser.parse()
+        with open(os.path.join(self.data_dir, 'bbmap_output.txt'), 'r') as file:
+            bbmap_output = file.read()
+        assembly_file = os.path.join(self.data_dir, 'GCF_003633725.1_ASM363372v1_genomic.fna.gz')
+        assembly_table = AssemblyTable(os.devnull)
+        assembly_table.bbmap_parser.run_bbmap_stats = lambda assembly_file: bbmap_output
+        with contextlib.redirect_stdout(io.StringIO()):
+            assembly_table.process_assemblies_concurrently([assembly_file])
+
+        loader = SQLiteLoader(self.db_path, binary_ids=True)
+        loader.load_ncbi_parser(ncbi_parser)
+        loader.load_assembly_table(assembly_table)
+        loader.load_gff_parser(self.parser)
+        loader.close()
+
+        conn = sqlite3.connect(self.db_path)
+        sample = ncbi_parser.sample_details_data[0]
+        row = conn.execute('SELECT length(id), length(source_id), accession FROM sample_details WHERE id = ?',
+                           (encode_id(sample['id']),)).fetchone()
+        self.assertEqual(row, (16, 16, sample['accession']))
+        attributes = conn.execute('SELECT COUNT(*) FROM sample_attributes a JOIN sample_details s ON a.sample_id = s.id').fetchone()[0]
+        self.assertEqual(attributes, len(ncbi_parser.sample_attributes_data))
+        row = conn.execute('SELECT length(id) FROM assembly WHERE id = ?',
+                           (encode_id(assembly_table.assemblies[0]['id']),)).fetchone()
+        self.assertEqual(row, (16,))
+        # Features join the assembly they were annotated on through the binary MD5
+        joined = conn.execute('SELECT COUNT(*) FROM features f JOIN assembly a ON f.assembly_md5 = a.id').fetchone()[0]
+        self.assertEqual(joined, len(self.parser.features))
+        conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
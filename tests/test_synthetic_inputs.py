@@ -0,0 +1,50 @@
+import unittest
+import filecmp
+import json
+import os
+import tempfile
+
+from cdm_utils.feature_and_protein_table import GFFParser
+from cdm_utils.synthetic_inputs import SyntheticGenomeGenerator
+
+class TestSyntheticInputs(unittest.TestCase):
+
+    def make_temp_dir(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        return temp_dir.name
+
+    def setUp(self):
+        self.generator = SyntheticGenomeGenerator(seed=7, contigs=3, contig_length=20000, attributes=2)
+
+    def test_same_seed_gives_same_files(self):
+        first = self.generator.write_genome(1, self.make_temp_dir())
+        second = self.generator.write_genome(1, self.make_temp_dir())
+        for path_a, path_b in zip(first, second):
+            self.assertTrue(filecmp.cmp(path_a, path_b, shallow=False))
+
+    def test_files_are_consistent_for_gff_parser(self):
+        assembly_file, gff_file, protein_file = self.generator.write_genome(0, self.make_temp_dir())
+        parser = GFFParser(assembly_file, gff_file, protein_file)
+        parser.calculate_md5_checksums()
+        parser.prepare_gff3_data()
+        parser.prepare_protein_associations()
+        parser.match_proteins_to_features()
+
+        self.assertEqual(len(parser.contig_md5s), 3)
+        feature_types = {parser.features[row][2] for row in range(len(parser.features))}
+        self.assertTrue({'region', 'gene', 'CDS', 'tRNA'} <= feature_types)
+        cds_count = sum(1 for row in range(len(parser.features)) if parser.features[row][2] == 'CDS')
+        self.assertEqual(len(parser.feature_protein_associations), cds_count)
+        self.assertTrue(all(parser.features[row][12] for row in range(len(parser.features))))
+
+    def test_assembly_reports(self):
+        path = self.generator.write_assembly_reports(os.path.join(self.make_temp_dir(), 'report.jsonl'), 3)
+        with open(path, 'r') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record['accession'] for record in records],
+                         [self.generator.genome_name(index) for index in range(3)])
+        self.assertTrue(all(record['assemblyInfo']['biosample']['accession'] for record in records))
+
+if __name__ == '__main__':
+    unittest.main()
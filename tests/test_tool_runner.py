@@ -0,0 +1,78 @@
+import unittest
+import asyncio
+import io
+import os
+import contextlib
+import sys
+import tempfile
+import time
+
+from cdm_utils.bbmap_assembly_stats import BBMapAssemblyStats
+from cdm_utils.tool_runner import AsyncToolRunner, ToolError
+
+class TestToolRunner(unittest.TestCase):
+
+    data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+    def test_stats_parsed_while_streaming(self):
+        # A stand-in for stats.sh that prints the recorded report line by line
+        report = os.path.join(self.data_dir, 'bbmap_output.txt')
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        fake_stats = os.path.join(temp_dir.name, 'stats.sh')
+        with open(fake_stats, 'w') as f:
+            f.write(f"#!/bin/sh\ncat {report}\n")
+        os.chmod(fake_stats, 0o755)
+
+        runner = AsyncToolRunner(max_processes=2)
+        runner.bbmap = BBMapAssemblyStats()
+        runner.bbmap.stats_path = fake_stats
+        assembly_file = os.path.join(self.data_dir, 'GCF_003633725.1_ASM363372v1_genomic.fna.gz')
+        results = asyncio.run(runner.run_jobs([('stats', assembly_file)] * 3))
+
+        with open(report, 'r') as f:
+            expected = BBMapAssemblyStats().parse_bbmap_output(f.read())
+        self.assertEqual(results, [expected] * 3)
+
+    def test_concurrency_limit_and_timeout(self):
+        runner = AsyncToolRunner(max_processes=2)
+        sleep = [sys.executable, '-c', 'import time; time.sleep(0.3)']
+
+        async def run_all():
+            async def limited():
+                async with runner.limit():
+                    await runner.run(sleep)
+            started = time.perf_counter()
+            await asyncio.gather(*(limited() for _ in range(4)))
+            return time.perf_counter() - started
+
+        # Four 0.3 second processes, two at a time, take two rounds
+        self.assertGreater(asyncio.run(run_all()), 0.55)
+
+        with self.assertRaises(ToolError) as raised:
+            asyncio.run(runner.run([sys.executable, '-c', 'import sys, time; print("started", file=sys.stderr, flush=True); time.sleep(10)'],
+                                   timeout=0.5))
+        self.assertIn('timed out', str(raised.exception))
+        self.assertEqual(raised.exception.stderr_tail, ['started'])
+
+        with self.assertRaises(ToolError):
+            asyncio.run(runner.run([sys.executable, '-c', 'raise SystemExit(3)']))
+
+    def test_prokka_jobs_share_the_cpus(self):
+        runner = AsyncToolRunner(max_processes=2, cpus=8)
+        commands = []
+
+        async def record(command, stdout_line=None, timeout=None):
+            commands.append(command)
+            raise ToolError(command, "not run")
+        runner.run = record
+
+        assembly_file = os.path.join(self.data_dir, 'GCF_003633725.1_ASM363372v1_genomic.fna.gz')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = asyncio.run(runner.run_jobs([('prokka', assembly_file, 'test', os.path.join(temp_dir, 'out'))]))
+        self.assertIsInstance(results[0], ToolError)
+        self.assertIn(['--cpus', '4'], [commands[0][i:i + 2] for i in range(len(commands[0]))])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import io
+import json
+import os
+import contextlib
+import tempfile
+
+from cdm_utils.worker import SpoolQueue, Worker, lock_store
+
+class TestWorker(unittest.TestCase):
+
+    prefix = os.path.join(os.path.dirname(__file__), 'data', 'GCF_003633725.1_ASM363372v1_')
+
+    def make_temp_dir(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        return temp_dir.name
+
+    def make_worker(self, spool_dir, output_dir):
+        outputs = {name: os.path.join(output_dir, name + '.tsv')
+                   for name in ('features', 'associations', 'protein_associations', 'contigs', 'assembly')}
+        return Worker(SpoolQueue(spool_dir), outputs, poll_interval=0)
+
+    def test_jobs_append_to_shared_outputs(self):
+        spool_dir, output_dir = self.make_temp_dir(), self.make_temp_dir()
+        queue = SpoolQueue(spool_dir)
+        job = {'type': 'features', 'assembly_file': self.prefix + 'genomic.fna.gz',
+               'gff_file': self.prefix + 'genomic.gff.gz', 'protein_file': self.prefix + 'protein.faa.gz'}
+        queue.submit(job)
+        queue.submit(job)
+        queue.submit(dict(job, gff_file=os.path.join(output_dir, 'missing.gff')))
+
+        worker = self.make_worker(spool_dir, output_dir)
+        worker.run(exit_when_empty=True)
+        self.assertEqual((worker.processed, worker.failed), (2, 1))
+        self.assertEqual(queue.counts(), {'incoming': 0, 'done': 2, 'failed': 1})
+
+        with open(worker.outputs['features'], 'r') as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines[0].startswith('feature_uid\t'))
+        self.assertEqual(sum(line.startswith('feature_uid\t') for line in lines), 1)
+        self.assertEqual((len(lines) - 1) % 2, 0)
+        self.assertEqual(lines[1:(len(lines) + 1) // 2], lines[(len(lines) + 1) // 2:])
+
+        failed_dir = queue.dirs['failed']
+        with open(os.path.join(failed_dir, os.listdir(failed_dir)[0]), 'r') as f:
+            self.assertIn('missing.gff', json.load(f)['error'])
+
+    def test_store_flushed_per_job_and_locked_to_one_worker(self):
+        from cdm_utils.protein_store import ProteinStore
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store_dir = os.path.join(temp_dir, 'store')
+            lock = lock_store(store_dir)
+            with self.assertRaises(BlockingIOError):
+                lock_store(store_dir)
+            lock.close()
+
+            spool_dir = os.path.join(temp_dir, 'spool')
+            SpoolQueue(spool_dir).submit({'type': 'features', 'assembly_file': self.prefix + 'genomic.fna.gz',
+                                          'gff_file': self.prefix + 'genomic.gff.gz',
+                                          'protein_file': self.prefix + 'protein.faa.gz'})
+            worker = self.make_worker(spool_dir, temp_dir)
+            worker.protein_store = ProteinStore(store_dir)
+            with contextlib.redirect_stdout(io.StringIO()):
+                worker.run(exit_when_empty=True)
+            self.assertEqual(worker.processed, 1)
+            # Stored before close(), as a killed worker would never get there
+            self.assertEqual(len(ProteinStore(store_dir)), len(worker.protein_store))
+            self.assertGreater(len(worker.protein_store), 0)
+
+    def test_recover_jobs_of_dead_worker(self):
+        spool_dir = self.make_temp_dir()
+        queue = SpoolQueue(spool_dir)
+        queue.submit({'type': 'contigs', 'assembly_file': self.prefix + 'genomic.fna.gz'})
+        name, _ = queue.claim()
+
+        # Pretend the claim was made by a process that has since exited
+        dead_dir = queue.claim_dir.rpartition('.')[0] + '.999999999'
+        os.rename(queue.claim_dir, dead_dir)
+        self.assertEqual(queue.recover(), 1)
+        self.assertEqual(os.listdir(queue.dirs['incoming']), [name])
+        self.assertFalse(os.path.exists(dead_dir))
+
+if __name__ == '__main__':
+    unittest.main()